@@ -0,0 +1,312 @@
+"""Admission control and rate limiting in front of the API routes.
+
+Without a bound on concurrent work, a spike sends every request to the
+connection pool, where they queue until ``DB_POOL_TIMEOUT`` and latency
+collapses for everyone, cheap reads included. :class:`AdmissionMiddleware`
+admits requests by route class instead:
+
+* ``read``: GETs under ``/leaderboard``, ``/players`` and ``/auth/me``.
+* ``write``: score submits and player heartbeats.
+* ``auth``: logins and signups (scrypt plus a user lookup).
+* ``admin``: the bulk export and import routes.
+
+Each class runs at most ``ADMISSION_<CLASS>_CONCURRENCY`` requests at once.
+Up to ``ADMISSION_QUEUE_SIZE`` more wait their turn in arrival order for at
+most ``ADMISSION_QUEUE_TIMEOUT_MS``. Anything beyond that gets an immediate
+503 with ``Retry-After``, so a saturated class sheds load in microseconds
+rather than holding sockets, and a flood of submits cannot starve reads.
+Other paths (static files, ``/metrics``, the players WebSocket) are not
+limited.
+
+``POST /leaderboard``, ``POST /auth/login`` and ``POST /auth/signup`` are
+also rate limited by token buckets (``RATE_LIMIT_*``). A ``session_id``
+cookie is whatever the client sends, so it never picks the bucket on its
+own: a password guesser could send a new one with every attempt. Logins and
+signups are keyed by client address, and each login also spends a token
+from the bucket of the email it names. Submits are keyed by user when the
+session has already been resolved to one (a session cache hit), and by
+address otherwise. Over the limit they get 429 with ``Retry-After`` set to
+when the next token is due. Rate limits are checked first and never take a
+concurrency slot.
+
+Queue depth, requests in flight, queue wait and rejections by reason are
+exported at ``/metrics``. Limits are per process.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from starlette.requests import cookie_parser
+
+from .metrics import Counter, Gauge, Histogram, registry
+from .session_cache import session_cache
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+ADMISSION_READ_CONCURRENCY = int(os.getenv("ADMISSION_READ_CONCURRENCY", "64"))
+ADMISSION_WRITE_CONCURRENCY = int(os.getenv("ADMISSION_WRITE_CONCURRENCY", "24"))
+ADMISSION_AUTH_CONCURRENCY = int(os.getenv("ADMISSION_AUTH_CONCURRENCY", "16"))
+ADMISSION_ADMIN_CONCURRENCY = int(os.getenv("ADMISSION_ADMIN_CONCURRENCY", "2"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "128"))
+ADMISSION_QUEUE_TIMEOUT_MS = int(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "1000"))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+
+RATE_LIMITS = os.getenv("RATE_LIMITS", "true").lower() == "true"
+RATE_LIMIT_SUBMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_SUBMIT_PER_MINUTE", "120"))
+RATE_LIMIT_SUBMIT_BURST = int(os.getenv("RATE_LIMIT_SUBMIT_BURST", "20"))
+RATE_LIMIT_LOGIN_PER_MINUTE = float(os.getenv("RATE_LIMIT_LOGIN_PER_MINUTE", "20"))
+RATE_LIMIT_LOGIN_BURST = int(os.getenv("RATE_LIMIT_LOGIN_BURST", "10"))
+RATE_LIMIT_SIGNUP_PER_MINUTE = float(os.getenv("RATE_LIMIT_SIGNUP_PER_MINUTE", "10"))
+RATE_LIMIT_SIGNUP_BURST = int(os.getenv("RATE_LIMIT_SIGNUP_BURST", "5"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Largest login body read for its email; a bigger one is only limited by address
+MAX_LOGIN_BODY_BYTES = 64 * 1024
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status = status
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimit:
+    """At most ``limit`` holders, with a bounded FIFO of waiters."""
+
+    def __init__(self, name: str, limit: int, queue_size: int = ADMISSION_QUEUE_SIZE, timeout: float = ADMISSION_QUEUE_TIMEOUT_MS / 1000):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        """Take a slot, waiting in line if all are busy; raises :class:`Rejected` when the line is full or too slow."""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise Rejected(503, "queue_full", "Server busy, retry shortly", ADMISSION_RETRY_AFTER_SECONDS)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            # release() hands its slot straight to the first waiter, so in_flight is already counted
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise Rejected(503, "queue_timeout", "Server busy, retry shortly", ADMISSION_RETRY_AFTER_SECONDS)
+            raise
+        finally:
+            if registry.enabled:
+                admission_queue_wait.observe(time.perf_counter() - start, self.name)
+
+    def release(self):
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.in_flight -= 1
+
+
+class RateLimit:
+    """Token buckets of ``burst`` tokens refilled at ``per_minute``, one per key, the least recently used evicted."""
+
+    def __init__(self, name: str, per_minute: float, burst: int, max_keys: int = RATE_LIMIT_MAX_KEYS, clock=time.monotonic):
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """0 if ``key`` may go ahead (spending a token), else seconds until it may."""
+        now = self.clock()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate if self.rate > 0 else math.inf
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        self._buckets.clear()
+
+
+def route_class(method: str, path: str) -> str | None:
+    """The admission class of a request, or None for unlimited paths."""
+    if path.startswith("/admin/"):
+        return "admin"
+    if path in ("/auth/login", "/auth/signup"):
+        return "auth"
+    if path.startswith(("/leaderboard", "/players", "/auth/")):
+        return "read" if method in ("GET", "HEAD") else "write"
+    return None
+
+
+class AdmissionController:
+    def __init__(self, enabled: bool = ADMISSION_CONTROL, rate_limits: bool = RATE_LIMITS):
+        self.enabled = enabled
+        self.rate_limits = rate_limits
+        self.classes = {
+            "read": ConcurrencyLimit("read", ADMISSION_READ_CONCURRENCY),
+            "write": ConcurrencyLimit("write", ADMISSION_WRITE_CONCURRENCY),
+            "auth": ConcurrencyLimit("auth", ADMISSION_AUTH_CONCURRENCY),
+            "admin": ConcurrencyLimit("admin", ADMISSION_ADMIN_CONCURRENCY),
+        }
+        # (method, path) -> limit
+        self.limits = {
+            ("POST", "/leaderboard"): RateLimit("submit", RATE_LIMIT_SUBMIT_PER_MINUTE, RATE_LIMIT_SUBMIT_BURST),
+            ("POST", "/auth/login"): RateLimit("login", RATE_LIMIT_LOGIN_PER_MINUTE, RATE_LIMIT_LOGIN_BURST),
+            ("POST", "/auth/signup"): RateLimit("signup", RATE_LIMIT_SIGNUP_PER_MINUTE, RATE_LIMIT_SIGNUP_BURST),
+        }
+        # Logins per account, whichever addresses they come from
+        self.login_accounts = RateLimit("login_account", RATE_LIMIT_LOGIN_PER_MINUTE, RATE_LIMIT_LOGIN_BURST)
+
+    async def check_rate(self, scope, receive):
+        """Spend the request's tokens or raise :class:`Rejected`; returns ``receive``, replaying the body if it was read."""
+        limit = self.limits.get((scope["method"], scope["path"]))
+        if limit is None or not self.rate_limits:
+            return receive
+        if scope["path"] == "/leaderboard":
+            self._take(limit, user_key(scope))
+            return receive
+        self._take(limit, "client:" + client_address(scope))
+        if scope["path"] == "/auth/login":
+            body, receive = await read_body(receive, MAX_LOGIN_BODY_BYTES)
+            email = login_email(body)
+            if email:
+                self._take(self.login_accounts, "email:" + email)
+        return receive
+
+    def _take(self, limit: RateLimit, key: str):
+        wait = limit.take(key)
+        if wait:
+            raise Rejected(429, "rate_limited", "Too many requests", wait)
+
+    def reset(self):
+        for limit in (*self.limits.values(), self.login_accounts):
+            limit.clear()
+
+
+def client_address(scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+def user_key(scope) -> str:
+    """The user of a session already resolved by this process, or else the client address."""
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            session_id = cookie_parser(value.decode("latin-1")).get("session_id")
+            user = session_cache.peek(session_id) if session_id else None
+            if user is not None:
+                return "user:" + user.id
+    return "client:" + client_address(scope)
+
+
+def login_email(body: bytes) -> str | None:
+    try:
+        email = json.loads(body).get("email")
+    except (ValueError, AttributeError):
+        return None
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+async def read_body(receive, limit: int):
+    """Read up to about ``limit`` bytes of the request body; returns it and a ``receive`` that replays what was read."""
+    messages, size = [], 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        size += len(message.get("body", b""))
+        if not message.get("more_body", False) or size > limit:
+            break
+    body = b"".join(message.get("body", b"") for message in messages if message["type"] == "http.request")
+
+    async def replay():
+        return messages.pop(0) if messages else await receive()
+
+    return body, replay
+
+
+admission_controller = AdmissionController()
+
+admission_rejected = registry.register(Counter(
+    "admission_rejected_total", "Requests turned away: queue_full, queue_timeout or rate_limited.", ("class", "reason")))
+admission_queue_wait = registry.register(Histogram(
+    "admission_queue_wait_seconds", "Time queued requests waited for an admission slot (admitted or not).", ("class",)))
+registry.register(Gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot.", ("class",),
+    lambda: [((name,), limit.queued) for name, limit in admission_controller.classes.items()]))
+registry.register(Gauge(
+    "admission_in_flight", "Requests holding an admission slot.", ("class",),
+    lambda: [((name,), limit.in_flight) for name, limit in admission_controller.classes.items()]))
+
+
+async def reject(send, error: Rejected):
+    body = json.dumps({"detail": error.detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": error.status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(error.retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying :data:`admission_controller` to HTTP requests."""
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        kind = route_class(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if kind is None:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.controller.classes[kind] if self.controller.enabled else None
+        try:
+            receive = await self.controller.check_rate(scope, receive)
+            if limit is not None:
+                await limit.acquire()
+        except Rejected as e:
+            if registry.enabled:
+                admission_rejected.inc(kind, e.reason)
+            await reject(send, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if limit is not None:
+                limit.release()
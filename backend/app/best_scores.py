@@ -0,0 +1,98 @@
+"""One row per player and mode: their best leaderboard entry.
+
+``crud.submit_scores`` calls :func:`record` inside the submit transaction.
+A batch is reduced to one candidate per (user, mode) and written with a single
+multi-row upsert that only replaces a stored best when it is beaten (a higher
+score, or the same score played earlier), so most submits leave the table
+untouched. ``GET /leaderboard?distinct=true`` reads it directly instead of
+grouping ``leaderboard_entries`` on every request.
+
+Build or rebuild it from existing entries (e.g. after upgrading) with::
+
+    uv run python -m app.best_scores --batch-size 10000
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import delete, func, or_, and_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from . import models
+from .leaderboard_index import IndexedEntry, order_key
+from .rollups import as_utc
+
+Best = models.UserBestScore
+BEST_ORDER = (Best.score.desc(), Best.played_at, Best.id)
+
+
+async def record(db: AsyncSession, entries: list[IndexedEntry]):
+    """Upsert the best of ``entries`` for each (user, mode); the caller commits."""
+    candidates: dict[tuple[str, models.GameMode], IndexedEntry] = {}
+    for entry in entries:
+        entry = entry._replace(played_at=as_utc(entry.played_at))
+        key = (entry.user_id, models.GameMode(entry.mode))
+        if key not in candidates or order_key(entry) < order_key(candidates[key]):
+            candidates[key] = entry
+    if not candidates:
+        return
+
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(Best).values([
+        {"user_id": user_id, "mode": mode, "id": entry.id, "username": entry.username, "score": entry.score, "played_at": entry.played_at}
+        for (user_id, mode), entry in candidates.items()
+    ])
+    new = statement.excluded
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[Best.user_id, Best.mode],
+        set_={"id": new.id, "username": new.username, "score": new.score, "played_at": new.played_at},
+        where=or_(new.score > Best.score, and_(new.score == Best.score, new.played_at < Best.played_at)),
+    ))
+
+
+async def get_best_rank(db: AsyncSession, user_id: str, mode: models.GameMode) -> int | None:
+    """Rank of the user's personal best on the ``distinct`` board of ``mode``."""
+    # One round trip: the count of higher bests is correlated with the user's own row
+    other = aliased(Best)
+    higher = select(func.count()).select_from(other).where(other.mode == Best.mode, other.score > Best.score).scalar_subquery()
+    return (await db.execute(select(higher + 1).where(Best.user_id == user_id, Best.mode == mode))).scalar()
+
+
+async def backfill(session_factory, batch_size: int = 10000) -> int:
+    """Rebuild the table from ``leaderboard_entries`` in committed keyset batches."""
+    entry = models.LeaderboardEntry
+    columns = (entry.id, entry.user_id, entry.username, entry.score, entry.mode, entry.played_at)
+    total, last_id = 0, None
+    async with session_factory() as db:
+        await db.execute(delete(Best))
+        while True:
+            query = select(*columns).order_by(entry.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(entry.id > last_id)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            await record(db, [IndexedEntry(*row) for row in rows])
+            await db.commit()
+            total += len(rows)
+        await db.commit()
+    return total
+
+
+async def main():
+    from .database import AsyncSessionLocal, engine, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild user_best_scores from leaderboard_entries.")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    await init_db()
+    total = await backfill(AsyncSessionLocal, args.batch_size)
+    print(f"Rebuilt personal bests from {total} entries")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
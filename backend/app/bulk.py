@@ -0,0 +1,238 @@
+"""Bulk export and import of leaderboard entries, for the ``/admin`` routes.
+
+Export streams every entry matching the filters as NDJSON or CSV. Rows come
+off a server-side cursor (``AsyncSession.stream`` with ``yield_per``) in
+``EXPORT_BATCH_SIZE`` partitions, each encoded and sent before the next is
+fetched, so memory stays flat at any table size. Entries are exported in id
+order, which the database reads off the primary key without sorting.
+
+Import reads the request body as it arrives, one record per line in the
+export's format (so an export imports back unchanged), and writes every
+``IMPORT_BATCH_SIZE`` valid records in one transaction through
+``crud.record_entries``, the same path as score submits, so rollups, personal
+bests, player stats, the histogram and the index stay in step. Entries whose
+id is already stored are skipped, which makes re-running an import safe.
+Invalid lines are counted and the first ``IMPORT_MAX_ERRORS`` are reported
+with their line numbers; they do not stop the import.
+
+Player stats fold each batch in ``playedAt`` order, so an import of older
+games than those already stored leaves the recent scores out of date until
+``python -m app.player_stats`` rebuilds them.
+"""
+import csv
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, models, schemas
+from .leaderboard_index import IndexedEntry
+from .rollups import as_utc
+from .serializers import csv_header, encode_entry_csv, encode_entry_lines, ENTRY_COLUMNS
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+# Longer lines are rejected rather than buffered; an entry is a few hundred bytes
+MAX_LINE_BYTES = 64 * 1024
+
+MEDIA_TYPES = {
+    schemas.ExportFormat.NDJSON: "application/x-ndjson",
+    schemas.ExportFormat.CSV: "text/csv; charset=utf-8",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def export_query(mode: Optional[schemas.GameMode] = None, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    entry = models.LeaderboardEntry
+    query = select(*crud.entry_columns()).order_by(entry.id)
+    if mode:
+        query = query.where(entry.mode == mode)
+    if since:
+        query = query.where(entry.played_at >= since)
+    if until:
+        query = query.where(entry.played_at < until)
+    return query
+
+
+async def export_entries(
+    db: AsyncSession,
+    format: schemas.ExportFormat,
+    mode: Optional[schemas.GameMode] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """The export body, one chunk per ``batch_size`` rows."""
+    if format == schemas.ExportFormat.CSV:
+        encode = encode_entry_csv
+        yield csv_header()
+    else:
+        encode = encode_entry_lines
+    result = await db.stream(export_query(mode, since, until).execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield encode(rows)
+
+
+class LineTooLong(ValueError):
+    def __init__(self, line: int):
+        super().__init__(f"Line is longer than {MAX_LINE_BYTES} bytes; the rest of the upload was not read")
+        self.line = line
+
+
+async def lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """``(line number, line)`` pairs from a body arriving in arbitrary chunks."""
+    number, pending = 0, b""
+    async for chunk in chunks:
+        *complete, pending = (pending + chunk).split(b"\n")
+        for line in complete:
+            number += 1
+            yield number, line
+        if len(pending) > MAX_LINE_BYTES:
+            raise LineTooLong(number + 1)
+    if pending:
+        yield number + 1, pending
+
+
+def describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" if detail["loc"] else detail["msg"]
+        for detail in error.errors()
+    )
+
+
+class Parser:
+    """Turns lines of one format into ``schemas.EntryImport`` records."""
+
+    def __init__(self, format: schemas.ExportFormat):
+        self.format = format
+        self.columns: Optional[list[str]] = None
+
+    def parse(self, text: str) -> Optional[schemas.EntryImport]:
+        """The record on ``text``, or None for a CSV header; raises ValueError for an invalid line."""
+        try:
+            if self.format == schemas.ExportFormat.NDJSON:
+                return schemas.EntryImport.model_validate_json(text)
+            values = next(csv.reader([text]))
+            if self.columns is None:
+                missing = {"userId", "username", "score", "mode"} - set(values)
+                if missing:
+                    raise ValueError(f"CSV header is missing {', '.join(sorted(missing))} (expected {','.join(ENTRY_COLUMNS)})")
+                self.columns = values
+                return None
+            if len(values) != len(self.columns):
+                raise ValueError(f"Expected {len(self.columns)} columns, got {len(values)}")
+            # Empty cells are missing values, so optional columns may be left blank
+            return schemas.EntryImport.model_validate({column: value for column, value in zip(self.columns, values) if value != ""})
+        except ValidationError as e:
+            raise ValueError(describe(e))
+        except csv.Error as e:
+            raise ValueError(f"Invalid CSV: {e}")
+
+
+def to_entry(record: schemas.EntryImport, now: datetime) -> IndexedEntry:
+    return IndexedEntry(
+        id=record.id or str(uuid.uuid4()),
+        user_id=record.user_id,
+        username=record.username,
+        score=record.score,
+        mode=models.GameMode(record.mode.value),
+        played_at=as_utc(record.played_at) if record.played_at else now,
+    )
+
+
+class Import:
+    """Counts and errors of one import as its batches are written."""
+
+    def __init__(self, db: AsyncSession, max_errors: int):
+        self.db = db
+        self.max_errors = max_errors
+        self.imported = self.skipped = self.failed = 0
+        self.errors: list[schemas.ImportFailure] = []
+        self.start = time.perf_counter()
+
+    def fail(self, line: int, message: str, entries: int = 1):
+        self.failed += entries
+        if len(self.errors) < self.max_errors:
+            self.errors.append(schemas.ImportFailure(line=line, message=message))
+
+    async def write(self, batch: list[tuple[int, IndexedEntry]]):
+        """Store ``batch`` of ``(line, entry)`` in one transaction."""
+        known = set((await self.db.execute(
+            select(models.User.id).where(models.User.id.in_({entry.user_id for _, entry in batch}))
+        )).scalars())
+        entries, seen = [], set()
+        for line, entry in batch:
+            if entry.user_id not in known:
+                self.fail(line, f"Unknown user {entry.user_id}")
+            elif entry.id in seen:
+                self.skipped += 1
+            else:
+                seen.add(entry.id)
+                entries.append(entry)
+        if not entries:
+            return
+        try:
+            # Oldest first, so player stats take the latest games as the recent ones
+            inserted = await crud.record_entries(self.db, sorted(entries, key=lambda entry: entry.played_at), skip_existing=True)
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            self.fail(batch[0][0], f"Batch of {len(entries)} entries not stored: {e.__class__.__name__}", len(entries))
+            logger.exception("Import batch starting at line %d failed", batch[0][0])
+            return
+        self.imported += len(inserted)
+        self.skipped += len(entries) - len(inserted)
+        logger.info(
+            "Import: %d imported, %d skipped, %d failed (%.0f entries/s)",
+            self.imported, self.skipped, self.failed, self.imported / (time.perf_counter() - self.start),
+        )
+
+    def result(self) -> schemas.ImportResult:
+        return schemas.ImportResult(
+            imported=self.imported, skipped=self.skipped, failed=self.failed,
+            errors=self.errors, seconds=round(time.perf_counter() - self.start, 3),
+        )
+
+
+async def import_entries(
+    db: AsyncSession,
+    format: schemas.ExportFormat,
+    chunks: AsyncIterator[bytes],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    max_errors: int = IMPORT_MAX_ERRORS,
+) -> schemas.ImportResult:
+    """Parse ``chunks`` as they arrive and store them ``batch_size`` entries per transaction."""
+    job, parser, now = Import(db, max_errors), Parser(format), datetime.now(timezone.utc)
+    batch: list[tuple[int, IndexedEntry]] = []
+    try:
+        async for number, line in lines(chunks):
+            try:
+                text = line.decode("utf-8-sig" if number == 1 else "utf-8").rstrip("\r")
+                if not text.strip():
+                    continue
+                record = parser.parse(text)
+            except ValueError as e:  # UnicodeDecodeError included
+                job.fail(number, str(e))
+                if parser.format == schemas.ExportFormat.CSV and parser.columns is None:
+                    # Without a header no row can be read
+                    break
+                continue
+            if record is None:
+                continue
+            batch.append((number, to_entry(record, now)))
+            if len(batch) >= batch_size:
+                await job.write(batch)
+                batch = []
+    except LineTooLong as e:
+        job.fail(e.line, str(e))
+    if batch:
+        await job.write(batch)
+    return job.result()
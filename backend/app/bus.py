@@ -0,0 +1,387 @@
+"""Change-notification bus between worker processes.
+
+Each worker keeps state in memory: the response cache, the session cache,
+the leaderboard index and the presence registry. A write handled by one
+worker changes the database, but the other workers would not see it in that
+memory until a TTL ran out (or, for the index and presence, ever). With
+``CHANGE_BUS`` set, the worker that made a change also publishes a small
+event, and every other worker applies it (see ``app/changes.py`` for the
+events and what they do).
+
+Backends:
+
+* ``unix``: a Unix domain socket at ``CHANGE_BUS_SOCKET``, for workers on one
+  machine (``uvicorn --workers N``) with no external service. The first
+  worker to take an ``flock`` on ``<socket>.lock`` hosts a relay that copies
+  every line it receives to all connected workers. Every worker, the host
+  included, connects to the relay as a client. When the host exits, the
+  kernel drops its lock, and the next worker to reconnect takes over.
+* ``postgres``: ``LISTEN``/``NOTIFY`` on ``CHANGE_BUS_CHANNEL`` over one
+  asyncpg connection to ``DATABASE_URL``, for workers on several machines.
+  ``NOTIFY`` payloads are limited to 8000 bytes, so publishers keep events
+  small (score batches are split).
+
+Publishing never waits. Messages go into a ``CHANGE_BUS_QUEUE_SIZE`` queue
+that a background task writes out. When the queue is full, the message is
+dropped and counted. Each message carries the publishing process's origin
+id, so workers skip their own events, which they applied when making the
+change. A worker that loses its connection reconnects with backoff and then
+runs the ``resync`` handlers. Those drop or refresh everything it may have
+missed while disconnected.
+
+The other direction is covered too. An event may never reach the other
+workers: it was dropped, it was larger than the backend carries, or it was
+lost in a failed send. The publisher then sends a ``resync`` event in its
+place, as soon as it can, and the receivers run their ``resync`` handlers.
+
+Delivery latency (publish to handler, by wall clock) is recorded in
+``change_bus_delivery_seconds``. ``benchmarks/bench_change_bus.py`` measures
+it across worker processes.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from typing import Any, Callable
+
+from sqlalchemy.engine import make_url
+
+from .metrics import Counter, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+CHANGE_BUS = os.getenv("CHANGE_BUS", "none").lower()
+CHANGE_BUS_SOCKET = os.getenv("CHANGE_BUS_SOCKET", os.path.join(tempfile.gettempdir(), "snake_arena_bus.sock"))
+CHANGE_BUS_CHANNEL = os.getenv("CHANGE_BUS_CHANNEL", "snake_arena_changes")
+CHANGE_BUS_QUEUE_SIZE = int(os.getenv("CHANGE_BUS_QUEUE_SIZE", "10000"))
+
+# Longest line the relay and workers accept
+MAX_MESSAGE_BYTES = 1024 * 1024
+# A relay peer this far behind is disconnected; it reconnects and resyncs
+MAX_PEER_BACKLOG_BYTES = 4 * 1024 * 1024
+RECONNECT_DELAYS = (0.05, 0.1, 0.25, 0.5, 1.0)
+
+Handler = Callable[[Any], None]
+
+change_bus_delivery = registry.register(Histogram(
+    "change_bus_delivery_seconds", "Time from publishing a change event to applying it on another worker.", ("kind",)))
+change_bus_messages = registry.register(Counter(
+    "change_bus_messages_total", "Change events published, received from other workers, dropped (queue full) or oversized (replaced by a resync).", ("kind", "direction")))
+
+
+class ChangeBus:
+    def __init__(self, max_queue: int = CHANGE_BUS_QUEUE_SIZE):
+        self.origin = uuid.uuid4().hex
+        self.max_queue = max_queue
+        self.backend = None
+        self.handlers: dict[str, list[Handler]] = {}
+        self._queue: asyncio.Queue[str] | None = None
+        # Events since the last send may not have reached the other workers; the next send includes a resync
+        self.others_missed = False
+
+    @property
+    def running(self) -> bool:
+        return self.backend is not None
+
+    def on(self, kind: str) -> Callable[[Handler], Handler]:
+        """Decorator registering a handler for events of ``kind`` from other workers."""
+        def register(handler: Handler) -> Handler:
+            self.handlers.setdefault(kind, []).append(handler)
+            return handler
+        return register
+
+    def publish(self, kind: str, data: Any = None):
+        """Queue an event for the other workers; a no-op unless the bus is running."""
+        if self._queue is None:
+            return
+        message = self._encode(kind, data)
+        if len(message) > self.backend.max_message_bytes:
+            logger.warning("Change event %r is %d bytes, over the bus limit; sending a resync instead", kind, len(message))
+            change_bus_messages.inc(kind, "oversized")
+            kind, message = "resync", self._encode("resync", None)
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            change_bus_messages.inc(kind, "dropped")
+            self.others_missed = True
+            return
+        change_bus_messages.inc(kind, "published")
+
+    def _encode(self, kind: str, data: Any) -> str:
+        # ASCII-only JSON, so its length is its size in bytes
+        return json.dumps({"origin": self.origin, "kind": kind, "sent": time.time(), "data": data}, separators=(",", ":"))
+
+    def deliver(self, raw: str | bytes):
+        """Apply one message from the backend (ignoring this worker's own)."""
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            logger.warning("Ignoring malformed change event %r", raw[:200])
+            return
+        if message.get("origin") == self.origin:
+            return
+        kind = message.get("kind")
+        self._run_handlers(kind, message.get("data"))
+        change_bus_messages.inc(kind, "received")
+        if registry.enabled:
+            change_bus_delivery.observe(max(0.0, time.time() - message.get("sent", time.time())), kind)
+
+    def resync(self):
+        """Run the ``resync`` handlers, after a gap in which events may have been missed."""
+        self._run_handlers("resync", None)
+
+    def _run_handlers(self, kind: str, data: Any):
+        for handler in self.handlers.get(kind, ()):
+            try:
+                handler(data)
+            except Exception:
+                logger.exception("Change event handler for %r failed", kind)
+
+    async def next_messages(self, limit: int = 1000) -> list[str]:
+        """Wait for a queued message, then take up to ``limit`` so a backlog goes out in one write.
+
+        Returns at once with a ``resync`` when the other workers missed something.
+        """
+        messages = [] if self.others_missed else [await self._queue.get()]
+        while len(messages) < limit and not self._queue.empty():
+            messages.append(self._queue.get_nowait())
+        if self.others_missed:
+            self.others_missed = False
+            # After the batch, so the receivers' resync also covers its events
+            messages.append(self._encode("resync", None))
+            change_bus_messages.inc("resync", "published")
+        return messages
+
+    async def start(self, backend=None):
+        """Connect ``backend`` (default: the one named by ``CHANGE_BUS``)."""
+        backend = backend or make_backend(CHANGE_BUS)
+        if backend is None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self.others_missed = False
+        self.backend = backend
+        await backend.start(self)
+
+    async def stop(self):
+        if self.backend is None:
+            return
+        await self.backend.stop()
+        self.backend = None
+        self._queue = None
+
+
+class UnixSocketBackend:
+    """Workers on one machine, relayed through a socket hosted by whichever worker holds the lock."""
+
+    # The newline ends the line
+    max_message_bytes = MAX_MESSAGE_BYTES - 1
+
+    def __init__(self, path: str = CHANGE_BUS_SOCKET):
+        self.path = path
+        self.is_host = False
+        self.connected = asyncio.Event()
+        self._server: asyncio.AbstractServer | None = None
+        self._lock_fd: int | None = None
+        self._peers: set[asyncio.StreamWriter] = set()
+        self._task: asyncio.Task | None = None
+
+    async def start(self, bus: ChangeBus):
+        self._task = asyncio.create_task(self._run(bus))
+        # Publishing works before this (messages wait in the queue), but a worker that starts serving
+        # requests already connected does not miss the events of its first moments
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.connected.wait(), 5)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._stop_hosting()
+
+    async def _run(self, bus: ChangeBus):
+        attempt, connected_before = 0, False
+        while True:
+            try:
+                await self._try_to_host()
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_MESSAGE_BYTES)
+            except OSError:
+                await asyncio.sleep(RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)])
+                attempt += 1
+                continue
+            attempt = 0
+            if connected_before:
+                logger.info("Change bus reconnected; resyncing")
+                bus.resync()
+            connected_before = True
+            self.connected.set()
+            sender = asyncio.create_task(self._send(bus, writer))
+            try:
+                while line := await reader.readline():
+                    bus.deliver(line)
+            except (OSError, ValueError):
+                pass
+            finally:
+                self.connected.clear()
+                sender.cancel()
+                await asyncio.gather(sender, return_exceptions=True)
+                writer.close()
+            logger.warning("Change bus connection lost; reconnecting")
+
+    async def _send(self, bus: ChangeBus, writer: asyncio.StreamWriter):
+        while True:
+            messages = await bus.next_messages()
+            try:
+                writer.write("".join(message + "\n" for message in messages).encode())
+                await writer.drain()
+            except BaseException:
+                # Taken off the queue but perhaps never relayed; resync the others after reconnecting
+                bus.others_missed = True
+                raise
+
+    async def _try_to_host(self):
+        """Host the relay if no other live worker does."""
+        if self._server is not None:
+            return
+        import fcntl
+
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        self._lock_fd = fd
+        # A socket file left by a host that died; nobody else can be serving on it while we hold the lock
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._relay, self.path, limit=MAX_MESSAGE_BYTES)
+        self.is_host = True
+        logger.info("Hosting the change bus relay at %s", self.path)
+
+    async def _relay(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._peers.add(writer)
+        pending = b""
+        try:
+            # Forwarded in whole reads, cut at the last newline so lines from different workers never interleave
+            while chunk := await reader.read(65536):
+                data = pending + chunk
+                cut = data.rfind(b"\n") + 1
+                pending = data[cut:]
+                if len(pending) > MAX_MESSAGE_BYTES:
+                    break
+                if not cut:
+                    continue
+                lines = data[:cut]
+                for peer in list(self._peers):
+                    if peer.transport.get_write_buffer_size() > MAX_PEER_BACKLOG_BYTES:
+                        self._peers.discard(peer)
+                        peer.close()
+                        continue
+                    peer.write(lines)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    async def _stop_hosting(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for peer in list(self._peers):
+            peer.close()
+        self._peers.clear()
+        await self._server.wait_closed()
+        self._server = None
+        self.is_host = False
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+        os.close(self._lock_fd)
+        self._lock_fd = None
+
+
+class PostgresBackend:
+    """``LISTEN``/``NOTIFY`` on one dedicated asyncpg connection."""
+
+    # Postgres rejects NOTIFY payloads of 8000 bytes or more
+    max_message_bytes = 7999
+
+    def __init__(self, url: str, channel: str = CHANGE_BUS_CHANNEL):
+        # asyncpg takes a plain libpq URL, without SQLAlchemy's driver suffix
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self.connected = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self, bus: ChangeBus):
+        self._task = asyncio.create_task(self._run(bus))
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.connected.wait(), 5)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, bus: ChangeBus):
+        import asyncpg
+
+        attempt, connected_before = 0, False
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError):
+                await asyncio.sleep(RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)])
+                attempt += 1
+                continue
+            attempt = 0
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            try:
+                await connection.add_listener(self.channel, lambda _connection, _pid, _channel, payload: bus.deliver(payload))
+                if connected_before:
+                    logger.info("Change bus reconnected; resyncing")
+                    bus.resync()
+                connected_before = True
+                self.connected.set()
+                while not lost.is_set():
+                    sending = asyncio.create_task(bus.next_messages())
+                    waiting = asyncio.create_task(lost.wait())
+                    done, _ = await asyncio.wait({sending, waiting}, return_when=asyncio.FIRST_COMPLETED)
+                    waiting.cancel()
+                    if sending not in done:
+                        sending.cancel()
+                        break
+                    try:
+                        await connection.executemany("SELECT pg_notify($1, $2)", [(self.channel, message) for message in sending.result()])
+                    except BaseException:
+                        # The whole batch is lost; resync the others once a send works again
+                        bus.others_missed = True
+                        raise
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                logger.exception("Change bus connection failed")
+            finally:
+                self.connected.clear()
+                with contextlib.suppress(Exception):
+                    await connection.close()
+            logger.warning("Change bus connection lost; reconnecting")
+
+
+def make_backend(name: str):
+    if name in ("", "none"):
+        return None
+    if name == "unix":
+        return UnixSocketBackend()
+    if name == "postgres":
+        from .database import DATABASE_URL
+        return PostgresBackend(DATABASE_URL)
+    raise ValueError(f"Unknown CHANGE_BUS {name!r} (expected none, unix or postgres)")
+
+
+change_bus = ChangeBus()
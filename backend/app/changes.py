@@ -0,0 +1,127 @@
+"""Change events published on the bus (``app/bus.py``) and how other workers apply them.
+
+The worker handling a write updates its own memory directly. These helpers
+then tell the other workers, which apply the same change:
+
+* ``scores``: entries committed by a submit, batch or import. Receivers add
+  them to the leaderboard index and invalidate cached leaderboard responses.
+  Score histograms are not touched: they already merge other workers' counts
+  through ``score_histogram_buckets``.
+* ``players``: ``active_players`` rows changed (with the presence registry
+  off). Receivers invalidate cached player lists.
+* ``presence`` / ``presence_left``: a heartbeat or leave handled by one
+  worker's presence registry, replayed into the others'.
+* ``session``: a session whose cached user is no longer valid (signup,
+  logout).
+* ``user``: a ``users`` row was updated. Receivers drop every cached session
+  of that user.
+
+After reconnecting, a worker cannot know what it missed. ``resync``
+therefore invalidates both response cache topics, clears the session cache
+and reloads the leaderboard index from the database.
+"""
+import asyncio
+import json
+from datetime import datetime
+
+# presence imports crud, which publishes through this module, so the registry is looked up at call time
+from . import models, presence
+from .bus import change_bus
+from .database import AsyncSessionLocal
+from .leaderboard_index import IndexedEntry, leaderboard_index
+from .response_cache import response_cache
+from .session_cache import session_cache
+
+# JSON bytes of rows per ``scores`` event, leaving room for the envelope in a Postgres NOTIFY payload (under 8000)
+SCORES_EVENT_BYTES = 7000
+
+_background: set[asyncio.Task] = set()
+
+
+def scores_recorded(entries: list[IndexedEntry]):
+    if not change_bus.running:
+        return
+    # Packed by size rather than count, since usernames vary in length
+    rows, size = [], 0
+    for entry in entries:
+        row = [entry.id, entry.user_id, entry.username, entry.score, models.GameMode(entry.mode).name, entry.played_at.isoformat()]
+        row_size = len(json.dumps(row, separators=(",", ":"))) + 1
+        if rows and size + row_size > SCORES_EVENT_BYTES:
+            change_bus.publish("scores", rows)
+            rows, size = [], 0
+        rows.append(row)
+        size += row_size
+    if rows:
+        change_bus.publish("scores", rows)
+
+
+def players_changed():
+    change_bus.publish("players")
+
+
+def player_seen(player):
+    change_bus.publish("presence", [player.id, player.username, player.current_score, models.GameMode(player.mode).name, player.started_at.isoformat()])
+
+
+def player_left(player_id: str):
+    change_bus.publish("presence_left", player_id)
+
+
+def session_invalidated(session_id: str):
+    change_bus.publish("session", session_id)
+
+
+def user_changed(user_id: str):
+    change_bus.publish("user", user_id)
+
+
+@change_bus.on("scores")
+def apply_scores(rows: list):
+    if leaderboard_index.ready:
+        for entry_id, user_id, username, score, mode, played_at in rows:
+            leaderboard_index.add(IndexedEntry(entry_id, user_id, username, score, models.GameMode[mode], datetime.fromisoformat(played_at)))
+    response_cache.bump("leaderboard")
+
+
+@change_bus.on("players")
+def apply_players(_):
+    response_cache.bump("players")
+
+
+@change_bus.on("presence")
+def apply_presence(row: list):
+    if presence.presence_registry.running:
+        player_id, username, score, mode, started_at = row
+        presence.presence_registry.heartbeat(player_id, username, score, models.GameMode[mode], datetime.fromisoformat(started_at))
+
+
+@change_bus.on("presence_left")
+def apply_presence_left(player_id: str):
+    if presence.presence_registry.running:
+        presence.presence_registry.remove(player_id)
+
+
+@change_bus.on("session")
+def apply_session(session_id: str):
+    session_cache.invalidate(session_id)
+
+
+@change_bus.on("user")
+def apply_user(user_id: str):
+    session_cache.invalidate_user(user_id)
+
+
+@change_bus.on("resync")
+def resync(_):
+    response_cache.bump("leaderboard")
+    response_cache.bump("players")
+    session_cache.clear()
+    if leaderboard_index.ready:
+        task = asyncio.get_running_loop().create_task(_reload_index())
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+
+async def _reload_index():
+    async with AsyncSessionLocal() as db:
+        await leaderboard_index.reload(db)
@@ -1,37 +1,66 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, desc, func
+from sqlalchemy import select, insert, update, delete, desc, func, and_, or_
 from sqlalchemy.exc import IntegrityError
-from . import models, schemas
-from datetime import datetime
+from sqlalchemy.engine import Row
+from sqlalchemy.dialects import postgresql, sqlite
+from . import best_scores, changes, models, player_stats, rollups, schemas
+from .histogram import score_histogram
+from .leaderboard_index import IndexedEntry, leaderboard_index
+from .passwords import password_hasher
+from .response_cache import response_cache
+from .session_cache import session_cache
+from datetime import datetime, timezone
 import uuid
 
 # User CRUD
 async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
-    db_user = models.User(
-        username=user.username,
-        email=user.email,
-        password_hash=user.password # In real app, hash this!
-    )
-    db.add(db_user)
+    values = {
+        "id": str(uuid.uuid4()),
+        "username": user.username,
+        "email": user.email,
+        "password_hash": await password_hasher.hash(user.password),
+        "created_at": datetime.now(timezone.utc),
+    }
+    await db.execute(insert(models.User).values(**values))
     await db.commit()
-    await db.refresh(db_user)
-    return db_user
+    # Built from the inserted values and never added to the session, so the
+    # commit has nothing to expire and no refresh SELECT is needed
+    return models.User(**values)
 
 async def get_user_by_email(db: AsyncSession, email: str) -> models.User | None:
     result = await db.execute(select(models.User).where(models.User.email == email))
     return result.scalars().first()
 
+async def get_users_by_email_or_username(db: AsyncSession, email: str, username: str) -> list[models.User]:
+    """Users holding ``email`` or ``username``, in one query for signup's uniqueness checks."""
+    result = await db.execute(select(models.User).where(or_(models.User.email == email, models.User.username == username)))
+    return list(result.scalars().all())
+
 async def get_user_by_username(db: AsyncSession, username: str) -> models.User | None:
     result = await db.execute(select(models.User).where(models.User.username == username))
     return result.scalars().first()
 
-async def verify_password(db: AsyncSession, email: str, password: str) -> bool:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> models.User | None:
     user = await get_user_by_email(db, email)
-    if not user:
-        return False
-    return user.password_hash == password
+    if not await password_hasher.verify(password, user.password_hash if user else None):
+        return None
+    if password_hasher.needs_rehash(user.password_hash):
+        # Upgrade plaintext or outdated-cost hashes now that we know the password
+        db.expunge(user)
+        user.password_hash = await password_hasher.hash(password)
+        await update_user(db, user.id, password_hash=user.password_hash)
+    return user
+
+async def update_user(db: AsyncSession, user_id: str, **values):
+    """Update a user row; every write to ``users`` goes through here so no worker keeps serving the old user."""
+    await db.execute(update(models.User).where(models.User.id == user_id).values(**values))
+    await db.commit()
+    session_cache.invalidate_user(user_id)
+    changes.user_changed(user_id)
+
+async def verify_password(db: AsyncSession, email: str, password: str) -> bool:
+    return await authenticate_user(db, email, password) is not None
 
-# Active Player CRUD
 async def create_active_player(db: AsyncSession, player: schemas.ActivePlayer) -> models.ActivePlayer:
     # Check if exists first to update or insert
     result = await db.execute(select(models.ActivePlayer).where(models.ActivePlayer.id == player.id))
@@ -42,6 +71,8 @@ async def create_active_player(db: AsyncSession, player: schemas.ActivePlayer) -
         existing.mode = player.mode
         # existing.started_at = player.started_at
         await db.commit()
+        response_cache.bump("players")
+        changes.players_changed()
         await db.refresh(existing)
         return existing
     
@@ -54,11 +85,16 @@ async def create_active_player(db: AsyncSession, player: schemas.ActivePlayer) -
     )
     db.add(db_player)
     await db.commit()
+    response_cache.bump("players")
+    changes.players_changed()
+    await db.refresh(db_player)
     return db_player
 
-async def get_active_players(db: AsyncSession) -> list[models.ActivePlayer]:
-    result = await db.execute(select(models.ActivePlayer))
-    return list(result.scalars().all())
+async def get_active_players(db: AsyncSession) -> list[Row]:
+    # Plain rows: the list endpoints encode them without building ORM objects
+    player = models.ActivePlayer
+    result = await db.execute(select(player.id, player.username, player.current_score, player.mode, player.started_at))
+    return list(result.all())
 
 async def get_active_player(db: AsyncSession, player_id: str) -> models.ActivePlayer | None:
     result = await db.execute(select(models.ActivePlayer).where(models.ActivePlayer.id == player_id))
@@ -67,23 +103,83 @@ async def get_active_player(db: AsyncSession, player_id: str) -> models.ActivePl
 async def remove_active_player(db: AsyncSession, player_id: str):
     await db.execute(delete(models.ActivePlayer).where(models.ActivePlayer.id == player_id))
     await db.commit()
+    response_cache.bump("players")
+    changes.players_changed()
+
+async def replace_active_players(db: AsyncSession, players: list) -> None:
+    # Snapshot of the in-memory presence registry: the table becomes exactly `players`
+    await db.execute(delete(models.ActivePlayer))
+    if players:
+        await db.execute(insert(models.ActivePlayer).values([
+            {
+                "id": player.id,
+                "username": player.username,
+                "current_score": player.current_score,
+                "mode": player.mode,
+                "started_at": player.started_at,
+            }
+            for player in players
+        ]))
+    await db.commit()
 
 # Leaderboard CRUD
-async def submit_score(db: AsyncSession, user_id: str, username: str, score: int, mode: schemas.GameMode) -> int:
-    # Create entry
-    entry = models.LeaderboardEntry(
+def new_leaderboard_entry(user_id: str, username: str, score: int, mode: schemas.GameMode) -> IndexedEntry:
+    return IndexedEntry(
+        id=str(uuid.uuid4()),
         user_id=user_id,
         username=username,
         score=score,
-        mode=mode
+        mode=models.GameMode(mode),
+        played_at=datetime.now(timezone.utc)
     )
-    db.add(entry)
-    await db.commit() # Commit to save the score
-    
+
+async def submit_score(db: AsyncSession, user_id: str, username: str, score: int, mode: schemas.GameMode) -> int:
+    ranks = await submit_scores(db, [new_leaderboard_entry(user_id, username, score, mode)])
+    return ranks[0]
+
+async def submit_scores(db: AsyncSession, entries: list[IndexedEntry]) -> list[int]:
+    await record_entries(db, entries)
+    if leaderboard_index.ready:
+        return [leaderboard_index.rank_of(entry.mode, entry.score) for entry in entries]
+    return [await get_rank(db, entry.mode, entry.score) for entry in entries]
+
+async def record_entries(db: AsyncSession, entries: list[IndexedEntry], skip_existing: bool = False) -> list[IndexedEntry]:
+    """Insert ``entries`` with their rollups, bests and stats in one commit, then update the in-memory views.
+
+    With ``skip_existing``, entries whose id is already stored are left out
+    (and returned without them), so re-importing an export adds nothing twice.
+    """
+    table = models.LeaderboardEntry.__table__
+    if skip_existing:
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        query = dialect.insert(table).on_conflict_do_nothing(index_elements=[table.c.id]).returning(table.c.id)
+        inserted = set((await db.execute(query, [entry._asdict() for entry in entries])).scalars())
+        entries = [entry for entry in entries if entry.id in inserted]
+    else:
+        # One multi-row INSERT and one commit for the whole batch
+        await db.execute(insert(table).values([entry._asdict() for entry in entries]))
+    await rollups.record(db, entries)
+    await best_scores.record(db, entries)
+    await player_stats.record(db, entries)
+    await db.commit()
+    response_cache.bump("leaderboard")
+
+    if score_histogram.running:
+        for entry in entries:
+            score_histogram.add(entry.mode, entry.score)
+
+    # The index is only updated once the rows are durable, so it never runs ahead of the DB.
+    if leaderboard_index.ready:
+        for entry in entries:
+            leaderboard_index.add(entry)
+    # Other workers apply the same to their index and response cache
+    changes.scores_recorded(entries)
+    return entries
+
+async def get_rank(db: AsyncSession, mode: schemas.GameMode, score: int) -> int:
     # Calculate rank
     # Rank = (count of scores > this score) + 1
-    # This might be slow for large tables, but okay for now.
-    # Alternatively, fetch all and calculate in python like before, but SQL is better.
+    # This is a range scan per call; the in-memory index avoids it once loaded.
     
     # We want rank within the specific mode
     query = select(func.count()).select_from(models.LeaderboardEntry).where(
@@ -95,10 +191,144 @@ async def submit_score(db: AsyncSession, user_id: str, username: str, score: int
     
     return higher_scores_count + 1
 
-async def get_leaderboard(db: AsyncSession, mode: schemas.GameMode | None = None, limit: int = 10) -> list[models.LeaderboardEntry]:
-    query = select(models.LeaderboardEntry).order_by(desc(models.LeaderboardEntry.score)).limit(limit)
+async def get_percentile(db: AsyncSession, mode: schemas.GameMode, score: int) -> float:
+    """Percentage of ``mode`` games scoring below ``score``; exact (one COUNT) when the histogram is off."""
+    if score_histogram.running:
+        return score_histogram.percentile(mode, score)
+    entry = models.LeaderboardEntry
+    lower, total = (await db.execute(
+        select(func.count().filter(entry.score < score), func.count()).where(entry.mode == mode)
+    )).one()
+    return 100 * lower / total if total else 0.0
+
+LeaderboardCursor = tuple[int, datetime, str]
+LEADERBOARD_ORDER = (desc(models.LeaderboardEntry.score), models.LeaderboardEntry.played_at, models.LeaderboardEntry.id)
+
+def entry_columns(table=models.LeaderboardEntry):
+    """The ``schemas.LeaderboardEntry`` fields of entries, rollups or bests, for Core selects."""
+    return (table.id, table.user_id, table.username, table.score, table.mode, table.played_at)
+
+def cursor_of(entry) -> LeaderboardCursor:
+    return (entry.score, entry.played_at, entry.id)
+
+def _after(cursor: LeaderboardCursor, entry=models.LeaderboardEntry):
+    """Rows of ``entry`` (entries, rollups or bests) that follow ``(score, played_at, id)`` in leaderboard order."""
+    score, played_at, entry_id = cursor
+    # The leading score bound lets the planner start the index scan at the cursor
+    return and_(entry.score <= score, or_(
+        entry.score < score,
+        entry.played_at > played_at,
+        and_(entry.played_at == played_at, entry.id > entry_id),
+    ))
+
+def _before(cursor: LeaderboardCursor):
+    score, played_at, entry_id = cursor
+    entry = models.LeaderboardEntry
+    return and_(entry.score >= score, or_(
+        entry.score > score,
+        entry.played_at < played_at,
+        and_(entry.played_at == played_at, entry.id < entry_id),
+    ))
+
+async def get_leaderboard(
+    db: AsyncSession,
+    mode: schemas.GameMode | None = None,
+    limit: int = 10,
+    after: LeaderboardCursor | None = None,
+    period: schemas.Period = schemas.Period.ALL,
+    distinct: bool = False
+) -> list[Row] | list[IndexedEntry]:
+    """A page of the leaderboard, starting after the keyset cursor ``after`` if given.
+
+    Rows carry the ``entry_columns`` only; no ORM objects are built.
+
+    Day and week boards come from the rollups of the current period; a
+    ``distinct`` board (each player's best entry only) from ``user_best_scores``.
+    """
+    if distinct:
+        best = models.UserBestScore
+        query = select(*entry_columns(best)).order_by(*best_scores.BEST_ORDER).limit(limit)
+        if mode:
+            query = query.where(best.mode == mode)
+        if after is not None:
+            query = query.where(_after(after, best))
+        result = await db.execute(query)
+        return list(result.all())
+
+    if period != schemas.Period.ALL:
+        kind = models.Period(period.value)
+        rollup = models.LeaderboardRollup
+        query = select(*entry_columns(rollup)).where(
+            rollup.period == kind,
+            rollup.period_start == rollups.period_start(kind, datetime.now(timezone.utc))
+        ).order_by(*rollups.ROLLUP_ORDER).limit(limit)
+        if mode:
+            query = query.where(rollup.mode == mode)
+        if after is not None:
+            query = query.where(_after(after, rollup))
+        result = await db.execute(query)
+        return list(result.all())
+
+    if leaderboard_index.ready:
+        return leaderboard_index.page(mode, after, limit)
+
+    query = select(*entry_columns()).order_by(*LEADERBOARD_ORDER).limit(limit)
     if mode:
         query = query.where(models.LeaderboardEntry.mode == mode)
-    
+    if after is not None:
+        query = query.where(_after(after))
+
     result = await db.execute(query)
-    return list(result.scalars().all())
+    return list(result.all())
+
+async def get_best_entry(db: AsyncSession, user_id: str, mode: schemas.GameMode) -> models.LeaderboardEntry | IndexedEntry | None:
+    if leaderboard_index.ready:
+        return leaderboard_index.modes[models.GameMode(mode)].best_of(user_id)
+    result = await db.execute(
+        select(models.LeaderboardEntry)
+        .where(models.LeaderboardEntry.user_id == user_id, models.LeaderboardEntry.mode == mode)
+        .order_by(*LEADERBOARD_ORDER)
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def get_leaderboard_around(db: AsyncSession, user_id: str, mode: schemas.GameMode, k: int) -> list[tuple[models.LeaderboardEntry | IndexedEntry, int]] | None:
+    """Up to ``k`` entries either side of the user's best entry in ``mode``, each with its rank.
+
+    Returns ``None`` if the user has no entry in ``mode``.
+    """
+    best = await get_best_entry(db, user_id, mode)
+    if best is None:
+        return None
+
+    if leaderboard_index.ready:
+        index = leaderboard_index.modes[models.GameMode(mode)]
+        window = index.around(index.position_of(best), k)
+        return [(entry, index.rank_of(entry.score)) for entry in window]
+
+    cursor = cursor_of(best)
+    entry = models.LeaderboardEntry
+    above = await db.execute(
+        select(entry).where(entry.mode == mode, _before(cursor))
+        .order_by(entry.score, desc(entry.played_at), desc(entry.id)).limit(k)
+    )
+    below = await db.execute(
+        select(entry).where(entry.mode == mode, _after(cursor)).order_by(*LEADERBOARD_ORDER).limit(k)
+    )
+    window = list(reversed(above.scalars().all())) + [best] + list(below.scalars().all())
+
+    # Equal scores share a rank, so the rank of the window's top score and the
+    # window's start position give every rank in it. Both come from one scan
+    # over the index range above the window; this COUNT is the part of the SQL
+    # fallback that grows with depth (the in-memory index answers in O(log S)).
+    first = window[0]
+    higher, before = (await db.execute(
+        select(func.count().filter(entry.score > first.score), func.count().filter(_before(cursor_of(first))))
+        .where(entry.mode == mode, entry.score >= first.score)
+    )).one()
+    top_rank, start = higher + 1, before + 1
+    ranks, first_seen = [], {}
+    for offset, row in enumerate(window):
+        first_seen.setdefault(row.score, offset)
+        ranks.append(top_rank if row.score == window[0].score else start + first_seen[row.score])
+    return list(zip(window, ranks))
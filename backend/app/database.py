@@ -1,16 +1,31 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 import os
 from contextlib import asynccontextmanager
 
+from .metrics import METRICS, TimedQueuePool, instrument_engine
+
 # Default to sqlite for local dev if no url provided
 # Note: For SQLite with asyncio, use "sqlite+aiosqlite:///"
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./snake_arena.db")
 
-# Detect if using Postgres or SQLite to adjust arguments if needed
-connect_args = {}
-if "sqlite" in DATABASE_URL:
-    connect_args = {"check_same_thread": False}
+# Optional replica for GET routes; unset means a read-only pool on the primary
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+# Engine profile (see the Configuration table in README.md)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
 
 # Fix for Render/Heroku using postgres:// but SQLAlchemy wanting postgresql+asyncpg://
 if DATABASE_URL.startswith("postgres://"):
@@ -20,11 +35,73 @@ elif DATABASE_URL.startswith("postgresql://") and "asyncpg" not in DATABASE_URL:
      DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
 
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True, # Set to False in production
-    connect_args=connect_args
-)
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def is_in_memory(url: str) -> bool:
+    return url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith("sqlite+aiosqlite:"))
+
+
+def make_engine(url: str = DATABASE_URL, **kwargs) -> AsyncEngine:
+    """Build an engine with the profile above; ``kwargs`` override it."""
+    options = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    sqlite = url.startswith("sqlite")
+    in_memory = is_in_memory(url)
+    if sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+    else:
+        # asyncpg caches prepared statements per connection; set 0 behind pgbouncer
+        options["connect_args"] = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    if not in_memory:
+        # An in-memory SQLite database lives in a single connection, so it has no pool to size
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+        if METRICS:
+            # Same pool, plus checkout wait times for /metrics
+            options["poolclass"] = TimedQueuePool
+    options.update(kwargs)
+
+    engine = create_async_engine(url, **options)
+    if sqlite:
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+def read_only_url(url: str) -> str:
+    """Open a SQLite file read-only; other databases are returned unchanged."""
+    parsed = make_url(url)
+    if not parsed.drivername.startswith("sqlite") or parsed.query.get("uri"):
+        return url
+    parsed = parsed.set(database=f"file:{parsed.database}", query={**parsed.query, "mode": "ro", "uri": "true"})
+    return parsed.render_as_string(hide_password=False)
+
+
+engine = make_engine()
+
+# Reads get their own pool so GET traffic never waits behind writers for a
+# connection. An in-memory SQLite database exists only inside the primary's
+# single connection, so there the read factory shares the primary engine.
+if DATABASE_READ_URL:
+    read_engine = make_engine(DATABASE_READ_URL)
+elif is_in_memory(DATABASE_URL):
+    read_engine = engine
+else:
+    read_engine = make_engine(read_only_url(DATABASE_URL))
+
+if METRICS:
+    instrument_engine(engine, "primary")
+    if read_engine is not engine:
+        instrument_engine(read_engine, "read")
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -33,6 +110,13 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
+)
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
@@ -42,3 +126,10 @@ async def init_db():
     from .models import Base
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips existing tables, so add indexes introduced since they were created
+        await conn.run_sync(create_missing_indexes, Base.metadata)
+
+def create_missing_indexes(connection, metadata):
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
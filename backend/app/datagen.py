@@ -0,0 +1,252 @@
+"""Streaming synthetic data for capacity planning and index tuning.
+
+Generates users, their leaderboard entries and optionally active players,
+then rebuilds the derived tables (rollups, personal bests, player stats,
+score histograms) exactly as the rebuild CLIs do. Rows are produced lazily
+and written in ``--batch-size`` executemany batches with a commit per batch,
+so memory stays flat whether the run writes a thousand rows or a hundred
+million.
+
+Every value comes from a random stream seeded by ``--seed`` and the user's
+number (not by batch or database), so the same seed and ``--end`` give the
+same rows on SQLite and Postgres, at any batch size. ``--end`` defaults to
+the start of the current hour and is printed, so a run can be repeated.
+
+Distributions:
+
+* ``--activity``: ``uniform`` gives every user ``--scores-per-user`` games on
+  average; ``zipf`` keeps that average but skews it so player 0 plays most.
+* ``--score-dist``: ``uniform`` over ``0..--max-score``, or ``zipf`` where
+  score ``k`` has weight ``1 / (k + 1) ** --zipf-s`` (many short games).
+* ``--played-at``: ``uniform`` over the ``--days`` before ``--end``, or
+  ``recent``, weighted towards ``--end`` (exponential, mean a quarter of the
+  span).
+
+Every user's password is ``password``, hashed once with the current scrypt
+cost and a seed-derived salt.
+
+Usage:
+    uv run python -m app.datagen --users 100000 --scores-per-user 50 --activity zipf --played-at recent
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy import delete, func, insert, select
+
+from . import best_scores, histogram, models, player_stats, rollups
+from .passwords import SALT_BYTES, hash_password, password_hasher
+
+PASSWORD = "password"
+MODES = list(models.GameMode)
+
+
+def start_of_hour() -> datetime:
+    return datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+@dataclass(frozen=True)
+class Profile:
+    users: int = 1000
+    scores_per_user: float = 20.0
+    activity: str = "uniform"
+    score_dist: str = "zipf"
+    max_score: int = 5000
+    zipf_s: float = 1.1
+    played_at: str = "uniform"
+    days: int = 30
+    end: datetime = field(default_factory=start_of_hour)
+    active_players: int = 0
+    seed: int = 42
+
+
+def _rng(profile: Profile, stream: str, i: int = 0) -> random.Random:
+    # String seeds are hashed with SHA-512, so streams are stable across runs and platforms
+    return random.Random(f"{profile.seed}:{stream}:{i}")
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def user_id(profile: Profile, i: int) -> str:
+    return _uuid(_rng(profile, "user", i))
+
+
+def password_hash(profile: Profile) -> str:
+    salt = _rng(profile, "salt").randbytes(SALT_BYTES)
+    return hash_password(PASSWORD, password_hasher.n, password_hasher.r, password_hasher.p, salt=salt)
+
+
+def users(profile: Profile, stored_hash: str) -> Iterator[dict]:
+    created_at = profile.end - timedelta(days=profile.days)
+    for i in range(profile.users):
+        yield {
+            "id": user_id(profile, i),
+            "username": f"Player{i}",
+            "email": f"player{i}@example.com",
+            "password_hash": stored_hash,
+            "created_at": created_at,
+        }
+
+
+def _game_counts(profile: Profile) -> Callable[[int, random.Random], int]:
+    """Games for user ``i``: randomized rounding of its expected count, so totals average out."""
+    if profile.activity == "zipf":
+        harmonic = sum(1 / (i + 1) ** profile.zipf_s for i in range(profile.users))
+        scale = profile.scores_per_user * profile.users / harmonic
+        expected = lambda i: scale / (i + 1) ** profile.zipf_s
+    else:
+        expected = lambda i: profile.scores_per_user
+
+    def count(i: int, rng: random.Random) -> int:
+        mean = expected(i)
+        return int(mean) + (rng.random() < mean - int(mean))
+    return count
+
+
+def _score_sampler(profile: Profile) -> Callable[[random.Random], int]:
+    if profile.score_dist == "uniform":
+        return lambda rng: rng.randint(0, profile.max_score)
+    cumulative = list(itertools.accumulate(1 / (k + 1) ** profile.zipf_s for k in range(profile.max_score + 1)))
+    total = cumulative[-1]
+    return lambda rng: min(bisect.bisect_left(cumulative, rng.random() * total), profile.max_score)
+
+
+def _played_at_sampler(profile: Profile) -> Callable[[random.Random], datetime]:
+    span = profile.days * 86400
+    if profile.played_at == "recent":
+        offset = lambda rng: rng.expovariate(4 / span) % span
+    else:
+        offset = lambda rng: rng.uniform(0, span)
+    # Whole microseconds, which both SQLite and Postgres store exactly
+    return lambda rng: profile.end - timedelta(microseconds=int(offset(rng) * 1_000_000))
+
+
+def entries(profile: Profile) -> Iterator[dict]:
+    games, score, played_at = _game_counts(profile), _score_sampler(profile), _played_at_sampler(profile)
+    for i in range(profile.users):
+        rng = _rng(profile, "entries", i)
+        uid, username = user_id(profile, i), f"Player{i}"
+        for _ in range(games(i, rng)):
+            yield {
+                "id": _uuid(rng),
+                "user_id": uid,
+                "username": username,
+                "score": score(rng),
+                "mode": rng.choice(MODES),
+                "played_at": played_at(rng),
+            }
+
+
+def active_players(profile: Profile) -> Iterator[dict]:
+    for i in range(min(profile.active_players, profile.users)):
+        rng = _rng(profile, "player", i)
+        yield {
+            "id": user_id(profile, i),
+            "username": f"Player{i}",
+            "current_score": rng.randint(0, 500),
+            "mode": rng.choice(MODES),
+            "started_at": profile.end - timedelta(seconds=rng.randint(0, 600)),
+        }
+
+
+def batches(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+async def write(session_factory, model, rows: Iterable[dict], batch_size: int, log=print) -> int:
+    """Insert ``rows`` in committed executemany batches, logging progress and rows/s."""
+    table = model.__table__
+    total, start, reported = 0, time.perf_counter(), time.perf_counter()
+    async with session_factory() as db:
+        for batch in batches(rows, batch_size):
+            await db.execute(insert(table), batch)
+            await db.commit()
+            total += len(batch)
+            if time.perf_counter() - reported > 5:
+                reported = time.perf_counter()
+                log(f"  {table.name}: {total:,} rows ({total / (reported - start):,.0f} rows/s)")
+    elapsed = time.perf_counter() - start
+    log(f"{table.name}: {total:,} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+    return total
+
+
+async def rebuild_derived(session_factory, log=print):
+    """The derived tables, from the generated entries."""
+    for name, rebuild in (
+        ("leaderboard_rollups", rollups.backfill),
+        ("user_best_scores", best_scores.backfill),
+        ("player_stats", player_stats.rebuild),
+    ):
+        start = time.perf_counter()
+        await rebuild(session_factory)
+        log(f"{name}: rebuilt in {time.perf_counter() - start:.1f}s")
+    async with session_factory() as db:
+        await db.execute(delete(models.ScoreHistogramBucket))
+        await histogram.build(db, histogram.score_histogram.bucket_width, histogram.score_histogram.overflow)
+        await db.commit()
+
+
+async def generate(session_factory, profile: Profile, batch_size: int = 10000, derived: bool = True, log=print) -> dict[str, int]:
+    """Write ``profile`` into an empty database; returns rows written per table."""
+    async with session_factory() as db:
+        if (await db.execute(select(func.count()).select_from(models.User))).scalar():
+            raise ValueError("The database already has users; generate into an empty one")
+
+    counts = {
+        "users": await write(session_factory, models.User, users(profile, password_hash(profile)), batch_size, log),
+        "leaderboard_entries": await write(session_factory, models.LeaderboardEntry, entries(profile), batch_size, log),
+        "active_players": await write(session_factory, models.ActivePlayer, active_players(profile), batch_size, log),
+    }
+    if derived:
+        await rebuild_derived(session_factory, log)
+    return counts
+
+
+async def main():
+    from .database import AsyncSessionLocal, engine, init_db
+
+    parser = argparse.ArgumentParser(description="Generate synthetic users, scores and active players in bulk.")
+    parser.add_argument("--users", type=int, default=Profile.users)
+    parser.add_argument("--scores-per-user", type=float, default=Profile.scores_per_user)
+    parser.add_argument("--activity", choices=("uniform", "zipf"), default=Profile.activity)
+    parser.add_argument("--score-dist", choices=("uniform", "zipf"), default=Profile.score_dist)
+    parser.add_argument("--max-score", type=int, default=Profile.max_score)
+    parser.add_argument("--zipf-s", type=float, default=Profile.zipf_s, help="zipf exponent for --activity and --score-dist")
+    parser.add_argument("--played-at", choices=("uniform", "recent"), default=Profile.played_at)
+    parser.add_argument("--days", type=int, default=Profile.days)
+    parser.add_argument("--end", type=datetime.fromisoformat, help="latest played_at, ISO 8601 (default: start of the current hour, UTC)")
+    parser.add_argument("--active-players", type=int, default=Profile.active_players)
+    parser.add_argument("--seed", type=int, default=Profile.seed)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--skip-derived", action="store_true", help="leave rollups, bests, stats and histograms to their rebuild commands")
+    args = parser.parse_args()
+
+    end = args.end or start_of_hour()
+    profile = Profile(
+        users=args.users, scores_per_user=args.scores_per_user, activity=args.activity, score_dist=args.score_dist,
+        max_score=args.max_score, zipf_s=args.zipf_s, played_at=args.played_at, days=args.days,
+        end=end if end.tzinfo else end.replace(tzinfo=timezone.utc), active_players=args.active_players, seed=args.seed,
+    )
+    print(f"Generating seed {profile.seed} ending {profile.end.isoformat()}")
+    await init_db()
+    try:
+        await generate(AsyncSessionLocal, profile, args.batch_size, derived=not args.skip_derived)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
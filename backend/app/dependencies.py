@@ -0,0 +1,81 @@
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import Cookie, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import crud, database
+from .database import get_db
+from .session_cache import CachedUser, session_cache
+
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# Comma-separated; the /admin routes are closed to everyone when unset
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+
+class ReadYourWrites:
+    """Sessions that wrote recently and should read from the primary.
+
+    A replica may lag behind the primary, so for ``window`` seconds after a
+    session's own write its GET requests skip the read pool and see the write.
+    """
+
+    def __init__(self, window: float = READ_YOUR_WRITES_SECONDS, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        # Every entry gets the same window, so insertion order is expiry order
+        self._until: OrderedDict[str, float] = OrderedDict()
+
+    def mark(self, session_id: str | None):
+        if not session_id:
+            return
+        self._until[session_id] = self.clock() + self.window
+        self._until.move_to_end(session_id)
+
+    def pinned(self, session_id: str | None) -> bool:
+        now = self.clock()
+        while self._until and next(iter(self._until.values())) <= now:
+            self._until.popitem(last=False)
+        return session_id is not None and session_id in self._until
+
+    def clear(self):
+        self._until.clear()
+
+
+read_your_writes = ReadYourWrites()
+
+
+async def get_read_db(
+    session_id: str | None = Cookie(default=None),
+    db: AsyncSession = Depends(get_db)
+):
+    # Sessions are lazy, so the unused primary one never checks out a connection
+    if read_your_writes.pinned(session_id):
+        yield db
+        return
+    async with database.ReadSessionLocal() as session:
+        yield session
+
+
+async def get_current_user(
+    session_id: str | None = Cookie(default=None),
+    db: AsyncSession = Depends(get_db)
+) -> CachedUser:
+    if not session_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    user = session_cache.get(session_id)
+    if user is None:
+        # The session opened by get_db only touches the database on a miss
+        db_user = await crud.get_user_by_email(db, session_id)
+        if not db_user:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        user = CachedUser.from_model(db_user)
+        session_cache.put(session_id, user)
+    return user
+
+
+async def get_admin_user(user: CachedUser = Depends(get_current_user)) -> CachedUser:
+    if user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
@@ -0,0 +1,22 @@
+"""Server-side snake simulation.
+
+``rules`` is a direct port of ``frontend/src/lib/gameLogic.ts`` that steps one
+game at a time; ``batch`` steps thousands of boards per tick with NumPy.
+"""
+from .rules import (
+    GRID_SIZE,
+    INITIAL_SNAKE_LENGTH,
+    FOOD_SCORE,
+    DIRECTIONS,
+    GameState,
+    create_initial_state,
+    generate_food,
+    get_next_position,
+    check_wall_collision,
+    check_self_collision,
+    is_opposite_direction,
+    move_snake,
+    change_direction,
+    get_ai_direction,
+)
+from .batch import BatchEngine
@@ -0,0 +1,189 @@
+"""Vectorised snake simulation over many boards at once.
+
+Every board lives in a row of a few NumPy arrays:
+
+* ``occupied``: flattened ``grid_size * grid_size`` occupancy grid per board.
+* ``body``: ring buffer of occupied cell indices; ``head`` points at the head
+  slot and the tail is ``length - 1`` slots behind it, so a move writes one
+  slot and clears at most one cell instead of shifting the whole body.
+
+A tick moves every live board with a handful of array operations. Rules match
+:mod:`app.engine.rules`: walls boards die on leaving the grid, pass-through
+boards wrap, and running into any body cell (tail included, as in the TS
+``moveSnake``) ends the game. Boards in both modes can share one engine.
+"""
+from typing import Sequence
+
+import numpy as np
+
+from ..models import GameMode
+from .rules import DIRECTIONS, FOOD_SCORE, GRID_SIZE, INITIAL_SNAKE_LENGTH, GameState
+
+UP, DOWN, LEFT, RIGHT = range(4)
+DX = np.array([0, 0, -1, 1])
+DY = np.array([-1, 1, 0, 0])
+OPPOSITE = np.array([DOWN, UP, RIGHT, LEFT])
+
+
+class BatchEngine:
+    """Steps ``num_boards`` independent games in lockstep.
+
+    Directions are ints indexing :data:`app.engine.rules.DIRECTIONS`
+    (``UP``, ``DOWN``, ``LEFT``, ``RIGHT``).
+    """
+
+    def __init__(self, num_boards: int, modes: GameMode | Sequence[GameMode] = GameMode.WALLS, grid_size: int = GRID_SIZE, seed: int | None = None):
+        if isinstance(modes, str):
+            modes = [modes] * num_boards
+        self.num_boards = num_boards
+        self.grid_size = grid_size
+        self.cells = grid_size * grid_size
+        self.rng = np.random.default_rng(seed)
+        self.walls = np.array([GameMode(mode) == GameMode.WALLS for mode in modes], dtype=bool)
+
+        self.occupied = np.zeros((num_boards, self.cells), dtype=bool)
+        self.body = np.zeros((num_boards, self.cells), dtype=np.int32)
+        self.head = np.zeros(num_boards, dtype=np.int64)
+        self.length = np.zeros(num_boards, dtype=np.int64)
+        self.direction = np.zeros(num_boards, dtype=np.int64)
+        self.next_direction = np.zeros(num_boards, dtype=np.int64)
+        self.score = np.zeros(num_boards, dtype=np.int64)
+        self.alive = np.zeros(num_boards, dtype=bool)
+        self.food = np.zeros(num_boards, dtype=np.int64)
+        self.reset()
+
+    def reset(self, boards: np.ndarray | None = None):
+        """Start new games on ``boards`` (all boards when omitted)."""
+        boards = np.arange(self.num_boards) if boards is None else np.asarray(boards, dtype=np.int64)
+        if boards.size == 0:
+            return
+        start = self.grid_size // 2
+        initial = start * self.grid_size + start - np.arange(INITIAL_SNAKE_LENGTH)
+
+        self.occupied[boards] = False
+        self.occupied[boards[:, None], initial[None, :]] = True
+        # Slot i holds segment (length - 1 - i), so the head sits in the last used slot
+        self.body[boards[:, None], np.arange(INITIAL_SNAKE_LENGTH)[None, :]] = initial[::-1]
+        self.head[boards] = INITIAL_SNAKE_LENGTH - 1
+        self.length[boards] = INITIAL_SNAKE_LENGTH
+        self.direction[boards] = RIGHT
+        self.next_direction[boards] = RIGHT
+        self.score[boards] = 0
+        self.alive[boards] = True
+        self._place_food(boards)
+
+    def change_direction(self, directions: np.ndarray):
+        """Queue a direction per board, ignoring reversals like ``changeDirection``."""
+        directions = np.asarray(directions, dtype=np.int64)
+        allowed = self.alive & (directions != OPPOSITE[self.direction])
+        self.next_direction = np.where(allowed, directions, self.next_direction)
+
+    def step(self, directions: np.ndarray | None = None) -> np.ndarray:
+        """Advance every live board one tick; returns the boards that just ended."""
+        if directions is not None:
+            self.change_direction(directions)
+
+        boards = np.flatnonzero(self.alive)
+        g = self.grid_size
+        d = self.next_direction[boards]
+        head_cell = self.body[boards, self.head[boards]]
+        nx = head_cell % g + DX[d]
+        ny = head_cell // g + DY[d]
+
+        walls = self.walls[boards]
+        nx = np.where(walls, nx, nx % g)
+        ny = np.where(walls, ny, ny % g)
+        out = (nx < 0) | (nx >= g) | (ny < 0) | (ny >= g)
+        cell = np.where(out, 0, ny * g + nx)
+        dead = out | self.occupied[boards, cell]
+
+        ended = boards[dead]
+        self.alive[ended] = False
+
+        keep = ~dead
+        boards, cell, d = boards[keep], cell[keep], d[keep]
+        ate = cell == self.food[boards]
+
+        # Vacate tails first; the new head can never land on one because the
+        # collision check above counted the tail as occupied.
+        movers = boards[~ate]
+        tail_slot = (self.head[movers] - self.length[movers] + 1) % self.cells
+        self.occupied[movers, self.body[movers, tail_slot]] = False
+
+        new_head = (self.head[boards] + 1) % self.cells
+        self.body[boards, new_head] = cell
+        self.head[boards] = new_head
+        self.occupied[boards, cell] = True
+        self.direction[boards] = d
+
+        eaters = boards[ate]
+        self.length[eaters] += 1
+        self.score[eaters] += FOOD_SCORE
+        if eaters.size:
+            # A board with no free cell left is complete and stops here too
+            ended = np.concatenate([ended, self._place_food(eaters)])
+        return ended
+
+    def ai_directions(self) -> np.ndarray:
+        """Vectorised ``getAIDirection`` for every board."""
+        g = self.grid_size
+        boards = np.arange(self.num_boards)
+        head_cell = self.body[boards, self.head]
+        tail_cell = self.body[boards, (self.head - self.length + 1) % self.cells]
+        candidates = np.arange(4)
+
+        nx = (head_cell % g)[:, None] + DX[candidates][None, :]
+        ny = (head_cell // g)[:, None] + DY[candidates][None, :]
+        wrap = ~self.walls[:, None]
+        nx = np.where(wrap, nx % g, nx)
+        ny = np.where(wrap, ny % g, ny)
+        out = (nx < 0) | (nx >= g) | (ny < 0) | (ny >= g)
+        cell = np.where(out, 0, ny * g + nx)
+        # The AI checks against the body minus its tail, which moves out of the way
+        blocked = self.occupied[boards[:, None], cell] & (cell != tail_cell[:, None])
+        safe = ~out & ~blocked & (candidates[None, :] != OPPOSITE[self.direction][:, None])
+
+        food_x, food_y = self.food % g, self.food // g
+        distance = np.abs(nx - food_x[:, None]) + np.abs(ny - food_y[:, None])
+        cost = np.where(safe, distance, np.iinfo(np.int64).max)
+        # Stable sort keeps UP, DOWN, LEFT, RIGHT order among equal distances, like the TS sort
+        order = np.argsort(cost, axis=1, kind="stable")
+        valid = safe.sum(axis=1)
+
+        explore = (self.rng.random(self.num_boards) < 0.1) & (valid > 1)
+        choice = np.where(explore, order[:, 1], order[:, 0])
+        return np.where(valid == 0, self.direction, choice)
+
+    def snake(self, board: int) -> list[tuple[int, int]]:
+        """Segments of ``board`` from head to tail as ``(x, y)``."""
+        slots = (self.head[board] - np.arange(self.length[board])) % self.cells
+        cells = self.body[board, slots]
+        return [(int(c % self.grid_size), int(c // self.grid_size)) for c in cells]
+
+    def snapshot(self, board: int) -> GameState:
+        food = int(self.food[board])
+        return GameState(
+            snake=self.snake(board),
+            food=(food % self.grid_size, food // self.grid_size),
+            direction=DIRECTIONS[self.direction[board]],
+            next_direction=DIRECTIONS[self.next_direction[board]],
+            score=int(self.score[board]),
+            is_game_over=not self.alive[board],
+            is_paused=False,
+            mode=GameMode.WALLS if self.walls[board] else GameMode.PASS_THROUGH,
+            grid_size=self.grid_size,
+        )
+
+    def _place_food(self, boards: np.ndarray) -> np.ndarray:
+        # Pick the k-th free cell directly instead of retrying random cells
+        # until one is empty, which degrades badly as the snake fills the board.
+        free = ~self.occupied[boards]
+        free_count = free.sum(axis=1)
+        k = (self.rng.random(boards.size) * free_count).astype(np.int64)
+        cell = np.argmax(np.cumsum(free, axis=1) > k[:, None], axis=1)
+
+        full = free_count == 0
+        self.food[boards] = np.where(full, -1, cell)
+        completed = boards[full]
+        self.alive[completed] = False
+        return completed
@@ -0,0 +1,96 @@
+"""Deterministic replay of a recorded game.
+
+A replay is the RNG seed plus the direction changes the player made, keyed by
+the tick they took effect on. Replaying them through :mod:`app.engine.rules`
+with the same seeded generator reproduces the game exactly, so the server can
+recompute the score instead of trusting the one the client sent.
+
+The generator is mulberry32, chosen because it is a few lines in both Python
+and TypeScript and yields identical floats in each::
+
+    function mulberry32(a) {
+      return function () {
+        a |= 0; a = (a + 0x6D2B79F5) | 0;
+        let t = Math.imul(a ^ (a >>> 15), 1 | a);
+        t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+      };
+    }
+
+The client must draw food positions from it (via ``generateFood``) in place
+of ``Math.random``.
+"""
+from .rules import DIRECTIONS, Rand, change_direction, create_initial_state, move_snake
+from ..models import GameMode
+
+_MASK = 0xFFFFFFFF
+
+
+def _imul(a: int, b: int) -> int:
+    return (a * b) & _MASK
+
+
+def mulberry32(seed: int) -> Rand:
+    state = seed & _MASK
+
+    def rand() -> float:
+        nonlocal state
+        state = (state + 0x6D2B79F5) & _MASK
+        t = _imul(state ^ (state >> 15), 1 | state)
+        t = ((t + _imul(t ^ (t >> 7), 61 | t)) & _MASK) ^ t
+        return ((t ^ (t >> 14)) & _MASK) / 4294967296
+
+    return rand
+
+
+def replay_game(seed: int, mode: GameMode, moves: list[tuple[int, str]], ticks: int, max_ticks: int) -> int | None:
+    """Return the final score, or ``None`` if the replay is not a valid finished game.
+
+    ``moves`` are ``(tick, direction)`` pairs in tick order, applied before the
+    snake moves on that tick. The game must end on exactly tick ``ticks``
+    (1-based), which may not exceed ``max_ticks``.
+    """
+    if ticks < 1 or ticks > max_ticks:
+        return None
+    rand = mulberry32(seed)
+    state = create_initial_state(GameMode(mode), rand)
+
+    pending = iter(moves)
+    next_move = next(pending, None)
+    for tick in range(ticks):
+        while next_move is not None and next_move[0] <= tick:
+            move_tick, direction = next_move
+            if move_tick < tick or direction not in DIRECTIONS:
+                # Out of order or unknown direction
+                return None
+            state = change_direction(state, direction)
+            next_move = next(pending, None)
+
+        state = move_snake(state, rand)
+        if state.is_game_over:
+            return state.score if tick == ticks - 1 and next_move is None else None
+    return None
+
+
+def record_ai_game(seed: int, mode: GameMode, max_ticks: int, ai_seed: int = 0) -> tuple[list[tuple[int, str]], int, int] | None:
+    """Play an AI game on ``seed`` and return ``(moves, ticks, score)`` for it.
+
+    Used to produce realistic replays for tests and benchmarks. Returns
+    ``None`` if the game is still running after ``max_ticks``.
+    """
+    import random
+    from .rules import get_ai_direction
+
+    ai_rand = random.Random(ai_seed).random
+    rand = mulberry32(seed)
+    state = create_initial_state(GameMode(mode), rand)
+    moves: list[tuple[int, str]] = []
+    for tick in range(max_ticks):
+        direction = get_ai_direction(state, ai_rand)
+        if direction != state.next_direction:
+            moves.append((tick, direction))
+            state = change_direction(state, direction)
+        state = move_snake(state, rand)
+        if state.is_game_over:
+            return moves, tick + 1, state.score
+    return None
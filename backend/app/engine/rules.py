@@ -0,0 +1,161 @@
+"""Game rules ported from ``frontend/src/lib/gameLogic.ts``.
+
+Function names and behaviour mirror the TypeScript so the two can be read side
+by side. Randomness comes from a ``rand`` callable returning floats in [0, 1),
+the stand-in for ``Math.random``.
+"""
+import random
+from dataclasses import dataclass, replace
+from typing import Callable, Literal
+
+from ..models import GameMode
+
+Direction = Literal["UP", "DOWN", "LEFT", "RIGHT"]
+Position = tuple[int, int]
+Rand = Callable[[], float]
+
+DIRECTIONS: tuple[Direction, ...] = ("UP", "DOWN", "LEFT", "RIGHT")
+INITIAL_SNAKE_LENGTH = 3
+GRID_SIZE = 20
+FOOD_SCORE = 10
+
+_OPPOSITES = {("UP", "DOWN"), ("DOWN", "UP"), ("LEFT", "RIGHT"), ("RIGHT", "LEFT")}
+
+
+@dataclass
+class GameState:
+    snake: list[Position]
+    food: Position
+    direction: Direction
+    next_direction: Direction
+    score: int
+    is_game_over: bool
+    is_paused: bool
+    mode: GameMode
+    grid_size: int
+
+
+def create_initial_state(mode: GameMode = GameMode.WALLS, rand: Rand = random.random, grid_size: int = GRID_SIZE) -> GameState:
+    start_x = grid_size // 2
+    start_y = grid_size // 2
+    snake = [(start_x - i, start_y) for i in range(INITIAL_SNAKE_LENGTH)]
+
+    return GameState(
+        snake=snake,
+        food=generate_food(snake, grid_size, rand),
+        direction="RIGHT",
+        next_direction="RIGHT",
+        score=0,
+        is_game_over=False,
+        is_paused=False,
+        mode=mode,
+        grid_size=grid_size,
+    )
+
+
+def generate_food(snake: list[Position], grid_size: int, rand: Rand = random.random) -> Position:
+    while True:
+        food = (int(rand() * grid_size), int(rand() * grid_size))
+        if food not in snake:
+            return food
+
+
+def get_next_position(head: Position, direction: Direction, grid_size: int, mode: GameMode) -> Position:
+    x, y = head
+    if direction == "UP":
+        y -= 1
+    elif direction == "DOWN":
+        y += 1
+    elif direction == "LEFT":
+        x -= 1
+    elif direction == "RIGHT":
+        x += 1
+
+    if mode == GameMode.PASS_THROUGH:
+        x = (x + grid_size) % grid_size
+        y = (y + grid_size) % grid_size
+
+    return (x, y)
+
+
+def check_wall_collision(position: Position, grid_size: int) -> bool:
+    x, y = position
+    return x < 0 or x >= grid_size or y < 0 or y >= grid_size
+
+
+def check_self_collision(head: Position, body: list[Position]) -> bool:
+    return head in body
+
+
+def is_opposite_direction(dir1: Direction, dir2: Direction) -> bool:
+    return (dir1, dir2) in _OPPOSITES
+
+
+def move_snake(state: GameState, rand: Rand = random.random) -> GameState:
+    if state.is_game_over or state.is_paused:
+        return state
+
+    direction = state.next_direction
+    new_head = get_next_position(state.snake[0], direction, state.grid_size, state.mode)
+
+    # Check wall collision (only in walls mode)
+    if state.mode == GameMode.WALLS and check_wall_collision(new_head, state.grid_size):
+        return replace(state, is_game_over=True)
+
+    # Check self collision
+    if check_self_collision(new_head, state.snake):
+        return replace(state, is_game_over=True)
+
+    new_snake = [new_head, *state.snake]
+    ate_food = new_head == state.food
+
+    if not ate_food:
+        new_snake.pop()
+
+    return replace(
+        state,
+        snake=new_snake,
+        direction=direction,
+        food=generate_food(new_snake, state.grid_size, rand) if ate_food else state.food,
+        score=state.score + FOOD_SCORE if ate_food else state.score,
+    )
+
+
+def change_direction(state: GameState, new_direction: Direction) -> GameState:
+    if state.is_game_over or state.is_paused:
+        return state
+
+    if is_opposite_direction(state.direction, new_direction):
+        return state
+
+    return replace(state, next_direction=new_direction)
+
+
+def get_ai_direction(state: GameState, rand: Rand = random.random) -> Direction:
+    head = state.snake[0]
+    food_x, food_y = state.food
+    body = state.snake[:-1]
+
+    # Candidates keep DIRECTIONS order so ties break the same way as the stable sort in TS
+    valid_moves: list[tuple[int, Direction]] = []
+    for direction in DIRECTIONS:
+        if is_opposite_direction(state.direction, direction):
+            continue
+        next_pos = get_next_position(head, direction, state.grid_size, state.mode)
+        if state.mode == GameMode.WALLS and check_wall_collision(next_pos, state.grid_size):
+            continue
+        if check_self_collision(next_pos, body):
+            continue
+        distance = abs(next_pos[0] - food_x) + abs(next_pos[1] - food_y)
+        valid_moves.append((-distance, direction))
+
+    if not valid_moves:
+        return state.direction
+
+    valid_moves.sort(key=lambda move: -move[0])
+
+    # Add some randomness
+    if rand() < 0.1 and len(valid_moves) > 1:
+        return valid_moves[1][1]
+
+    return valid_moves[0][1]
@@ -0,0 +1,245 @@
+"""In-memory per-mode score histograms for percentiles.
+
+Scores fall into fixed buckets of ``SCORE_HISTOGRAM_BUCKET_WIDTH`` points, with
+one overflow bucket for everything at or above ``SCORE_HISTOGRAM_MAX_SCORE``.
+A submit increments one counter; a percentile ("you beat p% of games") sums the
+buckets below the score's bucket and interpolates linearly inside it, so a
+lookup is O(buckets) with no database access.
+
+Error bound: the exact share of games scoring below ``s`` lies between the
+share in buckets strictly below ``s``'s bucket and that plus the share in its
+bucket, and the estimate is always inside that range. The error is therefore at
+most the percentage of games in the same bucket as ``s``
+(:meth:`ScoreHistogram.error_bound`), and is zero when the bucket width is 1.
+Scores in the overflow bucket are not interpolated.
+
+Counts are stored in ``score_histogram_buckets``, built with one GROUP BY over
+``leaderboard_entries`` the first time a bucket width is used. A build also
+stores a zero-count marker row per mode, so an empty table is not rebuilt
+on every load. Each process
+adds its own submits in memory and every ``SCORE_HISTOGRAM_PERSIST_SECONDS``
+adds them to the stored counts and re-reads them, which also picks up other
+workers' submits. Submits a process had not yet persisted when it crashed are
+lost; rebuild the table from the entries with::
+
+    uv run python -m app.histogram
+"""
+import asyncio
+import logging
+import math
+import os
+from collections import defaultdict
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+SCORE_HISTOGRAM_BUCKET_WIDTH = int(os.getenv("SCORE_HISTOGRAM_BUCKET_WIDTH", "10"))
+SCORE_HISTOGRAM_MAX_SCORE = int(os.getenv("SCORE_HISTOGRAM_MAX_SCORE", "10000"))
+SCORE_HISTOGRAM_PERSIST_SECONDS = float(os.getenv("SCORE_HISTOGRAM_PERSIST_SECONDS", "10"))
+
+Bucket = models.ScoreHistogramBucket
+# ``bucket`` of the row marking a width as built, present even when no games are
+MARKER_BUCKET = -1
+
+
+class ScoreHistogram:
+    def __init__(
+        self,
+        bucket_width: int = SCORE_HISTOGRAM_BUCKET_WIDTH,
+        max_score: int = SCORE_HISTOGRAM_MAX_SCORE,
+        persist_interval: float = SCORE_HISTOGRAM_PERSIST_SECONDS,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.bucket_width = bucket_width
+        self.max_score = max_score
+        self.persist_interval = persist_interval
+        self.session_factory = session_factory
+        self.running = False
+        # The last bucket holds every score >= max_score
+        self.overflow = math.ceil(max_score / bucket_width)
+        self.counts = {mode: [0] * (self.overflow + 1) for mode in models.GameMode}
+        # Submits not yet added to the stored counts
+        self._pending: dict[models.GameMode, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self._task: asyncio.Task | None = None
+
+    def bucket_of(self, score: int) -> int:
+        return min(max(score, 0) // self.bucket_width, self.overflow)
+
+    def add(self, mode: models.GameMode, score: int):
+        mode, bucket = models.GameMode(mode), self.bucket_of(score)
+        self.counts[mode][bucket] += 1
+        self._pending[mode][bucket] += 1
+
+    def total(self, mode: models.GameMode) -> int:
+        return sum(self.counts[models.GameMode(mode)])
+
+    def percentile(self, mode: models.GameMode, score: int) -> float:
+        """Estimated percentage of ``mode`` games that scored less than ``score``."""
+        counts = self.counts[models.GameMode(mode)]
+        total = sum(counts)
+        if not total:
+            return 0.0
+        bucket = self.bucket_of(score)
+        below = sum(counts[:bucket])
+        if bucket < self.overflow and score > 0:
+            below += counts[bucket] * (score - bucket * self.bucket_width) / self.bucket_width
+        return 100 * below / total
+
+    def error_bound(self, mode: models.GameMode, score: int) -> float:
+        """Largest possible difference, in percentage points, between :meth:`percentile` and the exact value."""
+        counts = self.counts[models.GameMode(mode)]
+        total = sum(counts)
+        if not total or (self.bucket_width == 1 and self.bucket_of(score) < self.overflow):
+            return 0.0
+        return 100 * counts[self.bucket_of(score)] / total
+
+    def describe(self, mode: models.GameMode) -> schemas.ScoreHistogram:
+        return describe(mode, self.bucket_width, self.overflow, self.counts[models.GameMode(mode)])
+
+    async def load(self, db: AsyncSession):
+        """Read the stored counts for this bucket width, building them from the entries if never built."""
+        rows = (await db.execute(
+            select(Bucket.mode, Bucket.bucket, Bucket.count).where(Bucket.bucket_width == self.bucket_width)
+        )).all()
+        # Tables stored before the marker existed get it from one more build, which keeps their rows
+        if not any(bucket == MARKER_BUCKET for _, bucket, _ in rows):
+            await build(db, self.bucket_width, self.overflow)
+            await db.commit()
+            rows = (await db.execute(
+                select(Bucket.mode, Bucket.bucket, Bucket.count).where(Bucket.bucket_width == self.bucket_width)
+            )).all()
+        counts = {mode: [0] * (self.overflow + 1) for mode in models.GameMode}
+        for mode, bucket, count in rows:
+            if bucket != MARKER_BUCKET:
+                counts[models.GameMode(mode)][min(bucket, self.overflow)] += count
+        # Keep submits made while the query ran, which are not in the table yet
+        for mode, pending in self._pending.items():
+            for bucket, count in pending.items():
+                counts[mode][bucket] += count
+        self.counts = counts
+
+    async def persist(self):
+        """Add this process's new submits to the stored counts and pick up everyone else's."""
+        pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        rows = [
+            {"mode": mode, "bucket_width": self.bucket_width, "bucket": bucket, "count": count}
+            for mode, buckets in pending.items() for bucket, count in buckets.items()
+        ]
+        written = False
+        try:
+            async with self.session_factory() as db:
+                if rows:
+                    statement = _insert(db)(Bucket).values(rows)
+                    await db.execute(statement.on_conflict_do_update(
+                        index_elements=[Bucket.mode, Bucket.bucket_width, Bucket.bucket],
+                        set_={"count": Bucket.count + statement.excluded.count},
+                    ))
+                    await db.commit()
+                written = True
+                await self.load(db)
+        except BaseException:
+            if not written:
+                # Fold back in so the next attempt includes it
+                for mode, buckets in pending.items():
+                    for bucket, count in buckets.items():
+                        self._pending[mode][bucket] += count
+            raise
+
+    async def start(self):
+        async with self.session_factory() as db:
+            await self.load(db)
+        self.running = True
+        if self.persist_interval > 0:
+            self._task = asyncio.create_task(self._persist_loop())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.persist()
+
+    def reset(self):
+        self.__init__(self.bucket_width, self.max_score, self.persist_interval, self.session_factory)
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            try:
+                await self.persist()
+            except Exception:
+                logger.exception("Score histogram persist failed")
+
+
+def _insert(db: AsyncSession):
+    return (postgresql if db.bind.dialect.name == "postgresql" else sqlite).insert
+
+
+def describe(mode: models.GameMode, bucket_width: int, overflow: int, counts: list[int]) -> schemas.ScoreHistogram:
+    return schemas.ScoreHistogram(
+        mode=mode,
+        bucket_width=bucket_width,
+        total=sum(counts),
+        buckets=[
+            schemas.HistogramBucket(
+                min=bucket * bucket_width,
+                max=None if bucket == overflow else (bucket + 1) * bucket_width - 1,
+                count=count,
+            )
+            for bucket, count in enumerate(counts) if count
+        ],
+    )
+
+
+async def count_entries(db: AsyncSession, bucket_width: int, overflow: int, mode: models.GameMode | None = None) -> dict[models.GameMode, list[int]]:
+    """Exact bucket counts with one GROUP BY over ``leaderboard_entries``."""
+    entry = models.LeaderboardEntry
+    bucket = (entry.score // bucket_width).label("bucket")
+    query = select(entry.mode, bucket, func.count()).group_by(entry.mode, bucket)
+    if mode is not None:
+        query = query.where(entry.mode == mode)
+    counts = {mode: [0] * (overflow + 1) for mode in models.GameMode}
+    for row_mode, row_bucket, count in await db.execute(query):
+        counts[models.GameMode(row_mode)][min(max(row_bucket, 0), overflow)] += count
+    return counts
+
+
+async def build(db: AsyncSession, bucket_width: int, overflow: int):
+    """Store exact counts for ``bucket_width``; the caller commits.
+
+    Rows another process stored first are kept rather than added to.
+    """
+    counts = await count_entries(db, bucket_width, overflow)
+    rows = [
+        {"mode": mode, "bucket_width": bucket_width, "bucket": bucket, "count": count}
+        for mode, buckets in counts.items() for bucket, count in enumerate(buckets) if count
+    ] + [{"mode": mode, "bucket_width": bucket_width, "bucket": MARKER_BUCKET, "count": 0} for mode in models.GameMode]
+    await db.execute(_insert(db)(Bucket).values(rows).on_conflict_do_nothing())
+
+
+score_histogram = ScoreHistogram()
+
+
+async def main():
+    from .database import engine, init_db
+
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Bucket))
+        await build(db, score_histogram.bucket_width, score_histogram.overflow)
+        await db.commit()
+    print(f"Rebuilt score histograms with {score_histogram.bucket_width}-point buckets")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""Write-behind score ingestion.
+
+With ``SCORE_INGEST_MODE=batched`` score submits are queued instead of each
+opening its own transaction. A background flusher writes them with one
+multi-row INSERT per batch, flushing when ``SCORE_INGEST_BATCH_SIZE`` entries
+are waiting or ``SCORE_INGEST_FLUSH_MS`` has passed since the first one.
+
+Callers still await their rank, and that only resolves after the batch has
+committed, so an acknowledged score is durable. A failed flush is reported to
+every caller in the batch so clients can retry (at-least-once delivery).
+"""
+import asyncio
+import logging
+import os
+
+from . import crud, schemas
+from .database import AsyncSessionLocal
+from .leaderboard_index import IndexedEntry
+
+logger = logging.getLogger(__name__)
+
+SCORE_INGEST_MODE = os.getenv("SCORE_INGEST_MODE", "direct").lower()
+SCORE_INGEST_BATCH_SIZE = int(os.getenv("SCORE_INGEST_BATCH_SIZE", "500"))
+SCORE_INGEST_FLUSH_MS = int(os.getenv("SCORE_INGEST_FLUSH_MS", "50"))
+SCORE_INGEST_QUEUE_SIZE = int(os.getenv("SCORE_INGEST_QUEUE_SIZE", "10000"))
+SCORE_INGEST_ENQUEUE_TIMEOUT_MS = int(os.getenv("SCORE_INGEST_ENQUEUE_TIMEOUT_MS", "2000"))
+
+
+class IngestUnavailable(Exception):
+    """The submit was not accepted or not persisted; the client should retry."""
+
+
+class ScoreIngestor:
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        batch_size: int = SCORE_INGEST_BATCH_SIZE,
+        flush_interval: float = SCORE_INGEST_FLUSH_MS / 1000,
+        max_queue: int = SCORE_INGEST_QUEUE_SIZE,
+        enqueue_timeout: float = SCORE_INGEST_ENQUEUE_TIMEOUT_MS / 1000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self._drained = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closing = False
+        self._drained = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop accepting submits and flush everything already queued."""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, user_id: str, username: str, score: int, mode: schemas.GameMode) -> int:
+        if not self.running:
+            raise IngestUnavailable("Score ingestion is shutting down")
+        future = asyncio.get_running_loop().create_future()
+        entry = crud.new_leaderboard_entry(user_id, username, score, mode)
+        try:
+            await asyncio.wait_for(self._queue.put((entry, future)), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            raise IngestUnavailable("Score ingestion queue is full")
+        if self._drained:
+            # Blocked on a full queue until after the final drain: nothing will flush it
+            raise IngestUnavailable("Score ingestion is shutting down")
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Drain submits that were enqueued before the shutdown sentinel was processed. Each flush
+        # lets blocked submits put theirs, so the queue is checked again after it; once it is
+        # found empty, ``_drained`` is set with no await in between, and later puts are refused.
+        while True:
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None:
+                    batch.append(item)
+            if not batch:
+                break
+            await self._flush(batch)
+        self._drained = True
+
+    async def _flush(self, batch: list[tuple[IndexedEntry, asyncio.Future]]):
+        try:
+            async with self.session_factory() as db:
+                ranks = await crud.submit_scores(db, [entry for entry, _ in batch])
+        except Exception:
+            logger.exception(f"Failed to flush {len(batch)} queued scores")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(IngestUnavailable("Failed to persist score"))
+            return
+
+        for (_, future), rank in zip(batch, ranks):
+            # The caller may have gone away; the score is stored regardless.
+            if not future.done():
+                future.set_result(rank)
+
+
+score_ingestor = ScoreIngestor()
@@ -0,0 +1,307 @@
+"""In-memory order-statistics index over leaderboard scores.
+
+The database stays the source of truth: the index is bulk-loaded from
+``leaderboard_entries`` at startup and updated by ``crud.submit_score`` after
+each commit. Until it has been loaded, callers fall back to the SQL queries.
+
+Each game mode keeps a Fenwick tree of entry counts indexed by score, plus the
+entries themselves bucketed by score. Rank lookups are O(log S) where S is the
+width of the score range, and reading ``n`` entries from any rank costs
+O(log S) per distinct score visited plus the entries copied out. The tree only
+covers scores from 0 to ``MAX_TREE_SCORE``; the rare scores outside it are
+kept in sorted overflow lists and cost O(k) in the number of such distinct
+scores, so a single absurd score cannot make the tree allocate its width.
+
+Entries are ordered by score descending, then ``played_at`` and ``id``
+ascending; buckets are kept in that order so a keyset cursor resolves to a
+position with one bisect.
+"""
+import bisect
+import heapq
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Scores in a 20x20 game top out just under 4000, so one allocation covers
+# normal play; anything outside the range grows the tree, up to MAX_TREE_SCORE.
+INITIAL_SCORE_RANGE = 4096
+MAX_TREE_SCORE = (1 << 16) - 1
+
+
+class IndexedEntry(NamedTuple):
+    id: str
+    user_id: str
+    username: str
+    score: int
+    mode: models.GameMode
+    played_at: datetime
+
+
+def order_key(entry) -> tuple:
+    """Sort key of the leaderboard order; works for rows and ``IndexedEntry``."""
+    return (-entry.score, entry.played_at, entry.id)
+
+
+def _bucket_key(entry: IndexedEntry) -> tuple:
+    return (entry.played_at, entry.id)
+
+
+def _in_tree(score: int) -> bool:
+    return 0 <= score <= MAX_TREE_SCORE
+
+
+class ModeIndex:
+    """Ranked entries for a single game mode.
+
+    Rank 1 is the highest score. Equal scores share a rank (rank = entries
+    with a strictly higher score + 1) and are listed oldest first. Positions
+    are 1-based offsets in that order and, unlike ranks, are unique.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self._size = 0
+        self._tree: list[int] = [0]
+        self._buckets: dict[int, list[IndexedEntry]] = {}
+        self._best: dict[str, IndexedEntry] = {}
+        # Distinct scores outside the tree, ascending, and how many entries they hold
+        self._high: list[int] = []
+        self._low: list[int] = []
+        self._outside = 0
+
+    def add(self, entry: IndexedEntry):
+        score = entry.score
+        if _in_tree(score):
+            if score >= self._size:
+                self._rebuild(score)
+            self._update(score + 1, 1)
+        else:
+            if score not in self._buckets:
+                bisect.insort(self._high if score > 0 else self._low, score)
+            self._outside += 1
+        # New entries are almost always the newest, so this lands at the end
+        bisect.insort(self._buckets.setdefault(score, []), entry, key=_bucket_key)
+        self.total += 1
+        self._track_best(entry)
+
+    def bulk_load(self, entries: list[IndexedEntry]):
+        """Replace the contents with ``entries`` (assumed sorted by played_at, id) in O(n)."""
+        self._buckets = {}
+        self._best = {}
+        best = self._best
+        for entry in entries:
+            self._buckets.setdefault(entry.score, []).append(entry)
+            # Entries arrive in order, so the first one with the top score wins ties
+            current = best.get(entry.user_id)
+            if current is None or entry.score > current.score:
+                best[entry.user_id] = entry
+        self.total = len(entries)
+        outside = sorted(score for score in self._buckets if not _in_tree(score))
+        self._low = [score for score in outside if score < 0]
+        self._high = outside[len(self._low):]
+        self._outside = sum(len(self._buckets[score]) for score in outside)
+        self._size, self._tree = 0, [0]
+        in_tree = [score for score in self._buckets if _in_tree(score)]
+        if in_tree:
+            self._rebuild(max(in_tree))
+
+    def count_above(self, score: int) -> int:
+        above = self._count_outside(self._high, score)
+        if score < 0:
+            return above + self.total - self._outside + self._count_outside(self._low, score)
+        if score < self._size:
+            above += self.total - self._outside - self._prefix(score + 1)
+        return above
+
+    def rank_of(self, score: int) -> int:
+        return self.count_above(score) + 1
+
+    def entries_from(self, rank: int, count: int) -> list[IndexedEntry]:
+        """Return up to ``count`` entries starting at 1-based position ``rank``."""
+        out: list[IndexedEntry] = []
+        rank = max(rank, 1)
+        while len(out) < count and rank <= self.total:
+            bucket, above = self._bucket_at(rank)
+            start = rank - above - 1
+            chunk = bucket[start:start + count - len(out)]
+            out.extend(chunk)
+            rank += len(chunk)
+        return out
+
+    def top(self, n: int) -> list[IndexedEntry]:
+        return self.entries_from(1, n)
+
+    def around(self, rank: int, k: int) -> list[IndexedEntry]:
+        """Return the entries from position ``rank - k`` to ``rank + k``."""
+        start = max(rank - k, 1)
+        return self.entries_from(start, rank + k - start + 1)
+
+    def position_after(self, score: int, played_at: datetime, entry_id: str) -> int:
+        """Number of entries ordered at or before the cursor ``(score, played_at, id)``."""
+        bucket = self._buckets.get(score, ())
+        return self.count_above(score) + bisect.bisect_right(bucket, (played_at, entry_id), key=_bucket_key)
+
+    def position_of(self, entry: IndexedEntry) -> int:
+        return self.position_after(entry.score, entry.played_at, entry.id)
+
+    def contains(self, entry: IndexedEntry) -> bool:
+        bucket = self._buckets.get(entry.score, ())
+        i = bisect.bisect_left(bucket, _bucket_key(entry), key=_bucket_key)
+        return i < len(bucket) and bucket[i].id == entry.id
+
+    def best_of(self, user_id: str) -> IndexedEntry | None:
+        return self._best.get(user_id)
+
+    def _track_best(self, entry: IndexedEntry):
+        best = self._best.get(entry.user_id)
+        if best is None or order_key(entry) < order_key(best):
+            self._best[entry.user_id] = entry
+
+    def _count_outside(self, scores: list[int], score: int) -> int:
+        """Entries in the overflow list ``scores`` with a score above ``score``."""
+        return sum(len(self._buckets[s]) for s in scores[bisect.bisect_right(scores, score):])
+
+    def _bucket_at(self, position: int) -> tuple[list[IndexedEntry], int]:
+        """The bucket holding 1-based ``position`` and the number of entries before it."""
+        above = 0
+        for score in reversed(self._high):
+            bucket = self._buckets[score]
+            if position <= above + len(bucket):
+                return bucket, above
+            above += len(bucket)
+        in_tree = self.total - self._outside
+        if position <= above + in_tree:
+            # Position ``p`` from the top of the tree is the (in_tree - p + 1)-th lowest.
+            slot = self._find(in_tree - (position - above) + 1)
+            return self._buckets[slot - 1], above + in_tree - self._prefix(slot)
+        above += in_tree
+        for score in reversed(self._low):
+            bucket = self._buckets[score]
+            if position <= above + len(bucket):
+                return bucket, above
+            above += len(bucket)
+        raise IndexError(position)
+
+    # Fenwick tree internals (1-based slots, slot i holds score i - 1)
+
+    def _update(self, i: int, delta: int):
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _find(self, k: int) -> int:
+        """Smallest slot whose prefix sum is >= k."""
+        pos = 0
+        step = 1 << self._size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self._size and self._tree[nxt] < k:
+                pos = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return pos + 1
+
+    def _rebuild(self, hi: int):
+        # Double the span on growth so repeated out-of-range scores stay amortised O(1).
+        size = min(max(INITIAL_SCORE_RANGE, 2 * self._size, hi + 1), MAX_TREE_SCORE + 1)
+        self._size = size
+        tree = [0] * (size + 1)
+        for score, bucket in self._buckets.items():
+            if _in_tree(score):
+                tree[score + 1] = len(bucket)
+        for i in range(1, size + 1):
+            j = i + (i & -i)
+            if j <= size:
+                tree[j] += tree[i]
+        self._tree = tree
+
+
+class LeaderboardIndex:
+    """Per-mode :class:`ModeIndex` collection, loaded from the database."""
+
+    def __init__(self):
+        self.ready = False
+        self.modes: dict[models.GameMode, ModeIndex] = {mode: ModeIndex() for mode in models.GameMode}
+        # Entries added while reload() runs, to carry over into the fresh index
+        self._added: list[IndexedEntry] | None = None
+
+    async def load(self, db: AsyncSession, batch_size: int = 10000):
+        columns = (
+            models.LeaderboardEntry.id,
+            models.LeaderboardEntry.user_id,
+            models.LeaderboardEntry.username,
+            models.LeaderboardEntry.score,
+            models.LeaderboardEntry.mode,
+            models.LeaderboardEntry.played_at,
+        )
+        query = select(*columns).order_by(models.LeaderboardEntry.played_at, models.LeaderboardEntry.id).execution_options(yield_per=batch_size)
+        loaded: dict[models.GameMode, list[IndexedEntry]] = {mode: [] for mode in models.GameMode}
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            for entry_id, user_id, username, score, mode, played_at in rows:
+                if played_at.tzinfo is None:
+                    # SQLite hands back naive datetimes; stored values are UTC.
+                    played_at = played_at.replace(tzinfo=timezone.utc)
+                loaded[mode].append(IndexedEntry(entry_id, user_id, username, score, mode, played_at))
+        for mode, entries in loaded.items():
+            self.modes[mode].bulk_load(entries)
+        self.ready = True
+
+    async def reload(self, db: AsyncSession):
+        """Rebuild from the database, serving the current contents meanwhile."""
+        self._added = []
+        try:
+            fresh = LeaderboardIndex()
+            await fresh.load(db)
+            # Added after the load read past them, or committed too late for its snapshot
+            for entry in self._added:
+                if not fresh.modes[models.GameMode(entry.mode)].contains(entry):
+                    fresh.add(entry)
+            self.modes = fresh.modes
+        finally:
+            self._added = None
+
+    def reset(self):
+        self.__init__()
+
+    def add(self, entry: IndexedEntry):
+        self.modes[models.GameMode(entry.mode)].add(entry)
+        if self._added is not None:
+            self._added.append(entry)
+
+    def rank_of(self, mode: models.GameMode, score: int) -> int:
+        return self.modes[models.GameMode(mode)].rank_of(score)
+
+    def top(self, mode: models.GameMode | None, n: int) -> list[IndexedEntry]:
+        if mode is not None:
+            return self.modes[models.GameMode(mode)].top(n)
+        return self._merge([index.top(n) for index in self.modes.values()], n)
+
+    def page(self, mode: models.GameMode | None, after: tuple[int, datetime, str] | None, n: int) -> list[IndexedEntry]:
+        """Up to ``n`` entries following the keyset cursor ``after`` (from the top if ``None``)."""
+        if after is None:
+            return self.top(mode, n)
+        modes = [self.modes[models.GameMode(mode)]] if mode is not None else list(self.modes.values())
+        return self._merge([index.entries_from(index.position_after(*after) + 1, n) for index in modes], n)
+
+    def around(self, mode: models.GameMode, rank: int, k: int) -> list[IndexedEntry]:
+        return self.modes[models.GameMode(mode)].around(rank, k)
+
+    def _merge(self, runs: list[list[IndexedEntry]], n: int) -> list[IndexedEntry]:
+        if len(runs) == 1:
+            return runs[0][:n]
+        return [entry for _, entry in zip(range(n), heapq.merge(*runs, key=order_key))]
+
+
+leaderboard_index = LeaderboardIndex()
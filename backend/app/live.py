@@ -0,0 +1,160 @@
+"""Live active-player feed for spectators.
+
+One broadcaster per process runs a single change-detection pass every
+``PLAYERS_FEED_INTERVAL_MS`` while anyone is subscribed (reading the presence
+registry when it is running, the database otherwise), diffs the result
+against the previous pass and fans the encoded delta out to every subscriber.
+A thousand spectators therefore cost one query per interval, not a thousand.
+
+Messages are JSON text frames:
+
+* ``{"type": "snapshot", "players": [ActivePlayer, ...]}`` on connect, and
+  again whenever a subscriber fell too far behind (see below).
+* ``{"type": "delta", "join": [ActivePlayer, ...], "score": [{"id", "currentScore"}, ...], "leave": [id, ...]}``.
+  ``join`` also carries players whose mode or start time changed.
+
+Fan-out never waits on a subscriber. Each one has a small bounded queue; when
+it is full the backlog is discarded and replaced by a single fresh snapshot,
+and a subscriber that overflows ``PLAYERS_FEED_MAX_RESYNCS`` times in a row is
+disconnected.
+"""
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from . import crud
+from .database import ReadSessionLocal
+from .presence import presence_registry
+from .serializers import player_dict
+
+logger = logging.getLogger(__name__)
+
+PLAYERS_FEED_INTERVAL_MS = int(os.getenv("PLAYERS_FEED_INTERVAL_MS", "1000"))
+PLAYERS_FEED_QUEUE_SIZE = int(os.getenv("PLAYERS_FEED_QUEUE_SIZE", "32"))
+PLAYERS_FEED_MAX_RESYNCS = int(os.getenv("PLAYERS_FEED_MAX_RESYNCS", "3"))
+
+
+def encode_player(player) -> dict:
+    return player_dict(player)
+
+
+class Subscription:
+    def __init__(self, broadcaster: "PlayerBroadcaster", max_queue: int):
+        self._broadcaster = broadcaster
+        self._queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=max_queue)
+        self.resyncs = 0
+        self.closed = False
+
+    async def get(self) -> str | None:
+        """Next encoded message, or ``None`` once the subscriber has been dropped."""
+        message = await self._queue.get()
+        if message is not None:
+            self.resyncs = 0
+        return message
+
+    def _offer(self, message: str):
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        # Coalesce: everything queued is superseded by the current snapshot
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self.resyncs += 1
+        if self.resyncs > self._broadcaster.max_resyncs:
+            self.closed = True
+            self._queue.put_nowait(None)
+        else:
+            self._queue.put_nowait(self._broadcaster.snapshot_message())
+
+
+class PlayerBroadcaster:
+    def __init__(
+        self,
+        session_factory=ReadSessionLocal,
+        interval: float = PLAYERS_FEED_INTERVAL_MS / 1000,
+        max_queue: int = PLAYERS_FEED_QUEUE_SIZE,
+        max_resyncs: int = PLAYERS_FEED_MAX_RESYNCS,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.max_queue = max_queue
+        self.max_resyncs = max_resyncs
+        self.players: dict[str, dict] = {}
+        self._subscribers: set[Subscription] = set()
+        self._snapshot: str | None = None
+        self._task: asyncio.Task | None = None
+        self._ready: asyncio.Event | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def snapshot_message(self) -> str:
+        if self._snapshot is None:
+            self._snapshot = json.dumps({"type": "snapshot", "players": list(self.players.values())})
+        return self._snapshot
+
+    @asynccontextmanager
+    async def subscribe(self):
+        if self._task is None:
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        subscription = Subscription(self, self.max_queue)
+        subscription._offer(self.snapshot_message())
+        self._subscribers.add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._subscribers.discard(subscription)
+            if not self._subscribers and self._task is not None:
+                self._task.cancel()
+                self._task = None
+
+    def publish(self, players: list[dict]):
+        """Diff ``players`` against the last known state and fan out the delta."""
+        current = {player["id"]: player for player in players}
+        join, score = [], []
+        for player_id, player in current.items():
+            previous = self.players.get(player_id)
+            if previous is None or {**previous, "currentScore": player["currentScore"]} != player:
+                join.append(player)
+            elif previous["currentScore"] != player["currentScore"]:
+                score.append({"id": player_id, "currentScore": player["currentScore"]})
+        leave = [player_id for player_id in self.players if player_id not in current]
+
+        self.players = current
+        if not (join or score or leave):
+            return
+        self._snapshot = None
+        message = json.dumps({"type": "delta", "join": join, "score": score, "leave": leave})
+        for subscription in list(self._subscribers):
+            subscription._offer(message)
+
+    async def refresh(self):
+        if presence_registry.running:
+            players = presence_registry.players()
+        else:
+            async with self.session_factory() as db:
+                players = await crud.get_active_players(db)
+        self.publish([encode_player(player) for player in players])
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Active player feed refresh failed")
+            # Let subscribers in after the first pass even if it failed
+            self._ready.set()
+            await asyncio.sleep(self.interval)
+
+
+player_broadcaster = PlayerBroadcaster()
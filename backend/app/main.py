@@ -1,12 +1,23 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import auth, leaderboard, players
+from .routers import admin, auth, leaderboard, players
 
 from contextlib import asynccontextmanager
-from .database import init_db
+from .database import init_db, AsyncSessionLocal
+from .leaderboard_index import leaderboard_index
+from .histogram import score_histogram
+from .rollups import rollup_trimmer
+from .ingest import score_ingestor, SCORE_INGEST_MODE
+from .verification import replay_verifier
+from .passwords import password_hasher
+from .presence import presence_registry
 from .seed import seed_data
+from .static_files import static_site
+from .metrics import METRICS, CONTENT_TYPE, MetricsMiddleware, registry
+from .query_stats import DEBUG, QueryStatsMiddleware
+from .admission import ADMISSION_CONTROL, RATE_LIMITS, AdmissionMiddleware
+from .bus import change_bus
 import os
 import logging
 import traceback
@@ -29,9 +40,53 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"Failed to seed database: {e}")
             traceback.print_exc()
+
+    # Load the ranked leaderboard index (set LEADERBOARD_INDEX=false to rank with SQL instead)
+    if os.getenv("LEADERBOARD_INDEX", "true").lower() == "true":
+        logger.info("Loading leaderboard index...")
+        async with AsyncSessionLocal() as db:
+            await leaderboard_index.load(db)
+
+    # Percentiles from in-memory score histograms (SCORE_HISTOGRAM=false counts with SQL instead)
+    if os.getenv("SCORE_HISTOGRAM", "true").lower() == "true":
+        logger.info("Loading score histograms...")
+        await score_histogram.start()
+
+    # Trim day/week rollups back to their depth and rotate out old periods, off the submit path
+    await rollup_trimmer.start()
+
+    # Opt-in write-behind ingestion of score submits
+    if SCORE_INGEST_MODE == "batched":
+        logger.info("Starting batched score ingestion...")
+        score_ingestor.start()
+
+    # Serve active players from memory with TTL expiry (PRESENCE_REGISTRY=false keeps them in the DB)
+    if os.getenv("PRESENCE_REGISTRY", "true").lower() == "true":
+        logger.info("Starting presence registry...")
+        await presence_registry.start()
+
+    # Spawn replay workers (and import the engine in them) up front rather than on the first verified submit
+    replay_verifier.start()
+    password_hasher.start()
+
+    # Read the frontend build into memory (STATIC_RELOAD_SECONDS>0 also watches it for changes)
+    await static_site.start()
+
+    # Apply other workers' changes to this one's caches, index and presence (CHANGE_BUS=unix|postgres)
+    await change_bus.start()
             
     yield
 
+    # Flush queued scores and the presence snapshot before the process exits
+    await score_ingestor.stop()
+    await change_bus.stop()
+    await presence_registry.stop()
+    await score_histogram.stop()
+    await rollup_trimmer.stop()
+    replay_verifier.stop()
+    password_hasher.stop()
+    await static_site.stop()
+
 app = FastAPI(
     title="Snake Arena API",
     version="1.0.0",
@@ -43,6 +98,7 @@ app = FastAPI(
 app.include_router(auth.router)
 app.include_router(leaderboard.router)
 app.include_router(players.router)
+app.include_router(admin.router)
 
 # Global Exception Handler for debugging 500s
 @app.exception_handler(Exception)
@@ -54,6 +110,10 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"message": "Internal Server Error", "detail": str(exc)},
     )
 
+# Per-class concurrency limits and per-session rate limits (inside CORS, so rejections carry its headers)
+if ADMISSION_CONTROL or RATE_LIMITS:
+    app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -63,31 +123,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files
-# We expect the frontend build to be in app/static
-static_dir = os.path.join(os.path.dirname(__file__), "static")
-if os.path.exists(static_dir):
-    app.mount("/assets", StaticFiles(directory=os.path.join(static_dir, "assets")), name="assets")
-
-# SPA wrapper
-@app.get("/{full_path:path}")
-async def serve_spa(full_path: str):
-    # If API route is not matched above, it falls through to here.
-    # Check if file exists in static (e.g. favicon.ico, etc that are in root of dist)
-    if os.path.exists(static_dir):
-        file_path = os.path.join(static_dir, full_path)
-        if os.path.isfile(file_path):
-            return FileResponse(file_path)
-    
-    # Otherwise return index.html
-    index_path = os.path.join(static_dir, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
-    
-    return JSONResponse({"error": "Frontend not found"}, status_code=404)
+# Per-request SQL statement count and time as response headers
+if DEBUG:
+    app.add_middleware(QueryStatsMiddleware)
 
+# Request latency and in-flight counts for /metrics (added last, so it wraps CORS too)
+if METRICS:
+    app.add_middleware(MetricsMiddleware)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
 
+# Frontend build (app/static) served from the in-memory manifest in static_files.py
 @app.get("/")
-async def root():
+async def root(request: Request):
+    static = static_site.lookup("")
+    if static is not None:
+        return static_site.respond(request, static)
     return {"message": "Welcome to Snake Arena API"}
+
+# SPA wrapper (registered last so it never shadows an API route or /)
+@app.get("/{full_path:path}")
+async def serve_spa(request: Request, full_path: str):
+    # Files in the build (favicon.ico, hashed assets, ...) or index.html for client-side routes
+    static = static_site.lookup(full_path)
+    if static is None:
+        return JSONResponse({"error": "Frontend not found"}, status_code=404)
+    return static_site.respond(request, static)
@@ -0,0 +1,265 @@
+"""Prometheus metrics, served as text at ``GET /metrics``.
+
+* ``http_request_duration_seconds{method,route,status}``: a histogram per
+  route template (``/players/{player_id}``, not the raw path, so label
+  cardinality stays bounded), recorded by :class:`MetricsMiddleware`.
+* ``http_requests_in_flight``: requests currently inside the app.
+* ``db_statement_duration_seconds{pool,statement}``: cursor execution time by
+  statement verb (SELECT, INSERT, ...), from SQLAlchemy's
+  ``before_cursor_execute`` / ``after_cursor_execute`` events.
+* ``db_pool_checkout_wait_seconds{pool}`` and ``db_pool_waiting{pool}``: time
+  spent getting a connection from the pool, and requests doing so now.
+* ``db_pool_size``, ``db_pool_checked_out``, ``db_pool_overflow``
+  ``{pool}``: read from the pools at scrape time.
+
+Recording is a perf_counter pair, a bisect over the bucket bounds and a dict
+increment per observation; ``benchmarks/bench_metrics.py`` measures the cost
+against the same app with ``METRICS=false``. Values are per process: with
+several workers, scrape each one or aggregate in Prometheus.
+"""
+import bisect
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+METRICS = os.getenv("METRICS", "true").lower() == "true"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Per label set: per-bucket (not cumulative) counts, the last one for +Inf, and the sum
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = defaultdict(float)
+
+    def observe(self, value: float, *labels: str):
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(self._sums[labels])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+    def clear(self):
+        self._counts.clear()
+        self._sums.clear()
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), collect: Callable[[], Iterable[tuple[tuple[str, ...], float]]] | None = None):
+        """A gauge set with :meth:`inc`/:meth:`dec`, or read from ``collect`` at scrape time."""
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._collect = collect
+        self._values: dict[tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, *labels: str):
+        self._values[labels] += 1
+
+    def dec(self, *labels: str):
+        self._values[labels] -= 1
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        values = self._collect() if self._collect else sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+    def clear(self):
+        self._values.clear()
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        """A monotonic count; ``name`` includes the ``_total`` suffix."""
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, *labels: str):
+        self._values[labels] += 1
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+    def clear(self):
+        self._values.clear()
+
+
+class Registry:
+    def __init__(self, enabled: bool = METRICS):
+        self.enabled = enabled
+        self.metrics: list[Histogram | Gauge | Counter] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.collect()) + "\n"
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+registry = Registry()
+
+# Pools by label, for the scrape-time gauges
+_pools: dict[str, object] = {}
+
+
+def _pool_values(read: Callable) -> Callable[[], list[tuple[tuple[str, ...], float]]]:
+    def collect():
+        return [((name,), read(pool)) for name, pool in sorted(_pools.items())]
+    return collect
+
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to finishing its response.", ("method", "route", "status")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."))
+db_statement_duration = registry.register(Histogram(
+    "db_statement_duration_seconds", "Cursor execution time of SQL statements.", ("pool", "statement")))
+db_pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("pool",)))
+db_pool_waiting = registry.register(Gauge(
+    "db_pool_waiting", "Callers currently waiting for a pooled connection.", ("pool",)))
+registry.register(Gauge("db_pool_size", "Configured persistent connections.", ("pool",), _pool_values(lambda pool: pool.size())))
+registry.register(Gauge("db_pool_checked_out", "Connections currently in use.", ("pool",), _pool_values(lambda pool: pool.checkedout())))
+registry.register(Gauge("db_pool_overflow", "Connections open beyond the pool size (negative while the pool is not full).", ("pool",), _pool_values(lambda pool: pool.overflow())))
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The default async pool, timing how long each checkout waits for a connection."""
+    metrics_name = "primary"
+
+    def _do_get(self):
+        if not registry.enabled:
+            return super()._do_get()
+        start = time.perf_counter()
+        db_pool_waiting.inc(self.metrics_name)
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_waiting.dec(self.metrics_name)
+            db_pool_checkout_wait.observe(time.perf_counter() - start, self.metrics_name)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+def instrument_engine(engine, name: str):
+    """Time ``engine``'s statements and expose its pool under ``pool="name"``."""
+    sync_engine = engine.sync_engine
+    if isinstance(sync_engine.pool, TimedQueuePool):
+        sync_engine.pool.metrics_name = name
+        _pools[name] = sync_engine.pool
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["metrics_query_start"].pop()
+        if registry.enabled:
+            verb = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+            db_statement_duration.observe(time.perf_counter() - start, name, verb)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    @event.listens_for(sync_engine, "engine_disposed")
+    def engine_disposed(engine):
+        # dispose() swaps in a new pool
+        if isinstance(engine.pool, TimedQueuePool):
+            _pools[name] = engine.pool
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency by route template and requests in flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - start, scope["method"], path, str(status))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, ForeignKey, Enum as SAEnum
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Boolean, ForeignKey, Index, Enum as SAEnum
 from sqlalchemy.orm import relationship, Mapped, mapped_column, declarative_base
 from datetime import datetime, timezone
 import enum
@@ -10,6 +10,10 @@ class GameMode(str, enum.Enum):
     PASS_THROUGH = "pass-through"
     WALLS = "walls"
 
+class Period(str, enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -33,6 +37,78 @@ class LeaderboardEntry(Base):
 
     user: Mapped["User"] = relationship("User", back_populates="leaderboard_entries")
 
+    __table_args__ = (
+        # Keyset pagination order: score DESC, played_at, id (per mode and across modes)
+        Index("ix_leaderboard_entries_mode_order", "mode", score.desc(), "played_at", "id"),
+        Index("ix_leaderboard_entries_order", score.desc(), "played_at", "id"),
+        # A player's best entry per mode
+        Index("ix_leaderboard_entries_user_mode_order", "user_id", "mode", score.desc(), "played_at", "id"),
+    )
+
+class LeaderboardRollup(Base):
+    """Top entries of one day or week per mode, maintained by app/rollups.py."""
+    __tablename__ = "leaderboard_rollups"
+
+    period: Mapped[Period] = mapped_column(SAEnum(Period), primary_key=True)
+    period_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    id: Mapped[str] = mapped_column(String, primary_key=True) # leaderboard_entries.id
+    user_id: Mapped[str] = mapped_column(String)
+    username: Mapped[str] = mapped_column(String)
+    score: Mapped[int] = mapped_column(Integer)
+    mode: Mapped[GameMode] = mapped_column(SAEnum(GameMode))
+    played_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_leaderboard_rollups_order", "period", "period_start", "mode", score.desc(), "played_at", "id"),
+    )
+
+class UserBestScore(Base):
+    """Each player's best entry per mode, maintained by app/best_scores.py."""
+    __tablename__ = "user_best_scores"
+
+    user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), primary_key=True)
+    mode: Mapped[GameMode] = mapped_column(SAEnum(GameMode), primary_key=True)
+    id: Mapped[str] = mapped_column(String) # leaderboard_entries.id of the best entry
+    username: Mapped[str] = mapped_column(String)
+    score: Mapped[int] = mapped_column(Integer)
+    played_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_user_best_scores_mode_order", "mode", score.desc(), "played_at", "id"),
+        Index("ix_user_best_scores_order", score.desc(), "played_at", "id"),
+    )
+
+class PlayerStats(Base):
+    """Running aggregates of a player's scores per mode, maintained by app/player_stats.py."""
+    __tablename__ = "player_stats"
+
+    user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), primary_key=True)
+    mode: Mapped[GameMode] = mapped_column(SAEnum(GameMode), primary_key=True)
+    games: Mapped[int] = mapped_column(Integer)
+    total: Mapped[int] = mapped_column(BigInteger)
+    total_squares: Mapped[int] = mapped_column(BigInteger)
+    best: Mapped[int] = mapped_column(Integer)
+
+class PlayerRecentScore(Base):
+    """A fixed-size ring of each player's latest scores per mode; ``seq`` is the game number."""
+    __tablename__ = "player_recent_scores"
+
+    user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), primary_key=True)
+    mode: Mapped[GameMode] = mapped_column(SAEnum(GameMode), primary_key=True)
+    slot: Mapped[int] = mapped_column(Integer, primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer)
+    score: Mapped[int] = mapped_column(Integer)
+    played_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+class ScoreHistogramBucket(Base):
+    """Persisted game counts per score bucket, maintained by app/histogram.py."""
+    __tablename__ = "score_histogram_buckets"
+
+    mode: Mapped[GameMode] = mapped_column(SAEnum(GameMode), primary_key=True)
+    bucket_width: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bucket: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger)
+
 class ActivePlayer(Base):
     __tablename__ = "active_players"
 
@@ -0,0 +1,110 @@
+"""scrypt password hashing off the event loop.
+
+``hashlib.scrypt`` is deliberately slow and memory-hard, so hashes are
+computed in a small dedicated thread pool (OpenSSL releases the GIL while it
+works). At most ``PASSWORD_HASH_MAX_PENDING`` hashes may be running or queued
+for a worker; a login storm beyond that is turned away with 503 instead of
+piling up behind the pool while other requests keep being served.
+
+Hashes are stored as ``scrypt$n$r$p$salt$hash`` (base64 salt and hash), so
+changing ``SCRYPT_N``/``SCRYPT_R``/``SCRYPT_P`` only affects new hashes;
+existing ones are rehashed on the next successful login. Values without the
+``scrypt$`` prefix are legacy plaintext passwords and are upgraded the same
+way.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+SCRYPT_N = int(os.getenv("SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.getenv("SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SCRYPT_P", "1"))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+PREFIX = "scrypt$"
+
+
+class HasherBusy(Exception):
+    """Too many password hashes are already queued."""
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # OpenSSL needs 128 * r * n bytes for the main buffer; leave room for the rest
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=129 * r * (n + p + 2), dklen=KEY_BYTES)
+
+
+def hash_password(password: str, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P, salt: bytes | None = None) -> str:
+    # A fixed salt is only for reproducible synthetic data (app/datagen.py)
+    salt = salt or secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return f"{PREFIX}{n}${r}${p}${base64.b64encode(salt).decode()}${base64.b64encode(key).decode()}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    if not stored.startswith(PREFIX):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    n, r, p, salt, key = stored[len(PREFIX):].split("$")
+    candidate = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(candidate, base64.b64decode(key))
+
+
+def needs_rehash(stored: str, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P) -> bool:
+    return not stored.startswith(f"{PREFIX}{n}${r}${p}$")
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.n, self.r, self.p = n, r, p
+        self.pending = 0
+        self._pool: ThreadPoolExecutor | None = None
+        self._dummy: str | None = None
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.n, self.r, self.p)
+
+    async def verify(self, password: str, stored: str | None) -> bool:
+        """Check ``password`` against ``stored``.
+
+        With no stored hash (unknown user) a dummy hash is checked anyway so
+        the response time does not reveal whether the account exists.
+        """
+        if stored is None:
+            if self._dummy is None:
+                self._dummy = await self.hash(secrets.token_hex(8))
+            await self._run(verify_password, password, self._dummy)
+            return False
+        return await self._run(verify_password, password, stored)
+
+    def needs_rehash(self, stored: str) -> bool:
+        return needs_rehash(stored, self.n, self.r, self.p)
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HasherBusy("Too many logins in progress")
+        self.start()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self.pending -= 1
+
+
+password_hasher = PasswordHasher()
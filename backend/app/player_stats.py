@@ -0,0 +1,184 @@
+"""Per-player running statistics for ``GET /players/{id}/stats``.
+
+``player_stats`` keeps, per user and mode, the game count, the sum and sum of
+squares of scores and the best score, so the average and standard deviation
+are a single-row read. ``player_recent_scores`` is a ring of the last
+``PLAYER_STATS_RECENT`` scores: game number ``seq`` lives in slot
+``seq % PLAYER_STATS_RECENT`` and overwrites the game that was there.
+
+``crud.submit_scores`` calls :func:`record` inside the submit transaction.
+Each batch costs one upsert of the aggregates (returning the new game counts,
+which number the games without a read) and one upsert of ring slots, however
+much history the player has.
+
+Rebuild from ``leaderboard_entries``, or only compare against it, with::
+
+    uv run python -m app.player_stats [--check]
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+from collections import defaultdict
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas
+from .leaderboard_index import IndexedEntry
+
+PLAYER_STATS_RECENT = int(os.getenv("PLAYER_STATS_RECENT", "10"))
+
+Stats = models.PlayerStats
+Recent = models.PlayerRecentScore
+
+
+async def record(db: AsyncSession, entries: list[IndexedEntry], recent: int = PLAYER_STATS_RECENT):
+    """Fold ``entries`` (in submit order) into the running stats; the caller commits."""
+    groups: dict[tuple[str, models.GameMode], list[IndexedEntry]] = defaultdict(list)
+    for entry in entries:
+        groups[(entry.user_id, models.GameMode(entry.mode))].append(entry)
+    if not groups:
+        return
+
+    is_postgres = db.bind.dialect.name == "postgresql"
+    insert = (postgresql if is_postgres else sqlite).insert
+    # Two-argument max() is SQLite's spelling of greatest()
+    greatest = func.greatest if is_postgres else func.max
+    statement = insert(Stats).values([
+        {
+            "user_id": user_id, "mode": mode, "games": len(group),
+            "total": sum(e.score for e in group),
+            "total_squares": sum(e.score * e.score for e in group),
+            "best": max(e.score for e in group),
+        }
+        for (user_id, mode), group in groups.items()
+    ])
+    new = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[Stats.user_id, Stats.mode],
+        set_={
+            "games": Stats.games + new.games,
+            "total": Stats.total + new.total,
+            "total_squares": Stats.total_squares + new.total_squares,
+            "best": greatest(Stats.best, new.best),
+        },
+    ).returning(Stats.user_id, Stats.mode, Stats.games)
+    games = {(row.user_id, models.GameMode(row.mode)): row.games for row in await db.execute(statement)}
+
+    slots = []
+    for key, group in groups.items():
+        first = games[key] - len(group) + 1
+        for seq, entry in list(enumerate(group, start=first))[-recent:]:
+            slots.append({"user_id": key[0], "mode": key[1], "slot": seq % recent, "seq": seq, "score": entry.score, "played_at": entry.played_at})
+    statement = insert(Recent).values(slots)
+    new = statement.excluded
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[Recent.user_id, Recent.mode, Recent.slot],
+        set_={"seq": new.seq, "score": new.score, "played_at": new.played_at},
+        where=new.seq > Recent.seq,
+    ))
+
+
+def mode_stats(stats: models.PlayerStats, recent: list[int]) -> schemas.PlayerModeStats:
+    average = stats.total / stats.games
+    variance = max(stats.total_squares / stats.games - average * average, 0.0)
+    return schemas.PlayerModeStats(
+        mode=stats.mode,
+        games=stats.games,
+        average=average,
+        stddev=math.sqrt(variance),
+        best=stats.best,
+        recent=recent,
+        recent_average=sum(recent) / len(recent) if recent else 0.0,
+    )
+
+
+async def get_stats(db: AsyncSession, user_id: str) -> schemas.PlayerStats | None:
+    """The user's stats per mode, or ``None`` if they have never submitted a score."""
+    rows = (await db.execute(select(Stats).where(Stats.user_id == user_id).order_by(Stats.mode))).scalars().all()
+    if not rows:
+        return None
+    recent: dict[models.GameMode, list[int]] = defaultdict(list)
+    ring = await db.execute(select(Recent.mode, Recent.score).where(Recent.user_id == user_id).order_by(Recent.seq.desc()))
+    for mode, score in ring:
+        recent[mode].append(score)
+    return schemas.PlayerStats(user_id=user_id, modes=[mode_stats(row, recent[row.mode]) for row in rows])
+
+
+async def rebuild(session_factory, batch_size: int = 10000, recent: int = PLAYER_STATS_RECENT) -> int:
+    """Recompute both tables from ``leaderboard_entries`` in committed keyset batches.
+
+    Entries are replayed in ``(played_at, id)`` order so the rings end up
+    holding the latest games.
+    """
+    entry = models.LeaderboardEntry
+    columns = (entry.id, entry.user_id, entry.username, entry.score, entry.mode, entry.played_at)
+    total, last = 0, None
+    async with session_factory() as db:
+        await db.execute(delete(Recent))
+        await db.execute(delete(Stats))
+        while True:
+            query = select(*columns).order_by(entry.played_at, entry.id).limit(batch_size)
+            if last is not None:
+                query = query.where((entry.played_at > last.played_at) | ((entry.played_at == last.played_at) & (entry.id > last.id)))
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+            last = rows[-1]
+            await record(db, [IndexedEntry(*row) for row in rows], recent)
+            await db.commit()
+            total += len(rows)
+        await db.commit()
+    return total
+
+
+async def check(db: AsyncSession) -> list[str]:
+    """Differences between the stored aggregates and a full GROUP BY of ``leaderboard_entries``."""
+    entry = models.LeaderboardEntry
+    expected = {
+        (row.user_id, row.mode): (row.games, row.total, row.total_squares, row.best)
+        for row in await db.execute(
+            select(
+                entry.user_id, entry.mode,
+                func.count().label("games"), func.sum(entry.score).label("total"),
+                func.sum(entry.score * entry.score).label("total_squares"), func.max(entry.score).label("best"),
+            ).group_by(entry.user_id, entry.mode)
+        )
+    }
+    stored = {
+        (row.user_id, row.mode): (row.games, row.total, row.total_squares, row.best)
+        for row in (await db.execute(select(Stats))).scalars()
+    }
+    return [
+        f"{user_id} {mode.value}: stored {stored.get((user_id, mode))}, expected {expected.get((user_id, mode))}"
+        for user_id, mode in sorted(expected.keys() | stored.keys())
+        if expected.get((user_id, mode)) != stored.get((user_id, mode))
+    ]
+
+
+async def main():
+    from .database import AsyncSessionLocal, engine, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild (or check) per-player stats from leaderboard_entries.")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--check", action="store_true", help="only report aggregates that disagree with the entries")
+    args = parser.parse_args()
+
+    await init_db()
+    if args.check:
+        async with AsyncSessionLocal() as db:
+            problems = await check(db)
+        await engine.dispose()
+        print("\n".join(problems) or "Player stats are consistent")
+        sys.exit(1 if problems else 0)
+
+    total = await rebuild(AsyncSessionLocal, args.batch_size)
+    print(f"Rebuilt player stats from {total} entries")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+"""In-memory presence registry for active players.
+
+Heartbeats update a dict entry in O(1) and give it a fresh TTL. Expiry is
+tracked with a hashed timer wheel: one slot per ``PRESENCE_TICK_SECONDS``,
+enough slots to cover the TTL, and each entry lives in the slot of the tick
+after it expires. The sweeper visits only the slots for ticks that have passed,
+so its cost is proportional to the number of expirations, not the number of
+players.
+
+While the registry is running ``GET /players`` and ``GET /players/{id}`` are
+served from memory. The ``active_players`` table is loaded once at startup and,
+if ``PRESENCE_SNAPSHOT_SECONDS`` is set, rewritten periodically and on
+shutdown so another instance can pick the state up.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from . import crud, models, schemas
+from .database import AsyncSessionLocal
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL_SECONDS = float(os.getenv("PRESENCE_TTL_SECONDS", "30"))
+PRESENCE_TICK_SECONDS = float(os.getenv("PRESENCE_TICK_SECONDS", "1"))
+PRESENCE_SNAPSHOT_SECONDS = float(os.getenv("PRESENCE_SNAPSHOT_SECONDS", "0"))
+
+
+@dataclass(slots=True)
+class Presence:
+    id: str
+    username: str
+    current_score: int
+    mode: models.GameMode
+    started_at: datetime
+    expires_at: float
+    slot: int
+
+
+class PresenceRegistry:
+    def __init__(
+        self,
+        ttl: float = PRESENCE_TTL_SECONDS,
+        tick: float = PRESENCE_TICK_SECONDS,
+        snapshot_interval: float = PRESENCE_SNAPSHOT_SECONDS,
+        session_factory=AsyncSessionLocal,
+        clock=time.monotonic,
+    ):
+        self.ttl = ttl
+        self.tick = tick
+        self.snapshot_interval = snapshot_interval
+        self.session_factory = session_factory
+        self.clock = clock
+        self.running = False
+        self._players: dict[str, Presence] = {}
+        # An entry is at most ceil(ttl / tick) + 1 ticks ahead of the cursor
+        self._wheel: list[set[str]] = [set() for _ in range(math.ceil(ttl / tick) + 2)]
+        self._cursor = self._tick_of(clock())
+        self._tasks: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def get(self, player_id: str) -> Presence | None:
+        return self._players.get(player_id)
+
+    def players(self) -> list[Presence]:
+        return list(self._players.values())
+
+    def heartbeat(self, player_id: str, username: str, score: int, mode: schemas.GameMode, started_at: datetime | None = None) -> Presence:
+        expires_at = self.clock() + self.ttl
+        slot = (self._tick_of(expires_at) + 1) % len(self._wheel)
+        entry = self._players.get(player_id)
+        if entry is None:
+            entry = Presence(player_id, username, score, models.GameMode(mode), started_at or datetime.now(timezone.utc), expires_at, slot)
+            self._players[player_id] = entry
+            response_cache.bump("players")
+        else:
+            self._wheel[entry.slot].discard(player_id)
+            if (entry.username, entry.current_score, entry.mode) != (username, score, mode):
+                response_cache.bump("players")
+            if entry.mode != mode:
+                # A different mode means a new game
+                entry.started_at = started_at or datetime.now(timezone.utc)
+            entry.username, entry.current_score, entry.mode = username, score, models.GameMode(mode)
+            entry.expires_at, entry.slot = expires_at, slot
+        self._wheel[slot].add(player_id)
+        return entry
+
+    def remove(self, player_id: str) -> bool:
+        entry = self._players.pop(player_id, None)
+        if entry is None:
+            return False
+        self._wheel[entry.slot].discard(player_id)
+        response_cache.bump("players")
+        return True
+
+    def sweep(self) -> list[str]:
+        """Drop every entry whose TTL has run out; returns their ids."""
+        now = self.clock()
+        now_tick = self._tick_of(now)
+        # After a long stall one lap of the wheel already covers every slot
+        self._cursor = max(self._cursor, now_tick - len(self._wheel))
+        expired = []
+        while self._cursor < now_tick:
+            self._cursor += 1
+            bucket = self._wheel[self._cursor % len(self._wheel)]
+            for player_id in [pid for pid in bucket if self._players[pid].expires_at <= now]:
+                bucket.discard(player_id)
+                del self._players[player_id]
+                expired.append(player_id)
+        if expired:
+            response_cache.bump("players")
+        return expired
+
+    async def load(self):
+        """Seed the registry from ``active_players``; loaded entries get a fresh TTL."""
+        async with self.session_factory() as db:
+            for player in await crud.get_active_players(db):
+                self.heartbeat(player.id, player.username, player.current_score, player.mode, player.started_at)
+
+    async def snapshot(self):
+        async with self.session_factory() as db:
+            await crud.replace_active_players(db, self.players())
+
+    async def start(self):
+        await self.load()
+        self.running = True
+        self._tasks = [asyncio.create_task(self._sweep_loop())]
+        if self.snapshot_interval > 0:
+            self._tasks.append(asyncio.create_task(self._snapshot_loop()))
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.snapshot_interval > 0:
+            await self.snapshot()
+
+    def reset(self):
+        self.__init__(self.ttl, self.tick, self.snapshot_interval, self.session_factory, self.clock)
+
+    def _tick_of(self, t: float) -> int:
+        return int(t // self.tick)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            self.sweep()
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.snapshot()
+            except Exception:
+                logger.exception("Presence snapshot failed")
+
+
+presence_registry = PresenceRegistry()
@@ -0,0 +1,103 @@
+"""Per-request SQL statement counts and time.
+
+Every engine's ``before_cursor_execute`` / ``after_cursor_execute`` events add
+to the :class:`QueryStats` in the current context, if any. :func:`track`
+opens one for a block of code; trackers nest, and a statement counts towards
+each enclosing tracker, so a test can wrap several requests and each request
+still gets its own numbers. Outside a tracker the hooks return straight away.
+
+With ``DEBUG=true``, :class:`QueryStatsMiddleware` tracks every HTTP request
+and reports the result on the response::
+
+    Server-Timing: db;dur=1.84;desc="3 queries"
+    X-DB-Queries: 3
+
+``tests/conftest.py`` builds ``assert_max_queries(n)`` on :func:`track` to
+hold each endpoint to a round-trip budget.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    statements: list[str] = field(default_factory=list)
+    parent: "QueryStats | None" = None
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track() -> Iterator[QueryStats]:
+    """Count the statements run in this context until the block exits."""
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - conn.info["query_stats_start"].pop()
+    while stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.statements.append(statement)
+        stats = stats.parent
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    starts = context.connection.info.get("query_stats_start") if context.connection is not None else None
+    if _current.get() is not None and starts:
+        starts.pop()
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware adding ``Server-Timing`` and ``X-DB-Queries`` headers.
+
+    The headers go out with the response start, so statements run after that
+    (streamed bodies, background tasks) are not included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track() as stats:
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"'.encode()))
+                    headers.append((b"x-db-queries", str(stats.count).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_stats)
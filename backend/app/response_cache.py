@@ -0,0 +1,121 @@
+"""Versioned cache of encoded GET responses with ETag revalidation.
+
+Responses are cached as ready-to-send JSON bytes per ``(route, params)`` key.
+Each key belongs to a topic (``leaderboard`` or ``players``) with a version
+counter; score submits bump ``leaderboard`` and player updates bump
+``players``, which invalidates every cached response of that topic at once.
+
+The ETag is a hash of the body, so it is the same on every worker for the
+same content. A request whose ``If-None-Match`` matches a current entry gets
+a 304 without the database being touched.
+
+Writes made by another process do not bump this process's versions, so
+entries also expire after ``RESPONSE_CACHE_TTL_SECONDS``; that bounds how
+stale a response can be in a multi-worker deployment.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, NamedTuple
+
+from fastapi import Request, Response
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "2"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+# Clients and proxies may store the response but must revalidate it each time
+CACHE_CONTROL = "no-cache"
+
+
+class CachedResponse(NamedTuple):
+    version: int
+    expires_at: float
+    body: bytes
+    etag: str
+    headers: dict[str, str]
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    def __init__(self, enabled: bool = RESPONSE_CACHE, ttl: float = RESPONSE_CACHE_TTL_SECONDS, max_size: int = RESPONSE_CACHE_SIZE, clock=time.monotonic):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.versions: dict[str, int] = {}
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def bump(self, topic: str):
+        self.versions[topic] = self.versions.get(topic, 0) + 1
+
+    def get(self, topic: str, key: Hashable) -> CachedResponse | None:
+        entry = self._entries.get((topic, key))
+        if entry is None or entry.version != self.versions.get(topic, 0) or entry.expires_at <= self.clock():
+            return None
+        self._entries.move_to_end((topic, key))
+        return entry
+
+    def put(self, topic: str, key: Hashable, version: int, body: bytes, headers: dict[str, str] | None = None) -> CachedResponse:
+        entry = CachedResponse(version, self.clock() + self.ttl, body, make_etag(body), headers or {})
+        self._entries[(topic, key)] = entry
+        self._entries.move_to_end((topic, key))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def respond(self, request: Request, topic: str, key: Hashable, build: Callable[[], Awaitable[tuple[bytes, dict[str, str]]]], bypass: bool = False) -> Response:
+        """Serve ``(topic, key)`` from the cache, calling ``build`` on a miss.
+
+        ``build`` returns the JSON body and any extra headers to send with it.
+
+        ``bypass`` skips the cache for requests that must not see (or store) a
+        possibly lagging replica read, such as a session reading its own write.
+        """
+        entry = None if bypass or not self.enabled else self.get(topic, key)
+        if entry is not None:
+            self.hits += 1
+        else:
+            if self.enabled:
+                self.misses += 1
+            # Taken before building so a bump during the query leaves the entry already stale
+            version = self.versions.get(topic, 0)
+            body, extra = await build()
+            if bypass or not self.enabled:
+                entry = CachedResponse(version, 0, body, make_etag(body), extra)
+            else:
+                entry = self.put(topic, key, version, body, extra)
+
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    def clear(self):
+        self._entries.clear()
+        self.versions.clear()
+        self.hits = self.misses = self.not_modified = 0
+
+
+response_cache = ResponseCache()
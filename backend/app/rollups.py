@@ -0,0 +1,215 @@
+"""Daily and weekly leaderboard rollups.
+
+``leaderboard_rollups`` holds, for every UTC day and ISO week (Monday start)
+and every mode, the top ``LEADERBOARD_ROLLUP_DEPTH`` entries of that period.
+``crud.submit_scores`` calls :func:`record` inside the submit transaction, so
+a period board is always consistent with ``leaderboard_entries`` and reading
+one is a short index range scan instead of a scan and sort of the period.
+
+Each batch costs one multi-row upsert for its day and week rows together,
+however many entries and groups it holds. Trimming is not done on the write
+path: :class:`RollupTrimmer` runs every ``LEADERBOARD_ROLLUP_TRIM_SECONDS``,
+cuts the groups this process wrote to back to their top entries, and deletes
+periods older than ``LEADERBOARD_ROLLUP_DAYS`` days / ``LEADERBOARD_ROLLUP_WEEKS``
+weeks. A trim also remembers each full group's cut-off entry, and later
+submits that rank below it are not written at all. Rows only ever join a
+group's top, so a remembered cut-off can be stale, but it is never too high.
+Between trims a group may hold a few more rows than the depth, below its top.
+
+Rebuild from existing entries with::
+
+    uv run python -m app.rollups --batch-size 10000
+"""
+import argparse
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .database import AsyncSessionLocal
+from .leaderboard_index import IndexedEntry, order_key
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_ROLLUP_DEPTH = int(os.getenv("LEADERBOARD_ROLLUP_DEPTH", "100"))
+LEADERBOARD_ROLLUP_DAYS = int(os.getenv("LEADERBOARD_ROLLUP_DAYS", "7"))
+LEADERBOARD_ROLLUP_WEEKS = int(os.getenv("LEADERBOARD_ROLLUP_WEEKS", "8"))
+LEADERBOARD_ROLLUP_TRIM_SECONDS = float(os.getenv("LEADERBOARD_ROLLUP_TRIM_SECONDS", "30"))
+
+RETENTION = {
+    models.Period.DAY: timedelta(days=LEADERBOARD_ROLLUP_DAYS),
+    models.Period.WEEK: timedelta(weeks=LEADERBOARD_ROLLUP_WEEKS),
+}
+
+Rollup = models.LeaderboardRollup
+ROLLUP_ORDER = (Rollup.score.desc(), Rollup.played_at, Rollup.id)
+
+Group = tuple[models.Period, datetime, models.GameMode]
+
+
+def as_utc(moment: datetime) -> datetime:
+    # SQLite hands back naive datetimes; stored values are UTC.
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+
+
+def period_start(period: models.Period, moment: datetime) -> datetime:
+    day = as_utc(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == models.Period.WEEK:
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+class RollupTrimmer:
+    """Trims the groups this process wrote to and rotates out old periods, off the submit path."""
+
+    def __init__(self, depth: int = LEADERBOARD_ROLLUP_DEPTH, interval: float = LEADERBOARD_ROLLUP_TRIM_SECONDS, session_factory=AsyncSessionLocal):
+        self.depth = depth
+        self.interval = interval
+        self.session_factory = session_factory
+        # Order key of the entry at position ``depth`` when the group was last trimmed
+        self.cutoffs: dict[Group, tuple] = {}
+        self.dirty: set[Group] = set()
+        self._task: asyncio.Task | None = None
+
+    def admits(self, group: Group, entry: IndexedEntry) -> bool:
+        cutoff = self.cutoffs.get(group)
+        return cutoff is None or order_key(entry) < cutoff
+
+    async def trim(self, db: AsyncSession, now: datetime | None = None):
+        """Cut every group written since the last trim to ``depth`` rows and drop expired periods; the caller commits."""
+        dirty, self.dirty = self.dirty, set()
+        try:
+            for group in dirty:
+                period, start, mode = group
+                in_group = (Rollup.period == period, Rollup.period_start == start, Rollup.mode == mode)
+                keep = select(Rollup.id).where(*in_group).order_by(*ROLLUP_ORDER).limit(self.depth)
+                await db.execute(delete(Rollup).where(*in_group, Rollup.id.not_in(keep)))
+                last = (await db.execute(
+                    select(Rollup.score, Rollup.played_at, Rollup.id).where(*in_group).order_by(*ROLLUP_ORDER).offset(self.depth - 1).limit(1)
+                )).first()
+                if last is not None:
+                    self.cutoffs[group] = (-last.score, as_utc(last.played_at), last.id)
+        except BaseException:
+            self.dirty |= dirty
+            raise
+        now = now or datetime.now(timezone.utc)
+        for period in models.Period:
+            await rotate(db, period, period_start(period, now))
+        expired = {period: period_start(period, now) - RETENTION[period] for period in models.Period}
+        self.cutoffs = {group: cutoff for group, cutoff in self.cutoffs.items() if group[1] >= expired[group[0]]}
+
+    async def run_once(self):
+        async with self.session_factory() as db:
+            await self.trim(db)
+            await db.commit()
+
+    async def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._trim_loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # Leave no group of this process over depth
+        await self.run_once()
+
+    def reset(self):
+        self.__init__(self.depth, self.interval, self.session_factory)
+
+    async def _trim_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Leaderboard rollup trim failed")
+
+
+rollup_trimmer = RollupTrimmer()
+
+
+async def record(db: AsyncSession, entries: list[IndexedEntry], trimmer: RollupTrimmer | None = None):
+    """Add ``entries`` to their day and week rollups with one upsert; the caller commits."""
+    trimmer = trimmer or rollup_trimmer
+    groups: dict[Group, list[IndexedEntry]] = defaultdict(list)
+    for entry in entries:
+        entry = entry._replace(played_at=as_utc(entry.played_at))
+        for period in models.Period:
+            group = (period, period_start(period, entry.played_at), models.GameMode(entry.mode))
+            if trimmer.admits(group, entry):
+                groups[group].append(entry)
+    rows = [
+        {"period": period, "period_start": start, **entry._asdict(), "mode": mode}
+        for (period, start, mode), group in groups.items()
+        # A large batch (import, backfill) only writes what can still make the top
+        for entry in sorted(group, key=order_key)[:trimmer.depth]
+    ]
+    if not rows:
+        return
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    # Do-nothing on the primary key, so recording an entry twice is harmless
+    await db.execute(dialect.insert(Rollup).values(rows).on_conflict_do_nothing())
+    trimmer.dirty.update(groups)
+
+
+async def rotate(db: AsyncSession, period: models.Period, current: datetime):
+    """Drop ``period`` rollups that fell out of the retention window before ``current``."""
+    await db.execute(delete(Rollup).where(Rollup.period == period, Rollup.period_start < current - RETENTION[period]))
+
+
+async def backfill(session_factory, batch_size: int = 10000, now: datetime | None = None) -> int:
+    """Rebuild the retained rollups from ``leaderboard_entries``, one committed batch at a time.
+
+    Entries are read in primary-key order with a keyset cursor, so memory
+    stays at one batch and no read cursor is held open across commits.
+    """
+    now = now or datetime.now(timezone.utc)
+    since = min(period_start(period, now) - RETENTION[period] for period in models.Period)
+    # Its own cut-offs, learned from the rebuilt rows; a long backfill trims after every batch
+    trimmer = RollupTrimmer(session_factory=session_factory)
+    entry = models.LeaderboardEntry
+    columns = (entry.id, entry.user_id, entry.username, entry.score, entry.mode, entry.played_at)
+    total, last_id = 0, None
+    async with session_factory() as db:
+        await db.execute(delete(Rollup))
+        while True:
+            query = select(*columns).order_by(entry.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(entry.id > last_id)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            await record(db, [IndexedEntry(*row) for row in rows if as_utc(row.played_at) >= since], trimmer)
+            await trimmer.trim(db, now)
+            await db.commit()
+            total += len(rows)
+        await trimmer.trim(db, now)
+        await db.commit()
+    return total
+
+
+async def main():
+    from .database import engine, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild daily and weekly leaderboard rollups from leaderboard_entries.")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    await init_db()
+    total = await backfill(AsyncSessionLocal, args.batch_size)
+    print(f"Rebuilt rollups from {total} entries")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import bulk, schemas
+from ..database import get_db
+from ..dependencies import get_admin_user, get_read_db
+
+# Every route is for the accounts listed in ADMIN_EMAILS
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(get_admin_user)])
+
+ADMIN_ERRORS = {401: {"model": schemas.Error}, 403: {"model": schemas.Error}}
+
+@router.get(
+    "/leaderboard/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media_type: {} for media_type in bulk.MEDIA_TYPES.values()}}, **ADMIN_ERRORS}
+)
+async def export_leaderboard(
+    format: schemas.ExportFormat = schemas.ExportFormat.NDJSON,
+    mode: Optional[schemas.GameMode] = None,
+    since: Optional[datetime] = Query(default=None, description="Entries played at or after"),
+    until: Optional[datetime] = Query(default=None, description="Entries played before"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return StreamingResponse(
+        bulk.export_entries(db, format, mode, since, until),
+        media_type=bulk.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="leaderboard.{format.value}"'},
+    )
+
+@router.post("/leaderboard/import", response_model=schemas.ImportResult, responses=ADMIN_ERRORS)
+async def import_leaderboard(
+    request: Request,
+    format: schemas.ExportFormat = schemas.ExportFormat.NDJSON,
+    db: AsyncSession = Depends(get_db)
+):
+    # The body is read as it arrives (not form-encoded), e.g. curl --data-binary @leaderboard.ndjson
+    return await bulk.import_entries(db, format, request.stream())
@@ -1,48 +1,57 @@
 from fastapi import APIRouter, HTTPException, Response, Depends, Cookie
 from sqlalchemy.ext.asyncio import AsyncSession
-from .. import schemas, crud
+from .. import schemas, changes, crud
 from ..database import get_db
+from ..dependencies import get_current_user
+from ..passwords import HasherBusy
+from ..session_cache import CachedUser, session_cache
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-@router.post("/signup", response_model=schemas.User, status_code=201, responses={400: {"model": schemas.Error}})
+@router.post("/signup", response_model=schemas.User, status_code=201, responses={400: {"model": schemas.Error}, 503: {"model": schemas.Error}})
 async def signup(user_create: schemas.UserCreate, response: Response, db: AsyncSession = Depends(get_db)):
     try:
         # Check if user exists
-        if await crud.get_user_by_email(db, user_create.email):
+        existing = await crud.get_users_by_email_or_username(db, user_create.email, user_create.username)
+        if any(user.email == user_create.email for user in existing):
             raise HTTPException(status_code=400, detail="Email already registered")
-        if await crud.get_user_by_username(db, user_create.username):
+        if existing:
             raise HTTPException(status_code=400, detail="Username already taken")
 
         user = await crud.create_user(db, user_create)
+        session_cache.invalidate(user.email)
+        changes.session_invalidated(user.email)
         # Set session cookie (simplified for mock)
         response.set_cookie(key="session_id", value=user.email)
         return user
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/login", response_model=schemas.User, responses={401: {"model": schemas.Error}})
+@router.post("/login", response_model=schemas.User, responses={401: {"model": schemas.Error}, 503: {"model": schemas.Error}})
 async def login(user_login: schemas.UserLogin, response: Response, db: AsyncSession = Depends(get_db)):
-    if not await crud.verify_password(db, user_login.email, user_login.password):
+    try:
+        user = await crud.authenticate_user(db, user_login.email, user_login.password)
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    user = await crud.get_user_by_email(db, user_login.email)
+
+    # Warm the cache so the requests that follow a login skip the lookup
+    session_cache.put(user.email, CachedUser.from_model(user))
     # Set session cookie
     response.set_cookie(key="session_id", value=user.email)
     return user
 
 @router.post("/logout")
-async def logout(response: Response):
+async def logout(response: Response, session_id: str | None = Cookie(default=None)):
+    if session_id:
+        session_cache.invalidate(session_id)
+        changes.session_invalidated(session_id)
     response.delete_cookie("session_id")
     return {"message": "Logout successful"}
 
 @router.get("/me", response_model=schemas.User, responses={401: {"model": schemas.Error}})
-async def get_me(session_id: str | None = Cookie(default=None), db: AsyncSession = Depends(get_db)):
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user = await crud.get_user_by_email(db, session_id)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
+async def get_me(user: CachedUser = Depends(get_current_user)):
     return user
@@ -1,35 +1,144 @@
-from fastapi import APIRouter, HTTPException, Query, Cookie, Depends
+from fastapi import APIRouter, HTTPException, Query, Cookie, Depends, Request, Response
 from typing import List, Optional
+from datetime import datetime, timezone
+import base64
+import binascii
+import json
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from .. import schemas, crud
+from .. import best_scores, schemas, crud, models, rollups
 from ..database import get_db
+from ..dependencies import get_current_user, get_read_db, read_your_writes
+from ..session_cache import CachedUser
+from ..ingest import score_ingestor, IngestUnavailable
+from ..histogram import score_histogram, count_entries, describe
+from ..response_cache import response_cache
+from ..serializers import encode_entries
+from ..verification import replay_verifier, VerifierBusy, SCORE_REPLAY_REQUIRED
 
 router = APIRouter(prefix="/leaderboard", tags=["Leaderboard"])
 
-@router.get("", response_model=List[schemas.LeaderboardEntry])
+ranked_adapter = TypeAdapter(List[schemas.RankedLeaderboardEntry])
+
+def encode_cursor(entry) -> str:
+    played_at = entry.played_at
+    if played_at.tzinfo is None:
+        # SQLite hands back naive datetimes; stored values are UTC.
+        played_at = played_at.replace(tzinfo=timezone.utc)
+    raw = json.dumps([entry.score, played_at.isoformat(), entry.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> crud.LeaderboardCursor:
+    try:
+        score, played_at, entry_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        played_at = datetime.fromisoformat(played_at)
+        if not isinstance(score, int) or not isinstance(entry_id, str) or played_at.tzinfo is None:
+            raise ValueError
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return score, played_at, entry_id
+
+@router.get(
+    "",
+    response_model=List[schemas.LeaderboardEntry],
+    responses={304: {"description": "Not modified"}, 400: {"model": schemas.Error}}
+)
 async def get_leaderboard(
+    request: Request,
     mode: Optional[schemas.GameMode] = None,
     limit: int = Query(default=10, ge=1, le=100),
-    db: AsyncSession = Depends(get_db)
-):
-    return await crud.get_leaderboard(db, mode, limit)
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    period: schemas.Period = schemas.Period.ALL,
+    distinct: bool = Query(default=False, description="Only each player's best entry per mode"),
+    session_id: str | None = Cookie(default=None),
+    db: AsyncSession = Depends(get_read_db)
+) -> Response:
+    if distinct and period != schemas.Period.ALL:
+        raise HTTPException(status_code=400, detail="distinct is only supported for period=all")
+    # Keyset pagination: pages continue after the last (score, played_at, id) seen, never OFFSET
+    after = decode_cursor(cursor) if cursor else None
+
+    async def build() -> tuple[bytes, dict]:
+        entries = await crud.get_leaderboard(db, mode, limit, after, period, distinct)
+        headers = {"X-Next-Cursor": encode_cursor(entries[-1])} if len(entries) == limit else {}
+        return encode_entries(entries), headers
 
-@router.post("", response_model=schemas.ScoreResponse, status_code=201, responses={401: {"model": schemas.Error}})
+    # The period start is part of the key so a cached day board is not served into the next day
+    current = None if period == schemas.Period.ALL else rollups.period_start(models.Period(period.value), datetime.now(timezone.utc))
+    return await response_cache.respond(request, "leaderboard", (mode, limit, after, period, current, distinct), build, bypass=read_your_writes.pinned(session_id))
+
+@router.get("/histogram", response_model=schemas.ScoreHistogram, responses={304: {"description": "Not modified"}})
+async def get_histogram(
+    request: Request,
+    mode: schemas.GameMode,
+    db: AsyncSession = Depends(get_read_db)
+) -> Response:
+    async def build() -> tuple[bytes, dict]:
+        if score_histogram.running:
+            histogram = score_histogram.describe(mode)
+        else:
+            counts = await count_entries(db, score_histogram.bucket_width, score_histogram.overflow, mode)
+            histogram = describe(mode, score_histogram.bucket_width, score_histogram.overflow, counts[models.GameMode(mode)])
+        return histogram.model_dump_json(by_alias=True).encode(), {}
+
+    return await response_cache.respond(request, "leaderboard", ("histogram", mode), build)
+
+@router.get(
+    "/around/{user_id}",
+    response_model=List[schemas.RankedLeaderboardEntry],
+    responses={304: {"description": "Not modified"}, 404: {"model": schemas.Error}}
+)
+async def get_leaderboard_around(
+    request: Request,
+    user_id: str,
+    mode: schemas.GameMode,
+    k: int = Query(default=5, ge=0, le=50),
+    session_id: str | None = Cookie(default=None),
+    db: AsyncSession = Depends(get_read_db)
+) -> Response:
+    async def build() -> tuple[bytes, dict]:
+        window = await crud.get_leaderboard_around(db, user_id, mode, k)
+        if window is None:
+            raise HTTPException(status_code=404, detail="No scores for this player")
+        ranked = [
+            {**schemas.LeaderboardEntry.model_validate(entry).model_dump(), "rank": rank}
+            for entry, rank in window
+        ]
+        return ranked_adapter.dump_json(ranked_adapter.validate_python(ranked), by_alias=True), {}
+
+    return await response_cache.respond(request, "leaderboard", ("around", user_id, mode, k), build, bypass=read_your_writes.pinned(session_id))
+
+@router.post("", response_model=schemas.ScoreResponse, response_model_exclude_none=True, status_code=201, responses={401: {"model": schemas.Error}, 422: {"model": schemas.Error}, 503: {"model": schemas.Error}})
 async def submit_score(
     score_submit: schemas.ScoreSubmit,
+    distinct: bool = Query(default=False, description="Also report the player's rank on the distinct board"),
+    user: CachedUser = Depends(get_current_user),
     session_id: str | None = Cookie(default=None),
     db: AsyncSession = Depends(get_db)
 ):
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user = await crud.get_user_by_email(db, session_id)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    if score_submit.replay is not None:
+        try:
+            verified = await replay_verifier.verify(score_submit.replay, score_submit.mode, score_submit.score)
+        except VerifierBusy as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        if not verified:
+            raise HTTPException(status_code=422, detail="Score does not match replay")
+    elif SCORE_REPLAY_REQUIRED:
+        raise HTTPException(status_code=422, detail="Replay required")
 
     try:
-        rank = await crud.submit_score(db, user.id, user.username, score_submit.score, score_submit.mode)
-        return schemas.ScoreResponse(success=True, rank=rank)
+        if score_ingestor.running:
+            rank = await score_ingestor.submit(user.id, user.username, score_submit.score, score_submit.mode)
+        else:
+            rank = await crud.submit_score(db, user.id, user.username, score_submit.score, score_submit.mode)
+        # Until the replica catches up, this session reads its own score from the primary
+        read_your_writes.mark(session_id)
+        best_rank = await best_scores.get_best_rank(db, user.id, score_submit.mode) if distinct else None
+        percentile = await crud.get_percentile(db, score_submit.mode, score_submit.score)
+        return schemas.ScoreResponse(success=True, rank=rank, best_rank=best_rank, percentile=percentile)
+    except IngestUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         # Should not happen if user exists
         raise HTTPException(status_code=400, detail=str(e))
@@ -1,18 +1,116 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Cookie, Request, Response, WebSocket, WebSocketDisconnect
 from typing import List
+from datetime import datetime, timezone
+import anyio
 from sqlalchemy.ext.asyncio import AsyncSession
-from .. import schemas, crud
+from .. import schemas, changes, crud, player_stats
 from ..database import get_db
+from ..dependencies import get_current_user, get_read_db, read_your_writes
+from ..live import player_broadcaster
+from ..presence import presence_registry
+from ..response_cache import response_cache
+from ..serializers import encode_players
+from ..session_cache import CachedUser
 
 router = APIRouter(prefix="/players", tags=["Players"])
 
-@router.get("", response_model=List[schemas.ActivePlayer])
-async def get_active_players(db: AsyncSession = Depends(get_db)):
-    return await crud.get_active_players(db)
+@router.get("", response_model=List[schemas.ActivePlayer], responses={304: {"description": "Not modified"}})
+async def get_active_players(
+    request: Request,
+    session_id: str | None = Cookie(default=None),
+    db: AsyncSession = Depends(get_read_db)
+) -> Response:
+    async def build() -> tuple[bytes, dict]:
+        if presence_registry.running:
+            players = presence_registry.players()
+        else:
+            players = await crud.get_active_players(db)
+        return encode_players(players), {}
+
+    bypass = read_your_writes.pinned(session_id) and not presence_registry.running
+    return await response_cache.respond(request, "players", "all", build, bypass=bypass)
+
+@router.post("/heartbeat", response_model=schemas.ActivePlayer, responses={401: {"model": schemas.Error}})
+async def heartbeat(
+    player_heartbeat: schemas.PlayerHeartbeat,
+    user: CachedUser = Depends(get_current_user),
+    session_id: str | None = Cookie(default=None),
+    db: AsyncSession = Depends(get_db)
+):
+
+    if presence_registry.running:
+        player = presence_registry.heartbeat(user.id, user.username, player_heartbeat.score, player_heartbeat.mode)
+        changes.player_seen(player)
+        return player
+    read_your_writes.mark(session_id)
+    return await crud.create_active_player(db, schemas.ActivePlayer(
+        id=user.id,
+        username=user.username,
+        current_score=player_heartbeat.score,
+        mode=player_heartbeat.mode,
+        started_at=datetime.now(timezone.utc)
+    ))
+
+@router.delete("/heartbeat", status_code=204, responses={401: {"model": schemas.Error}})
+async def leave(
+    user: CachedUser = Depends(get_current_user),
+    session_id: str | None = Cookie(default=None),
+    db: AsyncSession = Depends(get_db)
+):
+
+    if presence_registry.running:
+        if presence_registry.remove(user.id):
+            changes.player_left(user.id)
+    else:
+        await crud.remove_active_player(db, user.id)
+        read_your_writes.mark(session_id)
+    return Response(status_code=204)
+
+@router.websocket("/ws")
+async def players_feed(websocket: WebSocket):
+    # Snapshot on connect, then deltas; see app/live.py for the message format
+    await websocket.accept()
+    async with player_broadcaster.subscribe() as subscription:
+        async with anyio.create_task_group() as tg:
+            async def forward():
+                while (message := await subscription.get()) is not None:
+                    await websocket.send_text(message)
+                # Fell too far behind; the client reconnects for a fresh snapshot
+                await websocket.close(code=1013)
+                tg.cancel_scope.cancel()
+
+            async def wait_for_disconnect():
+                try:
+                    while True:
+                        await websocket.receive_text()
+                except WebSocketDisconnect:
+                    tg.cancel_scope.cancel()
+
+            tg.start_soon(forward)
+            tg.start_soon(wait_for_disconnect)
+
+@router.get("/{player_id}/stats", response_model=schemas.PlayerStats, responses={304: {"description": "Not modified"}, 404: {"model": schemas.Error}})
+async def get_player_stats(
+    request: Request,
+    player_id: str,
+    session_id: str | None = Cookie(default=None),
+    db: AsyncSession = Depends(get_read_db)
+) -> Response:
+    async def build() -> tuple[bytes, dict]:
+        stats = await player_stats.get_stats(db, player_id)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="No scores for this player")
+        return stats.model_dump_json(by_alias=True).encode(), {}
+
+    # Stats change with score submits, which bump the leaderboard topic
+    return await response_cache.respond(request, "leaderboard", ("stats", player_id), build, bypass=read_your_writes.pinned(session_id))
 
 @router.get("/{player_id}", response_model=schemas.ActivePlayer, responses={404: {"model": schemas.Error}})
-async def get_player(player_id: str, db: AsyncSession = Depends(get_db)):
-    player = await crud.get_active_player(db, player_id)
+async def get_player(player_id: str, db: AsyncSession = Depends(get_read_db)):
+    if presence_registry.running:
+        player = presence_registry.get(player_id)
+    else:
+        player = await crud.get_active_player(db, player_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
     return player
@@ -1,12 +1,25 @@
+import os
+
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from typing import Optional
 from datetime import datetime
 from enum import Enum
 
+# Longest game a replay may claim (enforced by app/verification.py). Read here so it also caps
+# ``Replay.moves`` at parse time: a game has at most one direction change per tick.
+REPLAY_MAX_TICKS = int(os.getenv("REPLAY_MAX_TICKS", "20000"))
+# Highest score accepted from a client. Scores in a 20x20 game top out just under 4000.
+SCORE_MAX = int(os.getenv("SCORE_MAX", "10000"))
+
 class GameMode(str, Enum):
     PASS_THROUGH = "pass-through"
     WALLS = "walls"
 
+class Period(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    ALL = "all"
+
 class User(BaseModel):
     id: str
     username: str
@@ -34,13 +47,45 @@ class LeaderboardEntry(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class RankedLeaderboardEntry(LeaderboardEntry):
+    rank: int
+
+class Direction(str, Enum):
+    UP = "UP"
+    DOWN = "DOWN"
+    LEFT = "LEFT"
+    RIGHT = "RIGHT"
+
+class Replay(BaseModel):
+    seed: int = Field(ge=0, le=0xFFFFFFFF)
+    ticks: int = Field(ge=1)
+    moves: list[tuple[int, Direction]] = Field(default=[], max_length=REPLAY_MAX_TICKS)
+
 class ScoreSubmit(BaseModel):
-    score: int
+    score: int = Field(ge=0, le=SCORE_MAX)
     mode: GameMode
+    replay: Optional[Replay] = None
 
 class ScoreResponse(BaseModel):
     success: bool
     rank: Optional[int] = None
+    # Rank of the player's personal best among everyone's, only sent for ``?distinct=true`` submits
+    best_rank: Optional[int] = Field(default=None, serialization_alias="bestRank")
+    # Percentage of games in the mode that scored lower (estimated from the histogram when it is running)
+    percentile: Optional[float] = None
+
+class HistogramBucket(BaseModel):
+    min: int
+    # None for the overflow bucket
+    max: Optional[int]
+    count: int
+
+class ScoreHistogram(BaseModel):
+    mode: GameMode
+    bucket_width: int = Field(serialization_alias="bucketWidth")
+    total: int
+    # Empty buckets are left out
+    buckets: list[HistogramBucket]
 
 class ActivePlayer(BaseModel):
     id: str
@@ -51,5 +96,49 @@ class ActivePlayer(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class PlayerModeStats(BaseModel):
+    mode: GameMode
+    games: int
+    average: float
+    stddev: float
+    best: int
+    # Newest first
+    recent: list[int]
+    recent_average: float = Field(serialization_alias="recentAverage")
+
+class PlayerStats(BaseModel):
+    user_id: str = Field(serialization_alias="userId")
+    modes: list[PlayerModeStats]
+
+class PlayerHeartbeat(BaseModel):
+    score: int
+    mode: GameMode
+
 class Error(BaseModel):
     message: str
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class EntryImport(BaseModel):
+    """One line of a bulk import: a ``LeaderboardEntry`` as exported, with ``id`` and ``playedAt`` optional."""
+    id: Optional[str] = None
+    user_id: str = Field(validation_alias="userId")
+    username: str
+    score: int = Field(ge=0)
+    mode: GameMode
+    played_at: Optional[datetime] = Field(default=None, validation_alias="playedAt")
+
+class ImportFailure(BaseModel):
+    line: int
+    message: str
+
+class ImportResult(BaseModel):
+    imported: int
+    # Entries whose id was already stored (or repeated in the upload)
+    skipped: int
+    failed: int
+    # The first ``IMPORT_MAX_ERRORS`` failures
+    errors: list[ImportFailure]
+    seconds: float
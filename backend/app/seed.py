@@ -1,10 +1,23 @@
+"""Demo data for local development (``SEED_DB=true``): five named players with a
+few scores each. For volume, generate synthetic data with ``app/datagen.py``."""
 import asyncio
 import uuid
 import random
 from datetime import datetime, timezone
 from .database import AsyncSessionLocal, init_db, engine
 from .models import User, LeaderboardEntry, ActivePlayer, GameMode
-from sqlalchemy import select
+from .passwords import password_hasher
+from . import best_scores, player_stats, rollups
+from sqlalchemy import insert, select
+
+DEMO_USERS = [
+    ("SnakeMaster", "snake@example.com", "password"),
+    ("PixelPython", "pixel@example.com", "password"),
+    ("NeonNibbler", "neon@example.com", "password"),
+    ("RetroReptile", "retro@example.com", "password"),
+    ("ArcadeAce", "arcade@example.com", "password"),
+]
+ACTIVE_USERNAMES = ["NeonNibbler", "RetroReptile"]
 
 async def seed_data():
     print("Creating tables...")
@@ -12,76 +25,57 @@ async def seed_data():
 
     async with AsyncSessionLocal() as session:
         print("Checking for existing data...")
-        result = await session.execute(select(User))
-        if result.scalars().first():
+        if (await session.execute(select(User.id).limit(1))).first():
             print("Data already exists. Skipping seed.")
             return
 
         print("Seeding users...")
-        users_data = [
-            ("SnakeMaster", "snake@example.com", "password"),
-            ("PixelPython", "pixel@example.com", "password"),
-            ("NeonNibbler", "neon@example.com", "password"),
-            ("RetroReptile", "retro@example.com", "password"),
-            ("ArcadeAce", "arcade@example.com", "password"),
+        now = datetime.now(timezone.utc)
+        hashes = await asyncio.gather(*(password_hasher.hash(password) for _, _, password in DEMO_USERS))
+        users = [
+            {"id": str(uuid.uuid4()), "username": username, "email": email, "password_hash": password_hash, "created_at": now}
+            for (username, email, _), password_hash in zip(DEMO_USERS, hashes)
         ]
+        # Each table is one executemany, not a session.add per row
+        await session.execute(insert(User), users)
 
-        users = {}
-        for username, email, password in users_data:
-            user = User(
-                id=str(uuid.uuid4()),
-                username=username,
-                email=email,
-                password_hash=password, # In real app, hash this!
-                created_at=datetime.now(timezone.utc)
-            )
-            session.add(user)
-            users[username] = user
-        
-        # Flush to get user IDs if needed (though we generated UUIDs manually)
-        # But we need to add them to session to establish relationships if we were adding via relationship
-        
         print("Seeding leaderboard...")
-        for user in users.values():
-            # Walls mode
-            session.add(LeaderboardEntry(
-                id=str(uuid.uuid4()),
-                user_id=user.id,
-                username=user.username,
-                score=random.randint(500, 3000),
-                mode=GameMode.WALLS,
-                played_at=datetime.now(timezone.utc)
-            ))
-            
-            # Pass-through mode
-            session.add(LeaderboardEntry(
-                id=str(uuid.uuid4()),
-                user_id=user.id,
-                username=user.username,
-                score=random.randint(500, 3000),
-                mode=GameMode.PASS_THROUGH,
-                played_at=datetime.now(timezone.utc)
-            ))
+        await session.execute(insert(LeaderboardEntry), [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user["id"],
+                "username": user["username"],
+                "score": random.randint(500, 3000),
+                "mode": mode,
+                "played_at": now,
+            }
+            for user in users for mode in (GameMode.WALLS, GameMode.PASS_THROUGH)
+        ])
 
         print("Seeding active players...")
-        active_usernames = ["NeonNibbler", "RetroReptile"]
-        for username in active_usernames:
-            user = users.get(username)
-            if user:
-                session.add(ActivePlayer(
-                    id=user.id,
-                    username=user.username,
-                    current_score=random.randint(100, 1000),
-                    mode=random.choice(list(GameMode)),
-                    started_at=datetime.now(timezone.utc)
-                ))
+        await session.execute(insert(ActivePlayer), [
+            {
+                "id": user["id"],
+                "username": user["username"],
+                "current_score": random.randint(100, 1000),
+                "mode": random.choice(list(GameMode)),
+                "started_at": now,
+            }
+            for user in users if user["username"] in ACTIVE_USERNAMES
+        ])
 
         await session.commit()
-        print("Seeding complete!")
+
+    print("Building leaderboard rollups...")
+    await rollups.backfill(AsyncSessionLocal)
+    print("Building personal bests...")
+    await best_scores.backfill(AsyncSessionLocal)
+    print("Building player stats...")
+    await player_stats.rebuild(AsyncSessionLocal)
+    print("Seeding complete!")
 
 async def main():
     await seed_data()
     # Close the engine
     await engine.dispose()
 
-
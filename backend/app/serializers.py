@@ -0,0 +1,91 @@
+"""JSON encoding of list responses straight from rows.
+
+``GET /leaderboard`` and ``GET /players`` return up to hundreds of rows whose
+shape never varies. Validating each one into ``schemas.LeaderboardEntry`` /
+``schemas.ActivePlayer`` with ``from_attributes`` (and building ORM objects to
+validate from) is most of the cost of those responses, so instead the routes
+select plain Core rows, turn each into a dict keyed by column name, and hand
+the list to a Pydantic serializer for a ``TypedDict`` of the same fields. That
+skips validation entirely while the camelCase aliases, ISO 8601 datetimes
+(``Z`` for UTC) and UTF-8 output come from the same serializer code as the
+schemas, so the bytes are identical; ``tests/test_serializers.py`` holds them
+to that and to the field lists in ``openapi.yaml``.
+"""
+import csv
+import io
+from datetime import datetime
+from typing import Annotated, List, TypedDict
+
+from pydantic import Field, TypeAdapter
+
+
+class EntryRow(TypedDict):
+    id: str
+    user_id: Annotated[str, Field(serialization_alias="userId")]
+    username: str
+    score: int
+    # str rather than the enum, so either GameMode class (or its value) serializes without a warning
+    mode: str
+    played_at: Annotated[datetime, Field(serialization_alias="playedAt")]
+
+
+class PlayerRow(TypedDict):
+    id: str
+    username: str
+    current_score: Annotated[int, Field(serialization_alias="currentScore")]
+    mode: str
+    started_at: Annotated[datetime, Field(serialization_alias="startedAt")]
+
+
+_entries = TypeAdapter(List[EntryRow])
+_players = TypeAdapter(List[PlayerRow])
+_player = TypeAdapter(PlayerRow)
+_entry = TypeAdapter(EntryRow)
+
+
+def as_dict(row, fields: tuple[str, ...]) -> dict:
+    # Core rows and named tuples zip with their own field names, which is far
+    # cheaper than attribute access on a Row; anything else is read by attribute.
+    keys = getattr(row, "_fields", None)
+    if keys is not None:
+        return dict(zip(keys, row))
+    return {field: getattr(row, field) for field in fields}
+
+
+ENTRY_FIELDS = tuple(EntryRow.__annotations__)
+PLAYER_FIELDS = tuple(PlayerRow.__annotations__)
+# The camelCase names, as CSV exports head their columns
+ENTRY_COLUMNS = tuple(_entry.dump_python(dict.fromkeys(ENTRY_FIELDS), by_alias=True, warnings=False))
+
+
+def encode_entries(entries) -> bytes:
+    """A ``List[schemas.LeaderboardEntry]`` body from rows with the entry columns."""
+    return _entries.dump_json([as_dict(entry, ENTRY_FIELDS) for entry in entries], by_alias=True)
+
+
+def encode_players(players) -> bytes:
+    """A ``List[schemas.ActivePlayer]`` body from rows with the active player columns."""
+    return _players.dump_json([as_dict(player, PLAYER_FIELDS) for player in players], by_alias=True)
+
+
+def player_dict(player) -> dict:
+    """One ``schemas.ActivePlayer`` as JSON-ready data, for messages that embed players."""
+    return _player.dump_python(as_dict(player, PLAYER_FIELDS), mode="json", by_alias=True)
+
+
+def encode_entry_lines(entries) -> bytes:
+    """NDJSON: one ``schemas.LeaderboardEntry`` object per line."""
+    return b"".join(_entry.dump_json(as_dict(entry, ENTRY_FIELDS), by_alias=True) + b"\n" for entry in entries)
+
+
+def csv_header() -> bytes:
+    return (",".join(ENTRY_COLUMNS) + "\r\n").encode()
+
+
+def encode_entry_csv(entries) -> bytes:
+    """CSV rows in ``ENTRY_COLUMNS`` order, with the values formatted as in the JSON responses."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for entry in _entries.dump_python([as_dict(entry, ENTRY_FIELDS) for entry in entries], mode="json", by_alias=True):
+        writer.writerow(entry.values())
+    return buffer.getvalue().encode()
@@ -0,0 +1,79 @@
+"""Bounded LRU + TTL cache of users resolved from session cookies.
+
+Authenticated routes resolve ``session_id`` to a user on every request. The
+cache keeps the result for ``SESSION_CACHE_TTL_SECONDS`` so the steady-state
+identity check costs no database round trip. Entries are plain
+:class:`CachedUser` tuples, never ORM instances, so nothing cached is tied to
+a closed session.
+
+Only successful lookups are cached. Signup, logout and user changes
+invalidate the affected entries.
+"""
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+
+
+class CachedUser(NamedTuple):
+    id: str
+    username: str
+    email: str
+    created_at: datetime
+
+    @classmethod
+    def from_model(cls, user) -> "CachedUser":
+        return cls(user.id, user.username, user.email, user.created_at)
+
+
+class SessionCache:
+    def __init__(self, max_size: int = SESSION_CACHE_SIZE, ttl: float = SESSION_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, CachedUser]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, session_id: str) -> CachedUser | None:
+        entry = self._entries.get(session_id)
+        if entry is None or entry[0] <= self.clock():
+            if entry is not None:
+                del self._entries[session_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        return entry[1]
+
+    def peek(self, session_id: str) -> CachedUser | None:
+        """Like :meth:`get`, without counting a hit or miss or refreshing recency."""
+        entry = self._entries.get(session_id)
+        return entry[1] if entry is not None and entry[0] > self.clock() else None
+
+    def put(self, session_id: str, user: CachedUser):
+        self._entries[session_id] = (self.clock() + self.ttl, user)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str):
+        self._entries.pop(session_id, None)
+
+    def invalidate_user(self, user_id: str):
+        for session_id in [sid for sid, (_, user) in self._entries.items() if user.id == user_id]:
+            del self._entries[session_id]
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+
+session_cache = SessionCache()
@@ -0,0 +1,218 @@
+"""In-memory serving of the frontend build in ``app/static``.
+
+The tree is scanned once at startup into a manifest keyed by URL path.
+``index.html`` and every file up to ``STATIC_INLINE_MAX_BYTES`` are held as
+bytes, together with a gzip variant for compressible types (a ``.gz`` file
+next to the original, as written by ``python -m app.static_files``, is used
+as-is; otherwise it is compressed during the scan). Larger files stay on disk
+and are sent with ``FileResponse``.
+
+Every file has a strong ETag (a hash of its content), so ``If-None-Match``
+gets a 304. Files under ``assets/`` carry a content hash in their name and are
+sent as immutable; everything else, including the SPA fallback, must be
+revalidated.
+
+Set ``STATIC_RELOAD_SECONDS`` to poll the directory and rebuild the manifest
+when a file is added, removed or modified (for example under ``vite build
+--watch``); :meth:`StaticSite.reload` does the same on demand.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from .response_cache import etag_matches
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.getenv("STATIC_DIR", os.path.join(os.path.dirname(__file__), "static"))
+STATIC_INLINE_MAX_BYTES = int(os.getenv("STATIC_INLINE_MAX_BYTES", str(1024 * 1024)))
+STATIC_GZIP_MIN_BYTES = int(os.getenv("STATIC_GZIP_MIN_BYTES", "1024"))
+STATIC_RELOAD_SECONDS = float(os.getenv("STATIC_RELOAD_SECONDS", "0"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+COMPRESSIBLE = {"application/javascript", "text/javascript", "application/json", "application/manifest+json", "image/svg+xml", "application/xml", "application/wasm"}
+
+
+@dataclass(slots=True)
+class StaticFile:
+    path: str
+    media_type: str
+    etag: str
+    cache_control: str
+    # None for files served from disk
+    body: bytes | None
+    gzip_body: bytes | None
+
+
+def is_compressible(media_type: str) -> bool:
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            try:
+                return float(params.strip().removeprefix("q=") or 1) > 0
+            except ValueError:
+                return True
+    return False
+
+
+def signature(directory: str) -> tuple:
+    """Names, sizes and modification times of every file, to detect changes cheaply."""
+    entries = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            stat = os.stat(os.path.join(root, name))
+            entries.append((os.path.join(root, name), stat.st_size, stat.st_mtime_ns))
+    return tuple(sorted(entries))
+
+
+class StaticSite:
+    def __init__(self, directory: str = STATIC_DIR, inline_max_bytes: int = STATIC_INLINE_MAX_BYTES, gzip_min_bytes: int = STATIC_GZIP_MIN_BYTES, reload_interval: float = STATIC_RELOAD_SECONDS):
+        self.directory = directory
+        self.inline_max_bytes = inline_max_bytes
+        self.gzip_min_bytes = gzip_min_bytes
+        self.reload_interval = reload_interval
+        self.files: dict[str, StaticFile] = {}
+        self.loaded = False
+        self._signature: tuple = ()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def index(self) -> StaticFile | None:
+        return self.files.get("index.html")
+
+    def load(self):
+        """Scan the directory into a fresh manifest and swap it in."""
+        files: dict[str, StaticFile] = {}
+        current = signature(self.directory) if os.path.isdir(self.directory) else ()
+        for path, size, _ in current:
+            name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+            if name.endswith(".gz") and os.path.exists(path[:-3]):
+                continue  # A precompressed variant, picked up with its original
+            files[name] = self._scan(name, path, size)
+        self.files, self._signature, self.loaded = files, current, True
+
+    def _scan(self, name: str, path: str, size: int) -> StaticFile:
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        cache_control = IMMUTABLE if name.startswith("assets/") else REVALIDATE
+        if size > self.inline_max_bytes and name != "index.html":
+            digest = hashlib.blake2b(digest_size=12)
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            return StaticFile(path, media_type, f'"{digest.hexdigest()}"', cache_control, None, None)
+
+        with open(path, "rb") as f:
+            body = f.read()
+        gzip_body = None
+        if is_compressible(media_type) and len(body) >= self.gzip_min_bytes:
+            if os.path.exists(path + ".gz"):
+                with open(path + ".gz", "rb") as f:
+                    gzip_body = f.read()
+            else:
+                gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gzip_body) >= len(body):
+                gzip_body = None
+        etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        return StaticFile(path, media_type, etag, cache_control, body, gzip_body)
+
+    def reload(self) -> bool:
+        """Rebuild the manifest if anything in the directory changed; returns whether it did."""
+        current = signature(self.directory) if os.path.isdir(self.directory) else ()
+        if current == self._signature:
+            return False
+        self.load()
+        logger.info("Reloaded static manifest (%d files)", len(self.files))
+        return True
+
+    def lookup(self, path: str) -> StaticFile | None:
+        """The file for a URL path, the SPA index for client-side routes, or None."""
+        if not self.loaded:
+            self.load()
+        path = path.lstrip("/")
+        found = self.files.get(path)
+        if found is not None:
+            return found
+        # A missing hashed asset is a stale build reference, not a client-side route
+        if path.startswith("assets/"):
+            return None
+        return self.index
+
+    def respond(self, request: Request, static: StaticFile) -> Response:
+        gzipped = static.gzip_body is not None and accepts_gzip(request.headers.get("accept-encoding"))
+        # Each representation gets its own strong validator
+        etag = static.etag[:-1] + '-gz"' if gzipped else static.etag
+        headers = {"ETag": etag, "Cache-Control": static.cache_control}
+        if static.gzip_body is not None:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if static.body is None:
+            return FileResponse(static.path, media_type=static.media_type, headers=headers)
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return Response(static.gzip_body, media_type=static.media_type, headers=headers)
+        return Response(static.body, media_type=static.media_type, headers=headers)
+
+    async def start(self):
+        self.load()
+        if self.reload_interval > 0:
+            self._task = asyncio.create_task(self._reload_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _reload_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception:
+                logger.exception("Static manifest reload failed")
+
+
+static_site = StaticSite()
+
+
+def precompress(directory: str, min_bytes: int = STATIC_GZIP_MIN_BYTES) -> int:
+    """Write a ``.gz`` next to every compressible file that shrinks; returns how many were written."""
+    written = 0
+    for path, size, _ in signature(directory):
+        media_type = mimetypes.guess_type(path)[0] or ""
+        if path.endswith(".gz") or size < min_bytes or not is_compressible(media_type):
+            continue
+        with open(path, "rb") as f:
+            body = f.read()
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            with open(path + ".gz", "wb") as f:
+                f.write(compressed)
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write .gz variants of the frontend build for the static manifest.")
+    parser.add_argument("directory", nargs="?", default=STATIC_DIR)
+    args = parser.parse_args()
+    print(f"Precompressed {precompress(args.directory)} files in {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Replay verification of submitted scores in a process pool.
+
+Replays are pure CPU work, so they run in a ``ProcessPoolExecutor`` rather
+than on the event loop. At most ``REPLAY_MAX_PENDING`` replays may be running
+or waiting for a worker; beyond that submits are turned away immediately
+instead of queueing without bound.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from . import schemas
+from .engine.replay import replay_game
+
+REPLAY_WORKERS = int(os.getenv("REPLAY_WORKERS", str(os.cpu_count() or 1)))
+REPLAY_MAX_PENDING = int(os.getenv("REPLAY_MAX_PENDING", "256"))
+SCORE_REPLAY_REQUIRED = os.getenv("SCORE_REPLAY_REQUIRED", "false").lower() == "true"
+
+
+def _warm_up():
+    """No-op run once per worker at start, so it is spawned and has imported the engine before the first replay."""
+
+
+class VerifierBusy(Exception):
+    """Too many replays are already queued."""
+
+
+class ReplayVerifier:
+    def __init__(self, workers: int = REPLAY_WORKERS, max_pending: int = REPLAY_MAX_PENDING, max_ticks: int = schemas.REPLAY_MAX_TICKS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_ticks = max_ticks
+        self.pending = 0
+        self._pool: ProcessPoolExecutor | None = None
+
+    def start(self):
+        if self._pool is None:
+            # spawn, not fork: the server process has threads (aiosqlite, anyio)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            # The pool only spawns a worker when a task finds none idle, so submitting one per worker starts them all
+            for _ in range(self.workers):
+                self._pool.submit(_warm_up)
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def replay(self, replay: schemas.Replay, mode: schemas.GameMode) -> int | None:
+        """Replay in a worker process; returns the score or ``None`` if invalid."""
+        if self.pending >= self.max_pending:
+            raise VerifierBusy("Too many score verifications in progress")
+        self.start()
+        moves = [(tick, direction.value) for tick, direction in replay.moves]
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pool, replay_game, replay.seed, mode.value, moves, replay.ticks, self.max_ticks
+            )
+        finally:
+            self.pending -= 1
+
+    async def verify(self, replay: schemas.Replay, mode: schemas.GameMode, score: int) -> bool:
+        return await self.replay(replay, mode) == score
+
+
+replay_verifier = ReplayVerifier()
@@ -0,0 +1,119 @@
+"""Read latency during a flood of score submits, with admission control on vs off.
+
+Seeds a scratch SQLite database, then runs a steady stream of uncached
+``GET /players/{id}/stats`` reads (one SQL round trip each) through the ASGI
+app in-process while ``--submitters`` clients post scores as fast as they
+can, each with its own session. Without admission control every submit
+competes for the connection pool and the reads queue behind them; with it,
+at most ``--write-concurrency`` submits run at once, the excess waits in a
+bounded queue or gets a fast 503, and reads keep their own slots.
+
+Usage:
+    uv run python -m benchmarks.bench_admission --submitters 200 --seconds 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+
+# Point the app at a scratch database before it is imported
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ["RATE_LIMITS"] = "false"
+os.environ["RESPONSE_CACHE"] = "false"
+
+import httpx
+from sqlalchemy import insert
+
+from app.admission import admission_controller
+from app.database import AsyncSessionLocal, engine, init_db
+from app.main import app
+from app.models import User
+
+# One log line per request would dwarf what is being measured
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+async def seed_users(count: int) -> list[tuple[str, str]]:
+    await init_db()
+    users = [(str(uuid.uuid4()), f"player{i}@example.com") for i in range(count)]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [
+            {"id": user_id, "username": f"Player{i}", "email": email, "password_hash": "unused"}
+            for i, (user_id, email) in enumerate(users)
+        ])
+        await db.commit()
+    return users
+
+def percentile(latencies: list[float], q: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+
+async def read_until(client: httpx.AsyncClient, path: str, done: asyncio.Event, latencies: list[float]):
+    while not done.is_set():
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code in (200, 404, 500, 503), response.text
+
+async def submit_until(client: httpx.AsyncClient, done: asyncio.Event, statuses: list[int], accepted: list[float]):
+    while not done.is_set():
+        start = time.perf_counter()
+        response = await client.post("/leaderboard", json={"score": 100, "mode": "walls"})
+        statuses.append(response.status_code)
+        if response.status_code == 201:
+            accepted.append(time.perf_counter() - start)
+        if response.status_code == 503:
+            # Back off as asked, jittered as independent clients would be; they share the app's event loop,
+            # so retrying at once would only measure the clients
+            await asyncio.sleep(float(response.headers["retry-after"]) * random.uniform(0.5, 1.5))
+
+async def run_once(users, readers: int, seconds: float) -> tuple[list[float], list[float], list[int]]:
+    # Overloaded requests that fail should count as 500s, not abort the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    clients = [
+        httpx.AsyncClient(transport=transport, base_url="http://bench", cookies={"session_id": email})
+        for _, email in users
+    ]
+    reader = httpx.AsyncClient(transport=transport, base_url="http://bench")
+    done = asyncio.Event()
+    latencies: list[float] = []
+    statuses: list[int] = []
+    accepted: list[float] = []
+    tasks = [asyncio.create_task(submit_until(client, done, statuses, accepted)) for client in clients]
+    tasks += [asyncio.create_task(read_until(reader, f"/players/{users[i % len(users)][0]}/stats", done, latencies)) for i in range(readers)]
+    await asyncio.sleep(seconds)
+    done.set()
+    await asyncio.gather(*tasks)
+    for client in clients + [reader]:
+        await client.aclose()
+    latencies.sort()
+    accepted.sort()
+    return latencies, accepted, statuses
+
+async def run(submitters: int, readers: int, seconds: float, write_concurrency: int, order=(False, True)):
+    users = await seed_users(submitters)
+    admission_controller.classes["write"].limit = write_concurrency
+
+    async with app.router.lifespan_context(app):
+        for enabled in order:
+            admission_controller.enabled = enabled
+            latencies, accepted, statuses = await run_once(users, readers, seconds)
+            label = "admission on" if enabled else "admission off"
+            print(f"{label:<14} reads {len(latencies) / seconds:>5.0f}/s p50 {percentile(latencies, 0.5):6.1f} ms p99 {percentile(latencies, 0.99):6.1f} ms | "
+                  f"submits {len(accepted) / seconds:>5.0f}/s p50 {percentile(accepted, 0.5):6.1f} ms p99 {percentile(accepted, 0.99):6.1f} ms, "
+                  f"{statuses.count(503)} shed with 503, {len(statuses) - statuses.count(201) - statuses.count(503)} failed")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submitters", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-concurrency", type=int, default=admission_controller.classes["write"].limit)
+    args = parser.parse_args()
+    asyncio.run(run(args.submitters, args.readers, args.seconds, args.write_concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Ticks per second of the batched NumPy engine vs the per-snake rules port.
+
+Both sides run AI-driven games and restart boards as soon as they end.
+
+Usage:
+    uv run python -m benchmarks.bench_engine --boards 4096 --ticks 200
+"""
+import argparse
+import random
+import time
+
+from app.engine import BatchEngine, change_direction, create_initial_state, get_ai_direction, move_snake
+from app.models import GameMode
+
+def run_naive(boards: int, ticks: int) -> float:
+    rng = random.Random(1)
+    modes = [GameMode.WALLS, GameMode.PASS_THROUGH]
+    states = [create_initial_state(modes[i % 2], rng.random) for i in range(boards)]
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for i, state in enumerate(states):
+            state = move_snake(change_direction(state, get_ai_direction(state, rng.random)), rng.random)
+            states[i] = create_initial_state(state.mode, rng.random) if state.is_game_over else state
+    return time.perf_counter() - start
+
+def run_batch(boards: int, ticks: int) -> float:
+    engine = BatchEngine(boards, [GameMode.WALLS, GameMode.PASS_THROUGH] * (boards // 2) + [GameMode.WALLS] * (boards % 2), seed=1)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        engine.reset(engine.step(engine.ai_directions()))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boards", type=int, default=4096)
+    parser.add_argument("--ticks", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{args.boards} boards x {args.ticks} ticks")
+    for label, run in (("naive per-snake port", run_naive), ("NumPy batch engine", run_batch)):
+        elapsed = run(args.boards, args.ticks)
+        print(f"{label:<22} {args.ticks / elapsed:>10.1f} ticks/s {args.boards * args.ticks / elapsed:>14.0f} board-ticks/s")
+
+if __name__ == "__main__":
+    main()
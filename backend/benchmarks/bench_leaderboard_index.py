@@ -0,0 +1,111 @@
+"""Compare SQL ranking against the in-memory leaderboard index.
+
+Usage:
+    uv run python -m benchmarks.bench_leaderboard_index --entries 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import desc, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.leaderboard_index import LeaderboardIndex
+from app.models import Base, GameMode, LeaderboardEntry
+
+async def seed(session_factory, entries: int, chunk: int = 50000):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    async with session_factory() as db:
+        for offset in range(0, entries, chunk):
+            rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": f"user-{i % 5000}",
+                    "username": f"Player{i % 5000}",
+                    "score": rng.randint(0, 400) * 10,
+                    "mode": GameMode.WALLS if i % 2 else GameMode.PASS_THROUGH,
+                    "played_at": start + timedelta(seconds=i),
+                }
+                for i in range(offset, min(offset + chunk, entries))
+            ]
+            await db.execute(insert(LeaderboardEntry), rows)
+            await db.commit()
+
+async def timed(label: str, fn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / repeat * 1e6:>12.1f} us/op")
+
+async def run(entries: int, repeat: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    print(f"Seeding {entries} entries into {path}...")
+    start = time.perf_counter()
+    await seed(session_factory, entries)
+    print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+    index = LeaderboardIndex()
+    start = time.perf_counter()
+    async with session_factory() as db:
+        await index.load(db)
+    print(f"Index loaded in {time.perf_counter() - start:.1f}s\n")
+
+    rng = random.Random(1)
+    mode = GameMode.WALLS
+    deep_rank = entries // 4
+
+    async with session_factory() as db:
+        async def sql_rank():
+            score = rng.randint(0, 400) * 10
+            query = select(func.count()).select_from(LeaderboardEntry).where(
+                LeaderboardEntry.mode == mode, LeaderboardEntry.score > score
+            )
+            (await db.execute(query)).scalar()
+
+        async def sql_top():
+            query = select(LeaderboardEntry).where(LeaderboardEntry.mode == mode).order_by(desc(LeaderboardEntry.score)).limit(10)
+            (await db.execute(query)).scalars().all()
+
+        async def sql_around():
+            query = select(LeaderboardEntry).where(LeaderboardEntry.mode == mode).order_by(desc(LeaderboardEntry.score)).offset(deep_rank - 5).limit(11)
+            (await db.execute(query)).scalars().all()
+
+        async def index_rank():
+            index.rank_of(mode, rng.randint(0, 400) * 10)
+
+        async def index_top():
+            index.top(mode, 10)
+
+        async def index_around():
+            index.around(mode, deep_rank, 5)
+
+        await timed("SQL COUNT rank", sql_rank, repeat)
+        await timed("index rank_of", index_rank, repeat * 100)
+        await timed("SQL ORDER BY/LIMIT top-10", sql_top, repeat)
+        await timed("index top-10", index_top, repeat * 100)
+        await timed(f"SQL OFFSET around rank {deep_rank}", sql_around, max(repeat // 10, 1))
+        await timed(f"index around rank {deep_rank}", index_around, repeat * 100)
+
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.entries, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Keyset page and "around me" latency by depth, vs OFFSET pagination.
+
+Seeds ``--entries`` rows (half per mode), then for each depth reads a
+50-entry page after a keyset cursor with SQL and with the in-memory index,
+the same page with ``OFFSET``, and ``/leaderboard/around`` for a player whose
+only entry sits at that depth.
+
+Usage:
+    uv run python -m benchmarks.bench_leaderboard_pages --entries 1000000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import crud
+from app.database import create_missing_indexes
+from app.leaderboard_index import LeaderboardIndex, leaderboard_index
+from app.models import Base, GameMode, LeaderboardEntry
+from benchmarks.bench_leaderboard_index import seed
+
+PAGE = 50
+
+async def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+async def run(entries: int, repeat: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes, Base.metadata)
+
+    print(f"Seeding {entries} entries into {path}...")
+    await seed(session_factory, entries)
+
+    mode = GameMode.WALLS
+    per_mode = entries // 2
+    depths = [d for d in (0, 1_000, 10_000, 100_000, per_mode - PAGE) if d < per_mode]
+
+    # One probe player per depth, with a single entry at that depth
+    index = LeaderboardIndex()
+    async with session_factory() as db:
+        await index.load(db)
+        probes = []
+        for depth in depths:
+            entry = index.modes[mode].entries_from(depth + 1, 1)[0]
+            probes.append(f"probe-{depth}")
+            await db.execute(insert(LeaderboardEntry), [{
+                "id": f"probe-{depth}", "user_id": f"probe-{depth}", "username": "Probe",
+                "score": entry.score, "mode": mode, "played_at": datetime.now(timezone.utc),
+            }])
+        await db.commit()
+        await index.load(db)
+
+    print(f"\n{'depth':>8} {'SQL keyset':>12} {'SQL OFFSET':>12} {'index keyset':>13} {'SQL around':>12} {'index around':>13}   (ms per call)")
+    async with session_factory() as db:
+        for depth, probe in zip(depths, probes):
+            anchor = index.modes[mode].entries_from(depth, 1)[0] if depth else None
+            after = (anchor.score, anchor.played_at, anchor.id) if anchor else None
+
+            async def sql_keyset():
+                await crud.get_leaderboard(db, mode, PAGE, after)
+
+            async def sql_offset():
+                query = select(LeaderboardEntry).where(LeaderboardEntry.mode == mode).order_by(*crud.LEADERBOARD_ORDER).offset(depth).limit(PAGE)
+                (await db.execute(query)).scalars().all()
+
+            async def index_keyset():
+                index.page(mode, after, PAGE)
+
+            async def sql_around():
+                await crud.get_leaderboard_around(db, probe, mode, 5)
+
+            async def index_around():
+                modes = index.modes[mode]
+                best = modes.best_of(probe)
+                [(entry, modes.rank_of(entry.score)) for entry in modes.around(modes.position_of(best), 5)]
+
+            assert not leaderboard_index.ready  # crud must take the SQL path here
+            results = [
+                await timed(sql_keyset, repeat),
+                await timed(sql_offset, max(repeat // 10, 1)),
+                await timed(index_keyset, repeat * 10),
+                await timed(sql_around, max(repeat // 10, 1)),
+                await timed(index_around, repeat * 10),
+            ]
+            print(f"{depth:>8} " + " ".join(f"{r:>12.3f}" for r in results))
+
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.entries, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""p99 latency of leaderboard reads while a burst of logins is being hashed.
+
+Runs a steady stream of ``GET /leaderboard`` requests through the ASGI app
+in-process, first on its own and then alongside a burst of concurrent
+``POST /auth/login`` requests. ``--inline`` hashes on the event loop instead
+of the worker pool, to show what the pool protects against.
+
+Usage:
+    uv run python -m benchmarks.bench_login_storm --logins 200 --readers 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+# Point the app at a scratch database before it is imported
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import httpx
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.main import app
+from app.models import User
+from app.passwords import hash_password, password_hasher
+
+PASSWORD = "password"
+
+async def seed_users(count: int) -> list[str]:
+    await init_db()
+    stored = hash_password(PASSWORD, password_hasher.n, password_hasher.r, password_hasher.p)
+    emails = [f"player{i}@example.com" for i in range(count)]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [
+            {"id": str(uuid.uuid4()), "username": f"Player{i}", "email": email, "password_hash": stored}
+            for i, email in enumerate(emails)
+        ])
+        await db.commit()
+    return emails
+
+def report(label: str, latencies: list[float]):
+    latencies.sort()
+    print(f"{label:<28} {len(latencies):>7} reads  "
+          f"p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms  p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms")
+
+async def read_until(client: httpx.AsyncClient, done: asyncio.Event, latencies: list[float]):
+    while not done.is_set():
+        start = time.perf_counter()
+        response = await client.get("/leaderboard")
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+async def run(logins: int, readers: int, idle_seconds: float):
+    emails = await seed_users(logins)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            done = asyncio.Event()
+            idle: list[float] = []
+            tasks = [asyncio.create_task(read_until(client, done, idle)) for _ in range(readers)]
+            await asyncio.sleep(idle_seconds)
+            done.set()
+            await asyncio.gather(*tasks)
+            report("GET /leaderboard (idle)", idle)
+
+            done = asyncio.Event()
+            busy: list[float] = []
+            tasks = [asyncio.create_task(read_until(client, done, busy)) for _ in range(readers)]
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/auth/login", json={"email": email, "password": PASSWORD}) for email in emails
+            ))
+            elapsed = time.perf_counter() - start
+            done.set()
+            await asyncio.gather(*tasks)
+            report("GET /leaderboard (login burst)", busy)
+
+            statuses = [response.status_code for response in responses]
+            print(f"{'POST /auth/login':<28} {logins / elapsed:>7.0f} logins/s  "
+                  f"{statuses.count(200)} ok, {statuses.count(503)} rejected with 503")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop instead of the worker pool")
+    args = parser.parse_args()
+
+    if args.inline:
+        async def run_inline(fn, *fn_args):
+            return fn(*fn_args)
+        password_hasher._run = run_inline
+    asyncio.run(run(args.logins, args.readers, args.idle_seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Requests per second with metrics recording on vs off, and the overhead between them.
+
+Seeds a scratch SQLite database and drives ``GET /leaderboard`` (served from
+the response cache, so per-request cost is small and any instrumentation
+overhead shows) and ``GET /players/{id}`` for an unknown id (one SQL
+statement and a 404 per request) through the ASGI app in-process. Rounds
+alternate between ``registry.enabled`` on and off so drift in machine load
+hits both equally; the best round of each is reported. End-to-end numbers on
+a busy machine are noisy at the few-percent level, so the benchmark also
+times the middleware alone around a no-op app and reports that cost as a
+share of the measured per-request time.
+
+Usage:
+    uv run python -m benchmarks.bench_metrics --requests 5000 --rounds 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+# Point the app at a scratch database before it is imported
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ["METRICS"] = "true"
+
+import httpx
+
+from app.database import AsyncSessionLocal, init_db
+from app.main import app
+from app.metrics import MetricsMiddleware, registry
+from benchmarks.bench_leaderboard_index import seed
+
+# One log line per request would dwarf what is being measured
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    async def one():
+        async with semaphore:
+            response = await client.get(path)
+            assert response.status_code in (200, 404), response.text
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+async def middleware_cost(calls: int) -> float:
+    """Seconds the middleware adds to one request, timed around a no-op ASGI app."""
+    async def noop(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    async def send(message):
+        pass
+    wrapped = MetricsMiddleware(noop)
+    scope = {"type": "http", "method": "GET", "path": "/bench"}
+    timings = {}
+    for enabled in (False, True):
+        registry.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(calls):
+            await wrapped(scope, None, send)
+        timings[enabled] = (time.perf_counter() - start) / calls
+    return timings[True] - timings[False]
+
+async def run(entries: int, requests: int, concurrency: int, rounds: int):
+    await init_db()
+    await seed(AsyncSessionLocal, entries)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        fastest = 0.0
+        print(f"{'request':<28} {'off req/s':>10} {'on req/s':>10} {'overhead':>9}")
+        for path in ("/leaderboard?limit=10", "/players/nobody"):
+            best = {False: 0.0, True: 0.0}
+            await measure(client, path, requests // 10, concurrency)  # warm up
+            for _ in range(rounds):
+                for enabled in (False, True):
+                    registry.enabled = enabled
+                    best[enabled] = max(best[enabled], await measure(client, path, requests, concurrency))
+            overhead = (best[False] - best[True]) / best[False] * 100
+            print(f"{path:<28} {best[False]:>10.0f} {best[True]:>10.0f} {overhead:>8.1f}%")
+            fastest = max(fastest, best[False])
+
+        cost = await middleware_cost(requests * 20)
+        print(f"middleware alone: {cost * 1e6:.2f} us per request, {cost * fastest * 100:.2f}% at {fastest:.0f} req/s")
+
+        start = time.perf_counter()
+        body = registry.render()
+        print(f"scrape: {len(body.splitlines())} lines rendered in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.entries, args.requests, args.concurrency, args.rounds))
+
+if __name__ == "__main__":
+    main()
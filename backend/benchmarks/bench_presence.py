@@ -0,0 +1,95 @@
+"""Heartbeat throughput of the presence registry at 10k concurrent players.
+
+Measures the registry on its own, then ``POST /players/heartbeat`` through
+the ASGI app in-process with every player heartbeating concurrently.
+
+Usage:
+    uv run python -m benchmarks.bench_presence --players 10000 --rounds 3
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+# Point the app at a scratch database before it is imported
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import httpx
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.main import app
+from app.models import GameMode, User
+from app.presence import PresenceRegistry, presence_registry
+
+def bench_registry(players: int, rounds: int):
+    registry = PresenceRegistry(ttl=30, tick=1)
+    ids = [str(i) for i in range(players)]
+    start = time.perf_counter()
+    for round_ in range(rounds):
+        for player_id in ids:
+            registry.heartbeat(player_id, player_id, round_ * 10, GameMode.WALLS)
+    elapsed = time.perf_counter() - start
+    print(f"{'registry.heartbeat':<28} {players * rounds / elapsed:>12.0f} heartbeats/s")
+
+    clock = time.monotonic() + 60
+    registry.clock = lambda: clock
+    start = time.perf_counter()
+    expired = registry.sweep()
+    print(f"{'registry.sweep':<28} {len(expired):>12} expired in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+async def seed_users(players: int) -> list[str]:
+    await init_db()
+    emails = [f"player{i}@example.com" for i in range(players)]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [
+            {"id": str(uuid.uuid4()), "username": f"Player{i}", "email": email, "password_hash": "password"}
+            for i, email in enumerate(emails)
+        ])
+        await db.commit()
+    return emails
+
+async def bench_http(players: int, rounds: int, concurrency: int):
+    emails = await seed_users(players)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def heartbeat(email: str, score: int):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/players/heartbeat",
+                        json={"score": score, "mode": GameMode.WALLS.value},
+                        headers={"Cookie": f"session_id={email}"},
+                    )
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+
+            start = time.perf_counter()
+            for round_ in range(rounds):
+                await asyncio.gather(*(heartbeat(email, round_ * 10) for email in emails))
+            elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        print(f"{'POST /players/heartbeat':<28} {players * rounds / elapsed:>12.0f} heartbeats/s "
+              f"(p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms)")
+        print(f"{'players listed':<28} {len(presence_registry):>12}")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    args = parser.parse_args()
+
+    bench_registry(args.players, args.rounds)
+    asyncio.run(bench_http(args.players, args.rounds, args.concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Verified score submits per second through the replay process pool.
+
+Records AI games as replays, then verifies them all concurrently through
+``ReplayVerifier`` the way ``POST /leaderboard`` does.
+
+Usage:
+    uv run python -m benchmarks.bench_replay --replays 2000 --workers 8
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from app.engine.replay import record_ai_game, replay_game
+from app.models import GameMode
+from app.schemas import Replay
+from app.verification import ReplayVerifier
+
+MAX_TICKS = 20000
+
+def record(count: int) -> list[tuple[Replay, GameMode, int]]:
+    replays = []
+    seed = 0
+    while len(replays) < count:
+        mode = GameMode.WALLS if seed % 2 else GameMode.PASS_THROUGH
+        recorded = record_ai_game(seed, mode, MAX_TICKS, ai_seed=seed)
+        seed += 1
+        if recorded is None:
+            continue
+        moves, ticks, score = recorded
+        replays.append((Replay(seed=seed - 1, ticks=ticks, moves=moves), mode, score))
+    return replays
+
+async def run(replays, workers: int):
+    verifier = ReplayVerifier(workers=workers, max_pending=len(replays))
+    verifier.start()
+    # Warm the workers so process spawn is not part of the measurement
+    await asyncio.gather(*(verifier.verify(*replays[i % len(replays)]) for i in range(workers)))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verifier.verify(replay, mode, score) for replay, mode, score in replays))
+    elapsed = time.perf_counter() - start
+    verifier.stop()
+    assert all(results)
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replays", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"Recording {args.replays} AI games...")
+    replays = record(args.replays)
+    ticks = sum(replay.ticks for replay, _, _ in replays)
+    print(f"Average game length: {ticks / len(replays):.0f} ticks")
+
+    start = time.perf_counter()
+    for replay, mode, score in replays:
+        moves = [(tick, direction.value) for tick, direction in replay.moves]
+        assert replay_game(replay.seed, mode, moves, replay.ticks, MAX_TICKS) == score
+    inline = time.perf_counter() - start
+    print(f"{'single process':<24} {len(replays) / inline:>10.1f} verified submits/s")
+
+    pooled = asyncio.run(run(replays, args.workers))
+    print(f"{f'pool ({args.workers} workers)':<24} {len(replays) / pooled:>10.1f} verified submits/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Requests per second for GET /leaderboard uncached, cached and revalidated.
+
+Seeds a scratch database, then drives ``GET /leaderboard?limit=N`` through
+the ASGI app in-process three ways: with the response cache disabled, with it
+enabled (200 from cached bytes), and with ``If-None-Match`` (304). Pass
+``--no-index`` to build uncached responses with SQL instead of the in-memory
+leaderboard index.
+
+Usage:
+    uv run python -m benchmarks.bench_response_cache --entries 100000 --requests 5000 --limit 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Point the app at a scratch database before it is imported
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+if "--no-index" in sys.argv:
+    os.environ["LEADERBOARD_INDEX"] = "false"
+
+import httpx
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.main import app
+from app.models import GameMode, LeaderboardEntry, User
+from app.response_cache import response_cache
+
+async def seed(entries: int):
+    await init_db()
+    user_id = str(uuid.uuid4())
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [{"id": user_id, "username": "Bench", "email": "bench@example.com", "password_hash": "x"}])
+        for offset in range(0, entries, 10000):
+            await db.execute(insert(LeaderboardEntry), [
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "username": "Bench",
+                    "score": random.randint(0, 4000),
+                    "mode": random.choice(list(GameMode)),
+                    "played_at": start + timedelta(seconds=i),
+                }
+                for i in range(offset, min(offset + 10000, entries))
+            ])
+        await db.commit()
+
+async def measure(client: httpx.AsyncClient, url: str, requests: int, concurrency: int, headers: dict | None = None) -> tuple[float, int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = []
+    async def one():
+        async with semaphore:
+            response = await client.get(url, headers=headers)
+            statuses.append(response.status_code)
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start), statuses[-1]
+
+async def run(entries: int, requests: int, concurrency: int, limit: int):
+    await seed(entries)
+    url = f"/leaderboard?limit={limit}"
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response_cache.enabled = False
+            rate, status = await measure(client, url, requests, concurrency)
+            print(f"{'uncached':<14} {rate:>10.0f} req/s  ({status})")
+
+            response_cache.enabled = True
+            etag = (await client.get(url)).headers["etag"]
+            rate, status = await measure(client, url, requests, concurrency)
+            print(f"{'cached':<14} {rate:>10.0f} req/s  ({status})")
+            rate, status = await measure(client, url, requests, concurrency, {"If-None-Match": etag})
+            print(f"{'If-None-Match':<14} {rate:>10.0f} req/s  ({status})")
+            total = response_cache.hits + response_cache.misses
+            print(f"{'hit rate':<14} {response_cache.hits / total:>10.1%}")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--no-index", action="store_true", help="build uncached responses with SQL")
+    args = parser.parse_args()
+    asyncio.run(run(args.entries, args.requests, args.concurrency, args.limit))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Rows per second encoding leaderboard pages: ORM + Pydantic validation vs Core rows + serializer only.
+
+Seeds a scratch SQLite database, then times, for a page of ``--limit``
+entries, (1) encoding alone, from ORM objects through the Pydantic schema and
+from Core rows through ``app.serializers`` (no validation), and (2) the full build of a
+``GET /leaderboard`` body: query plus encoding.
+
+Usage:
+    uv run python -m benchmarks.bench_serialization --limit 100 --repeat 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import crud, schemas
+from app.database import create_missing_indexes
+from app.models import Base, LeaderboardEntry
+from app.serializers import encode_entries
+from benchmarks.bench_leaderboard_index import seed
+
+adapter = TypeAdapter(List[schemas.LeaderboardEntry])
+
+def pydantic_encode(entries) -> bytes:
+    return adapter.dump_json(adapter.validate_python(entries, from_attributes=True), by_alias=True)
+
+async def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - start) / repeat
+
+async def run(entries: int, limit: int, repeat: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes, Base.metadata)
+    await seed(session_factory, entries)
+
+    async with session_factory() as db:
+        orm_query = select(LeaderboardEntry).order_by(*crud.LEADERBOARD_ORDER).limit(limit)
+        orm_rows = list((await db.execute(orm_query)).scalars().all())
+        core_rows = await crud.get_leaderboard(db, limit=limit)
+        assert pydantic_encode(orm_rows) == encode_entries(core_rows)
+
+        async def encode_pydantic():
+            pydantic_encode(orm_rows)
+
+        async def encode_direct():
+            encode_entries(core_rows)
+
+        async def build_pydantic():
+            db.expunge_all()
+            pydantic_encode((await db.execute(orm_query)).scalars().all())
+
+        async def build_direct():
+            encode_entries(await crud.get_leaderboard(db, limit=limit))
+
+        print(f"{'':<22} {'ORM + Pydantic':>16} {'Core rows':>16}   ({limit}-row pages)")
+        for name, slow, fast in (("encode only", encode_pydantic, encode_direct), ("query + encode", build_pydantic, build_direct)):
+            slow_s, fast_s = await timed(slow, repeat), await timed(fast, repeat)
+            print(f"{name + ' rows/s':<22} {limit / slow_s:>16,.0f} {limit / fast_s:>16,.0f}   ({slow_s / fast_s:.1f}x)")
+
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.entries, args.limit, args.repeat))
+
+if __name__ == "__main__":
+    main()
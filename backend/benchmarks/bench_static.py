@@ -0,0 +1,109 @@
+"""Requests per second for SPA-fallback and asset requests, from disk vs the in-memory manifest.
+
+Writes a synthetic frontend build (an ``index.html`` and a hashed JS bundle),
+points ``STATIC_DIR`` at it, then drives client-side routes (which fall back to
+``index.html``) and the bundle through the ASGI app in-process. The "disk" rows
+use the previous handler, which checked the filesystem and built a
+``FileResponse`` per request.
+
+Usage:
+    uv run python -m benchmarks.bench_static --requests 5000 --bundle-kb 300
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import tempfile
+import time
+
+# Point the app at a scratch build before it is imported
+static_dir = tempfile.mkdtemp()
+os.environ["STATIC_DIR"] = static_dir
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import FileResponse, JSONResponse
+
+from app.main import app
+from app.static_files import static_site
+
+BUNDLE = "assets/index-4f2a9c.js"
+
+def write_build(bundle_kb: int):
+    os.makedirs(os.path.join(static_dir, "assets"))
+    with open(os.path.join(static_dir, "index.html"), "w") as f:
+        f.write('<!doctype html><html lang="en"><head><meta charset="UTF-8" /><title>Snake Arcade</title>'
+                + '<meta name="description" content="Play the classic Snake game." />' * 20
+                + f'<script type="module" src="/{BUNDLE}"></script></head><body><div id="root"></div></body></html>')
+    rng = random.Random(1)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(500)]
+    with open(os.path.join(static_dir, BUNDLE), "w") as f:
+        size = 0
+        while size < bundle_kb * 1024:
+            line = f"const {rng.choice(words)}_{size} = ({rng.choice(words)}) => {rng.choice(words)}.{rng.choice(words)}({size});\n"
+            f.write(line)
+            size += len(line)
+
+def disk_app() -> FastAPI:
+    """The handler this benchmark replaced: filesystem checks and a FileResponse per request."""
+    old = FastAPI()
+
+    @old.get("/{full_path:path}")
+    async def serve_spa(full_path: str):
+        file_path = os.path.join(static_dir, full_path)
+        if os.path.exists(static_dir) and os.path.isfile(file_path):
+            return FileResponse(file_path)
+        index_path = os.path.join(static_dir, "index.html")
+        if os.path.exists(index_path):
+            return FileResponse(index_path)
+        return JSONResponse({"error": "Frontend not found"}, status_code=404)
+
+    return old
+
+async def measure(target: FastAPI, path: str, requests: int, concurrency: int, headers: dict) -> tuple[float, int, int]:
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        last = None
+        async def one():
+            nonlocal last
+            async with semaphore:
+                # Read the body without decompressing it, as a browser's network stack would count it
+                async with client.stream("GET", path, headers=headers) as response:
+                    async for _ in response.aiter_raw():
+                        pass
+                last = response
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, last.status_code, int(last.headers.get("content-length", 0))
+
+async def run(requests: int, concurrency: int, bundle_kb: int):
+    write_build(bundle_kb)
+    static_site.load()
+    spa_etag = static_site.lookup("/").etag[:-1] + '-gz"'
+    old = disk_app()
+    cases = [
+        ("SPA fallback", "disk", old, "/play/walls", {"Accept-Encoding": "gzip"}),
+        ("SPA fallback", "manifest", app, "/play/walls", {"Accept-Encoding": "gzip"}),
+        ("SPA fallback 304", "manifest", app, "/play/walls", {"Accept-Encoding": "gzip", "If-None-Match": spa_etag}),
+        ("bundle", "disk", old, f"/{BUNDLE}", {"Accept-Encoding": "gzip"}),
+        ("bundle", "manifest", app, f"/{BUNDLE}", {"Accept-Encoding": "gzip"}),
+    ]
+    print(f"{'request':<18} {'served from':<10} {'req/s':>10} {'status':>7} {'bytes':>9}")
+    for name, source, target, path, headers in cases:
+        rate, status, size = await measure(target, path, requests, concurrency, headers)
+        print(f"{name:<18} {source:<10} {rate:>10.0f} {status:>7} {size:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--bundle-kb", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.bundle_kb))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Load tests: throughput and tail latency of the API under realistic traffic mixes.
+
+``run`` seeds a database with the requested volumes of users, leaderboard
+entries and active players (through ``app/datagen.py``), starts the app
+(lifespan included, so the leaderboard index, histograms and presence
+registry load as in production) and drives it in-process with concurrent
+virtual clients, each with its own session cookie. A scenario is a weighted mix of operations:
+
+* ``spectate``: leaderboard pages (revalidated with ``If-None-Match`` like a
+  browser), period and distinct boards, ``/players``, player stats and
+  ``/leaderboard/around``, with a trickle of heartbeats from active players.
+* ``submit-burst``: score submits and heartbeats with some reads.
+* ``login-storm``: logins (scrypt-hashed) followed by ``/auth/me``.
+* ``mixed``: all of the above.
+
+Results are JSON: requests/s, p50/p95/p99 and status counts per endpoint and
+overall. ``compare`` reads two result files and exits 1 if any endpoint's
+throughput dropped or p95/p99 grew by more than ``--tolerance``.
+
+Usage:
+    uv run python -m benchmarks.loadtest run --scenario spectate --users 10000 --scores-per-user 100 --clients 64 --out before.json
+    uv run python -m benchmarks.loadtest run --scenario spectate --users 10000 --scores-per-user 100 --clients 64 --out after.json
+    uv run python -m benchmarks.loadtest compare before.json after.json
+
+The app reads its usual environment, so compare configurations by running
+with different settings (``SCORE_INGEST_MODE=batched``, ``RESPONSE_CACHE=false``,
+``--database-url`` for Postgres, ...). Per-session rate limits are off unless
+``RATE_LIMITS=true`` is set, since every virtual client shares one address;
+admission control stays on as in production.
+"""
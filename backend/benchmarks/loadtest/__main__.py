@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from . import __doc__ as package_doc
+from .report import compare, format_table
+
+
+async def run(args) -> dict:
+    # Imported here, once main() has pointed DATABASE_URL at the run's database
+    from app.database import AsyncSessionLocal, engine, init_db
+    from app.datagen import Profile
+    from app.main import app
+    from .data import existing_users, seed
+    from .runner import drive
+
+    await init_db()
+    if args.no_seed:
+        users = await existing_users(AsyncSessionLocal, args.users)
+    else:
+        profile = Profile(users=args.users, scores_per_user=args.scores_per_user, activity=args.activity,
+                          active_players=args.players, seed=args.seed)
+        try:
+            users = await seed(AsyncSessionLocal, profile, log=lambda line: print(line, file=sys.stderr))
+        except ValueError as e:
+            raise SystemExit(f"{e}; pass --no-seed to reuse its data")
+    if not users:
+        raise SystemExit("No users to drive the app with")
+
+    async with app.router.lifespan_context(app):
+        print(f"Running {args.scenario} with {args.clients} clients for {args.duration}s...", file=sys.stderr)
+        results = await drive(app, args.scenario, users, args.clients, args.duration, args.warmup, args.think_ms, args.seed)
+    await engine.dispose()
+    results["data"] = {
+        "users": args.users, "scores_per_user": args.scores_per_user, "activity": args.activity,
+        "players": args.players, "seeded": not args.no_seed, "dialect": engine.dialect.name,
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description=package_doc.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed data, drive the app and write JSON results")
+    run_parser.add_argument("--scenario", default="mixed", help="spectate, submit-burst, login-storm or mixed")
+    run_parser.add_argument("--users", type=int, default=1000)
+    run_parser.add_argument("--scores-per-user", type=float, default=100.0)
+    run_parser.add_argument("--activity", choices=("uniform", "zipf"), default="zipf", help="how games are spread over users (see app/datagen.py)")
+    run_parser.add_argument("--players", type=int, default=200, help="active players seeded into the presence list")
+    run_parser.add_argument("--clients", type=int, default=32, help="concurrent virtual clients")
+    run_parser.add_argument("--duration", type=float, default=10.0, help="recorded seconds")
+    run_parser.add_argument("--warmup", type=float, default=2.0, help="unrecorded seconds before recording starts")
+    run_parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a client's requests (0 = closed loop)")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--database-url", help="database to seed and test against (default: a scratch SQLite file)")
+    run_parser.add_argument("--no-seed", action="store_true", help="reuse the users and data already in --database-url")
+    run_parser.add_argument("--out", help="write results here instead of stdout")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative change (0.1 = 10%%)")
+    compare_parser.add_argument("--min-ms", type=float, default=0.5, help="ignore latency increases smaller than this")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+        if (before["scenario"], before.get("data")) != (after["scenario"], after.get("data")):
+            print("warning: the runs used different scenarios or data volumes", file=sys.stderr)
+        regressions = compare(before, after, args.tolerance, args.min_ms)
+        print(format_table(before, after, regressions))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    # Before anything imports the app, which binds its engine to DATABASE_URL at import
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+    # Virtual clients share one address and submit far faster than people; set RATE_LIMITS=true to measure the limits
+    os.environ.setdefault("RATE_LIMITS", "false")
+    from .scenarios import SCENARIOS
+    if args.scenario not in SCENARIOS:
+        parser.error(f"unknown scenario {args.scenario!r} (choose from {', '.join(sorted(SCENARIOS))})")
+    # One log line per request would distort the run
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = asyncio.run(run(args))
+    body = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
+    total = results["total"]
+    print(f"{total['requests']} requests, {total['rps']:.0f} req/s, p50 {total['p50_ms']:.1f} ms, "
+          f"p95 {total['p95_ms']:.1f} ms, p99 {total['p99_ms']:.1f} ms, {total['errors']} errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Users to drive the app with: generated by ``app/datagen.py``, or read back for ``--no-seed`` runs."""
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from app import datagen
+from app.models import User
+
+
+@dataclass(frozen=True)
+class SeededUser:
+    id: str
+    username: str
+    email: str
+
+
+async def seed(session_factory, profile: datagen.Profile, log=print) -> list[SeededUser]:
+    """Generate ``profile`` (with derived tables) and return its users."""
+    await datagen.generate(session_factory, profile, log=log)
+    return [SeededUser(datagen.user_id(profile, i), f"Player{i}", f"player{i}@example.com") for i in range(profile.users)]
+
+
+async def existing_users(session_factory, limit: int) -> list[SeededUser]:
+    """Users already in the database; their passwords must be ``datagen.PASSWORD`` for logins to succeed."""
+    async with session_factory() as db:
+        rows = (await db.execute(select(User.id, User.username, User.email).limit(limit))).all()
+    return [SeededUser(*row) for row in rows]
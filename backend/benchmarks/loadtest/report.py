@@ -0,0 +1,76 @@
+"""Latency summaries and run-to-run comparison for load test results."""
+import math
+from dataclasses import dataclass
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile ``q`` (0-100) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(1, math.ceil(q / 100 * len(sorted_values))) - 1]
+
+
+def summarize(latencies: list[float], statuses: dict[int, int], errors: int, elapsed: float) -> dict:
+    """Requests/s, latency percentiles (ms) and status counts for one endpoint."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+@dataclass
+class Regression:
+    endpoint: str
+    metric: str
+    before: float
+    after: float
+
+    @property
+    def change(self) -> float:
+        return (self.after - self.before) / self.before if self.before else float("inf")
+
+
+def compare(before: dict, after: dict, tolerance: float = 0.1, min_ms: float = 0.5) -> list[Regression]:
+    """Endpoints of ``after`` that are slower than in ``before`` beyond ``tolerance``.
+
+    Throughput regresses when it drops by more than ``tolerance`` (a fraction);
+    p95 and p99 regress when they grow by more than that and by at least
+    ``min_ms``, so sub-millisecond jitter on fast endpoints is not flagged.
+    New error responses are always a regression.
+    """
+    regressions = []
+    endpoints = {"total": (before["total"], after["total"])}
+    endpoints.update({
+        name: (before["endpoints"][name], stats)
+        for name, stats in after["endpoints"].items()
+        if name in before["endpoints"]
+    })
+    for name, (old, new) in endpoints.items():
+        if old["rps"] and new["rps"] < old["rps"] * (1 - tolerance):
+            regressions.append(Regression(name, "rps", old["rps"], new["rps"]))
+        for metric in ("p95_ms", "p99_ms"):
+            if new[metric] > old[metric] * (1 + tolerance) and new[metric] - old[metric] >= min_ms:
+                regressions.append(Regression(name, metric, old[metric], new[metric]))
+        if new["errors"] > old["errors"]:
+            regressions.append(Regression(name, "errors", old["errors"], new["errors"]))
+    return regressions
+
+
+def format_table(before: dict, after: dict, regressions: list[Regression]) -> str:
+    flagged = {(r.endpoint, r.metric) for r in regressions}
+    lines = [f"{'endpoint':<34} {'metric':<7} {'before':>10} {'after':>10} {'change':>8}"]
+    for name in ["total", *sorted(set(before["endpoints"]) & set(after["endpoints"]))]:
+        old = before["total"] if name == "total" else before["endpoints"][name]
+        new = after["total"] if name == "total" else after["endpoints"][name]
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            mark = "  REGRESSION" if (name, metric) in flagged else ""
+            lines.append(f"{name:<34} {metric:<7} {old[metric]:>10.1f} {new[metric]:>10.1f} {change:>+7.1f}%{mark}")
+    return "\n".join(lines)
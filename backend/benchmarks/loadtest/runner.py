@@ -0,0 +1,78 @@
+"""Drive the ASGI app with concurrent virtual clients and collect per-endpoint latencies."""
+import asyncio
+import itertools
+import os
+import platform
+import random
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from .data import SeededUser
+from .report import summarize
+from .scenarios import OPERATIONS, SCENARIOS, VirtualClient
+
+
+async def drive(app, scenario: str, users: list[SeededUser], clients: int, duration: float,
+                warmup: float = 1.0, think_ms: float = 0.0, seed: int = 42) -> dict:
+    """Run ``clients`` closed-loop clients for ``warmup + duration`` seconds; only ``duration`` is recorded."""
+    weights = SCENARIOS[scenario]
+    names = list(weights)
+    cumulative = list(itertools.accumulate(weights.values()))
+    latencies: dict[str, list[float]] = defaultdict(list)
+    statuses: dict[str, Counter] = defaultdict(Counter)
+    errors: Counter = Counter()
+    recording = False
+    stop = asyncio.Event()
+    # 500s come back as responses rather than exceptions, so they are counted
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+    async def client_loop(i: int):
+        rng = random.Random(seed * 1_000_003 + i)
+        user = users[i % len(users)]
+        # Every client is signed in as its own user; login-storm logs in again on top
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", cookies={"session_id": user.email}) as client:
+            vc = VirtualClient(client, user, users, rng)
+            while not stop.is_set():
+                label, operation = OPERATIONS[rng.choices(names, cum_weights=cumulative)[0]]
+                start = time.perf_counter()
+                try:
+                    status = (await operation(vc)).status_code
+                except httpx.HTTPError:
+                    status = None
+                elapsed = time.perf_counter() - start
+                if recording:
+                    if status is None or status >= 500:
+                        errors[label] += 1
+                    if status is not None:
+                        latencies[label].append(elapsed)
+                        statuses[label][status] += 1
+                if think_ms:
+                    await asyncio.sleep(rng.expovariate(1000 / think_ms))
+                else:
+                    # Let the other clients in even when every request is served without awaiting I/O
+                    await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(client_loop(i)) for i in range(clients)]
+    await asyncio.sleep(warmup)
+    recording = True
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    recording = False
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    all_statuses = sum(statuses.values(), Counter())
+    return {
+        "scenario": scenario,
+        "config": {"clients": clients, "duration_s": duration, "warmup_s": warmup, "think_ms": think_ms, "seed": seed, "users": len(users)},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "elapsed_s": round(elapsed, 3),
+        "total": summarize([value for values in latencies.values() for value in values], all_statuses, sum(errors.values()), elapsed),
+        "endpoints": {
+            label: summarize(latencies[label], statuses[label], errors[label], elapsed)
+            for label in sorted(set(latencies) | set(errors))
+        },
+    }
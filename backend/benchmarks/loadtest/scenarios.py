@@ -0,0 +1,101 @@
+"""Operations a virtual client can perform, and the weighted mixes that make up scenarios."""
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+
+from app.datagen import MODES, PASSWORD
+from .data import SeededUser
+
+
+@dataclass
+class VirtualClient:
+    """One simulated browser: its own cookies, ETags and random stream."""
+    client: httpx.AsyncClient
+    user: SeededUser
+    users: list[SeededUser]
+    rng: random.Random
+    etags: dict[str, str] = field(default_factory=dict)
+
+    async def get(self, url: str, **params) -> httpx.Response:
+        # Revalidate what this client has seen before, as a browser would
+        key = url + repr(sorted(params.items()))
+        headers = {"If-None-Match": self.etags[key]} if key in self.etags else {}
+        response = await self.client.get(url, params=params, headers=headers)
+        if "etag" in response.headers:
+            self.etags[key] = response.headers["etag"]
+        return response
+
+    def mode(self) -> str:
+        return self.rng.choice(MODES).value
+
+    def other_user(self) -> SeededUser:
+        return self.rng.choice(self.users)
+
+
+Operation = Callable[[VirtualClient], Awaitable[httpx.Response]]
+
+
+async def leaderboard(vc: VirtualClient):
+    return await vc.get("/leaderboard", mode=vc.mode(), limit=vc.rng.choice((10, 10, 10, 50, 100)))
+
+async def leaderboard_period(vc: VirtualClient):
+    return await vc.get("/leaderboard", mode=vc.mode(), period=vc.rng.choice(("day", "week")))
+
+async def leaderboard_distinct(vc: VirtualClient):
+    return await vc.get("/leaderboard", mode=vc.mode(), distinct="true")
+
+async def leaderboard_around(vc: VirtualClient):
+    return await vc.get(f"/leaderboard/around/{vc.other_user().id}", mode=vc.mode())
+
+async def histogram(vc: VirtualClient):
+    return await vc.get("/leaderboard/histogram", mode=vc.mode())
+
+async def players(vc: VirtualClient):
+    return await vc.get("/players")
+
+async def player_stats(vc: VirtualClient):
+    return await vc.get(f"/players/{vc.other_user().id}/stats")
+
+async def heartbeat(vc: VirtualClient):
+    return await vc.client.post("/players/heartbeat", json={"score": vc.rng.randint(0, 2000), "mode": vc.mode()})
+
+async def submit(vc: VirtualClient):
+    return await vc.client.post("/leaderboard", json={"score": int(vc.rng.expovariate(1 / 600)), "mode": vc.mode()})
+
+async def login(vc: VirtualClient):
+    return await vc.client.post("/auth/login", json={"email": vc.user.email, "password": PASSWORD})
+
+async def me(vc: VirtualClient):
+    return await vc.client.get("/auth/me")
+
+
+# Operation name -> (endpoint label used in results, operation)
+OPERATIONS: dict[str, tuple[str, Operation]] = {
+    "leaderboard": ("GET /leaderboard", leaderboard),
+    "leaderboard_period": ("GET /leaderboard?period", leaderboard_period),
+    "leaderboard_distinct": ("GET /leaderboard?distinct", leaderboard_distinct),
+    "leaderboard_around": ("GET /leaderboard/around/{user_id}", leaderboard_around),
+    "histogram": ("GET /leaderboard/histogram", histogram),
+    "players": ("GET /players", players),
+    "player_stats": ("GET /players/{player_id}/stats", player_stats),
+    "heartbeat": ("POST /players/heartbeat", heartbeat),
+    "submit": ("POST /leaderboard", submit),
+    "login": ("POST /auth/login", login),
+    "me": ("GET /auth/me", me),
+}
+
+# Scenario -> operation weights
+SCENARIOS: dict[str, dict[str, int]] = {
+    "spectate": {
+        "leaderboard": 35, "leaderboard_period": 10, "leaderboard_distinct": 5, "leaderboard_around": 10,
+        "histogram": 3, "players": 25, "player_stats": 7, "heartbeat": 5,
+    },
+    "submit-burst": {"submit": 60, "heartbeat": 25, "leaderboard": 10, "players": 5},
+    "login-storm": {"login": 70, "me": 20, "leaderboard": 10},
+    "mixed": {
+        "leaderboard": 25, "leaderboard_period": 5, "leaderboard_distinct": 3, "leaderboard_around": 5,
+        "histogram": 2, "players": 20, "player_stats": 5, "heartbeat": 15, "submit": 12, "login": 3, "me": 5,
+    },
+}
@@ -12,7 +12,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.main import app
 from app.database import get_db
+from app.dependencies import get_read_db, read_your_writes
 from app.models import Base
+from app.session_cache import session_cache
+from app.response_cache import response_cache
 
 # Use in-memory SQLite for tests
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -42,5 +45,9 @@ def client(db_session):
             yield session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     yield TestClient(app)
     app.dependency_overrides.clear()
+    session_cache.clear()
+    read_your_writes.clear()
+    response_cache.clear()
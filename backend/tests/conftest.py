@@ -5,8 +5,17 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from sqlalchemy.pool import StaticPool
 from app.main import app
 from app.database import get_db
+from app.dependencies import get_read_db, read_your_writes
+from app.leaderboard_index import leaderboard_index
+from app.histogram import score_histogram
+from app.rollups import rollup_trimmer
+from app.session_cache import session_cache
+from app.response_cache import response_cache
+from app.query_stats import track
+from app.admission import admission_controller
 from app.models import Base, User, GameMode, LeaderboardEntry
 from app.schemas import UserCreate
+from contextlib import contextmanager
 from datetime import datetime, timezone
 import uuid
 
@@ -20,6 +29,13 @@ engine = create_async_engine(
 )
 TestingSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+@contextmanager
+def assert_max_queries(n: int):
+    """Fail if the block runs more than ``n`` SQL statements (an N+1 guard)."""
+    with track() as stats:
+        yield stats
+    assert stats.count <= n, f"{stats.count} queries, budget {n}:\n" + "\n".join(stats.statements)
+
 @pytest_asyncio.fixture
 async def db_session():
     async with engine.begin() as conn:
@@ -75,5 +91,13 @@ def client(seeded_db): # Depend on seeded_db to ensure data exists
             yield session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     yield TestClient(app)
     app.dependency_overrides.clear()
+    leaderboard_index.reset()
+    score_histogram.reset()
+    rollup_trimmer.reset()
+    session_cache.clear()
+    read_your_writes.clear()
+    response_cache.clear()
+    admission_controller.reset()
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import bulk, dependencies
+
+
+@pytest.fixture
+def admin(client: TestClient, monkeypatch):
+    monkeypatch.setattr(dependencies, "ADMIN_EMAILS", {"snake@example.com"})
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    return client
+
+
+def submit(client: TestClient, *scores: int):
+    for score in scores:
+        assert client.post("/leaderboard", json={"score": score, "mode": "walls"}).status_code == 201
+
+
+def test_admin_routes_require_an_admin(client: TestClient):
+    assert client.get("/admin/leaderboard/export").status_code == 401
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    response = client.get("/admin/leaderboard/export")
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Admin access required"
+
+
+def test_export_streams_every_entry(admin: TestClient, monkeypatch):
+    # Several partitions, so the session has to stay open across chunks
+    monkeypatch.setattr(bulk, "EXPORT_BATCH_SIZE", 2)
+    submit(admin, *range(100, 105))
+
+    response = admin.get("/admin/leaderboard/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="leaderboard.ndjson"'
+    entries = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(entry["score"] for entry in entries) == [100, 101, 102, 103, 104, 2500]
+    assert entries == sorted(entries, key=lambda entry: entry["id"])
+    assert set(entries[0]) == {"id", "userId", "username", "score", "mode", "playedAt"}
+
+    response = admin.get("/admin/leaderboard/export", params={"format": "csv", "mode": "pass-through"})
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.text == "id,userId,username,score,mode,playedAt\r\n"
+
+
+def test_export_imports_back(admin: TestClient):
+    submit(admin, 10, 20)
+    for format in ("ndjson", "csv"):
+        exported = admin.get("/admin/leaderboard/export", params={"format": format}).content
+
+        # Everything is already stored, so a re-import only skips
+        response = admin.post("/admin/leaderboard/import", params={"format": format}, content=exported)
+        assert response.status_code == 200
+        assert response.json() | {"seconds": 0} == {"imported": 0, "skipped": 3, "failed": 0, "errors": [], "seconds": 0}
+
+    user_id = admin.get("/auth/me").json()["id"]
+    upload = "\n".join([
+        "id,userId,username,score,mode,playedAt",
+        f"new-1,{user_id},SnakeMaster,4000,walls,2024-01-01T12:00:00Z",
+        f",{user_id},SnakeMaster,5,pass-through,",
+        f"new-1,{user_id},SnakeMaster,4000,walls,",
+        f"bad,{user_id},SnakeMaster,-1,walls,",
+        "orphan,nobody,Ghost,7,walls,",
+        "too,few",
+    ])
+    response = admin.post("/admin/leaderboard/import", params={"format": "csv"}, content=upload.encode())
+    result = response.json()
+    assert (result["imported"], result["skipped"], result["failed"]) == (2, 1, 3)
+    assert [(error["line"], error["message"]) for error in result["errors"]] == [
+        (5, "score: Input should be greater than or equal to 0"),
+        (7, "Expected 6 columns, got 2"),
+        (6, "Unknown user nobody"),
+    ]
+
+    # Imports go through the submit path, so the boards and stats see them
+    top = admin.get("/leaderboard", params={"mode": "walls", "limit": 1}).json()[0]
+    assert (top["id"], top["score"]) == ("new-1", 4000)
+    assert top["playedAt"].startswith("2024-01-01T12:00:00")
+    # The two submits and two imports; the seeded entry was inserted without stats
+    stats = admin.get(f"/players/{user_id}/stats").json()
+    assert {mode["mode"]: mode["games"] for mode in stats["modes"]} == {"walls": 3, "pass-through": 1}
+
+
+@pytest.mark.asyncio
+async def test_import_batches_and_caps_errors(monkeypatch):
+    async def chunks():
+        # Lines split across chunks, and a blank line
+        yield b'{"userId": "u", "username": "a", "score": 1, "mo'
+        yield b'de": "walls"}\n\nnot json\n{"userId": "u"}\n'
+        yield b"{}"
+
+    written = []
+
+    async def write(job, batch):
+        written.append([line for line, _ in batch])
+
+    monkeypatch.setattr(bulk.Import, "write", write)
+    result = await bulk.import_entries(None, bulk.schemas.ExportFormat.NDJSON, chunks(), batch_size=1, max_errors=2)
+    assert written == [[1]]
+    assert result.failed == 3
+    assert [error.line for error in result.errors] == [3, 4]
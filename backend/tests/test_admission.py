@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import ConcurrencyLimit, RateLimit, Rejected, admission_controller, admission_rejected, route_class
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_queues_then_sheds():
+    limit = ConcurrencyLimit("test", limit=1, queue_size=1, timeout=0.05)
+    await limit.acquire()
+
+    waiting = asyncio.create_task(limit.acquire())
+    await asyncio.sleep(0)
+    assert limit.queued == 1
+    with pytest.raises(Rejected) as rejected:
+        await limit.acquire()
+    assert (rejected.value.status, rejected.value.reason) == (503, "queue_full")
+
+    # The slot passes straight to the waiter
+    limit.release()
+    await waiting
+    assert (limit.in_flight, limit.queued) == (1, 0)
+
+    with pytest.raises(Rejected) as rejected:
+        await limit.acquire()
+    assert rejected.value.reason == "queue_timeout"
+    assert limit.queued == 0
+
+    # A waiter that goes away (client disconnect) leaves the line
+    cancelled = asyncio.create_task(limit.acquire())
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    limit.release()
+    assert (limit.in_flight, limit.queued) == (0, 0)
+
+
+def test_rate_limit_refills_per_key():
+    now = [0.0]
+    limit = RateLimit("test", per_minute=60, burst=2, max_keys=2, clock=lambda: now[0])
+    assert [limit.take("a"), limit.take("a"), limit.take("a")] == [0, 0, 1.0]
+    now[0] = 0.5
+    assert limit.take("a") == 0.5
+    assert limit.take("b") == 0
+    now[0] = 2.0
+    assert limit.take("a") == 0
+
+    # The least recently used key is forgotten (and starts with a full bucket again)
+    limit.take("c")
+    assert "b" not in limit._buckets
+
+
+def test_route_classes():
+    assert route_class("GET", "/leaderboard") == "read"
+    assert route_class("GET", "/players/abc/stats") == "read"
+    assert route_class("POST", "/leaderboard") == "write"
+    assert route_class("DELETE", "/players/heartbeat") == "write"
+    assert route_class("POST", "/auth/login") == "auth"
+    assert route_class("POST", "/admin/leaderboard/import") == "admin"
+    assert route_class("GET", "/") is None
+    assert route_class("GET", "/metrics") is None
+
+
+def test_login_rate_limit_returns_429(client: TestClient, monkeypatch):
+    monkeypatch.setattr(admission_controller.limits[("POST", "/auth/login")], "burst", 2)
+    login = {"email": "snake@example.com", "password": "wrong"}
+    assert [client.post("/auth/login", json=login).status_code for _ in range(3)] == [401, 401, 429]
+
+    response = client.post("/auth/login", json=login)
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests"}
+    # 20 per minute: the next token is due within 3 seconds
+    assert response.headers["retry-after"] == "3"
+    assert admission_rejected.value("auth", "rate_limited") >= 2
+
+
+def test_saturated_class_is_shed_fast(client: TestClient, monkeypatch):
+    read = admission_controller.classes["read"]
+    monkeypatch.setattr(read, "limit", 0)
+    monkeypatch.setattr(read, "queue_size", 0)
+
+    response = client.get("/leaderboard")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    # Other classes and unlimited paths are unaffected
+    assert client.post("/auth/login", json={"email": "snake@example.com", "password": "password"}).status_code == 200
+    assert client.get("/").status_code == 200
+    assert read.in_flight == 0
+
+    metrics = client.get("/metrics").text
+    assert 'admission_rejected_total{class="read",reason="queue_full"} 1' in metrics
+    assert 'admission_queue_depth{class="read"} 0' in metrics
+
+
+def test_rotating_session_cookies_do_not_reset_rate_limits(client: TestClient, monkeypatch):
+    monkeypatch.setattr(admission_controller.limits[("POST", "/auth/login")], "burst", 2)
+    login = {"email": "snake@example.com", "password": "wrong"}
+    statuses = []
+    for attempt in range(3):
+        client.cookies.set("session_id", f"guess-{attempt}")
+        statuses.append(client.post("/auth/login", json=login).status_code)
+    assert statuses == [401, 401, 429]
+
+    # Unresolved sessions submit from their address's bucket too
+    monkeypatch.setattr(admission_controller.limits[("POST", "/leaderboard")], "burst", 1)
+    client.cookies.set("session_id", "made-up@example.com")
+    assert client.post("/leaderboard", json={"score": 1, "mode": "walls"}).status_code == 401
+    client.cookies.set("session_id", "also-made-up@example.com")
+    assert client.post("/leaderboard", json={"score": 1, "mode": "walls"}).status_code == 429
+
+
+def test_logins_are_also_limited_per_account(client: TestClient, monkeypatch):
+    monkeypatch.setattr(admission_controller.login_accounts, "burst", 2)
+    login = {"email": "Snake@example.com", "password": "wrong"}
+    assert [client.post("/auth/login", json=login).status_code for _ in range(3)] == [401, 401, 429]
+    # Case does not make a new account bucket; another account still has tokens
+    assert client.post("/auth/login", json={**login, "email": "snake@EXAMPLE.com"}).status_code == 429
+    assert client.post("/auth/login", json={**login, "email": "other@example.com"}).status_code == 401
+
+
+def test_submits_from_a_resolved_session_are_limited_per_user(client: TestClient, monkeypatch):
+    monkeypatch.setattr(admission_controller.limits[("POST", "/leaderboard")], "burst", 1)
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    assert client.post("/leaderboard", json={"score": 1, "mode": "walls"}).status_code == 201
+    assert client.post("/leaderboard", json={"score": 1, "mode": "walls"}).status_code == 429
+    # Without the session, the client spends from its address bucket instead
+    client.cookies.clear()
+    assert client.post("/leaderboard", json={"score": 1, "mode": "walls"}).status_code == 401
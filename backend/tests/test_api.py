@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from app.models import GameMode
 
@@ -98,3 +99,156 @@ def test_get_active_players(client: TestClient):
     response = client.get("/players")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+def test_players_feed_sends_snapshot_then_deltas(client: TestClient):
+    from app.live import player_broadcaster
+    from .conftest import TestingSessionLocal
+    # Long interval so only the initial pass hits the DB and the test drives the deltas
+    player_broadcaster.session_factory = TestingSessionLocal
+    player_broadcaster.interval = 60
+    try:
+        with client.websocket_connect("/players/ws") as websocket:
+            assert websocket.receive_json() == {"type": "snapshot", "players": []}
+            assert player_broadcaster.subscriber_count == 1
+
+            player = {"id": "p1", "username": "Watcher", "currentScore": 10, "mode": "walls", "startedAt": "2024-01-01T00:00:00Z"}
+            websocket.portal.call(player_broadcaster.publish, [player])
+            assert websocket.receive_json() == {"type": "delta", "join": [player], "score": [], "leave": []}
+            websocket.portal.call(player_broadcaster.publish, [{**player, "currentScore": 20}])
+            assert websocket.receive_json() == {"type": "delta", "join": [], "score": [{"id": "p1", "currentScore": 20}], "leave": []}
+            websocket.portal.call(player_broadcaster.publish, [])
+            assert websocket.receive_json() == {"type": "delta", "join": [], "score": [], "leave": ["p1"]}
+    finally:
+        player_broadcaster.__init__()
+
+def test_heartbeat_lists_player_until_leave(client: TestClient):
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+
+    response = client.post("/players/heartbeat", json={"score": 40, "mode": GameMode.WALLS})
+    assert response.status_code == 200
+    player_id = response.json()["id"]
+    assert client.get(f"/players/{player_id}").json()["currentScore"] == 40
+
+    client.post("/players/heartbeat", json={"score": 60, "mode": GameMode.WALLS})
+    assert [p["currentScore"] for p in client.get("/players").json()] == [60]
+
+    assert client.delete("/players/heartbeat").status_code == 204
+    assert client.get(f"/players/{player_id}").status_code == 404
+
+def test_session_lookup_is_cached_until_logout(client: TestClient):
+    from sqlalchemy import event
+    from app.session_cache import session_cache
+    from .conftest import engine
+
+    queries = []
+    def count_query(*args):
+        queries.append(args[2])
+
+    assert client.post("/auth/login", json={"email": "snake@example.com", "password": "password"}).status_code == 200
+    event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+    try:
+        for _ in range(3):
+            assert client.get("/auth/me").json()["email"] == "snake@example.com"
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_query)
+    assert queries == []
+    assert session_cache.hits == 3
+
+    client.post("/auth/logout")
+    assert len(session_cache) == 0
+    assert client.get("/auth/me").status_code == 401
+
+@pytest.mark.asyncio
+async def test_login_upgrades_plaintext_password(client: TestClient, seeded_db):
+    from app.models import User
+    from sqlalchemy import select
+    assert client.post("/auth/login", json={"email": "snake@example.com", "password": "password"}).status_code == 200
+
+    stored = (await seeded_db.execute(select(User.password_hash).where(User.email == "snake@example.com"))).scalar_one()
+    assert stored.startswith("scrypt$")
+    assert client.post("/auth/login", json={"email": "snake@example.com", "password": "password"}).status_code == 200
+    assert client.post("/auth/login", json={"email": "snake@example.com", "password": "nope"}).status_code == 401
+
+def test_leaderboard_conditional_get(client: TestClient):
+    from app.response_cache import response_cache
+    first = client.get("/leaderboard?mode=walls")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    second = client.get("/leaderboard?mode=walls", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert response_cache.hits == 1
+
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    client.post("/leaderboard", json={"score": 3000, "mode": GameMode.WALLS})
+    third = client.get("/leaderboard?mode=walls", headers={"If-None-Match": etag})
+    assert third.status_code == 200
+    assert [e["score"] for e in third.json()] == [3000, 2500]
+    assert third.headers["etag"] != etag
+
+def test_period_leaderboard_only_lists_current_period(client: TestClient):
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    # The seeded 2500 entry was inserted directly, so it is not in any rollup
+    assert client.get("/leaderboard", params={"period": "day"}).json() == []
+
+    client.post("/leaderboard", json={"score": 1200, "mode": GameMode.WALLS})
+    assert [e["score"] for e in client.get("/leaderboard", params={"period": "day"}).json()] == [1200]
+    assert [e["score"] for e in client.get("/leaderboard", params={"period": "week", "mode": "walls"}).json()] == [1200]
+    assert [e["score"] for e in client.get("/leaderboard", params={"period": "all"}).json()] == [2500, 1200]
+
+# Round trips per request with the test app's configuration: no leaderboard
+# index or score histogram, so a submit also counts its rank and percentile in
+# SQL. Raise a budget only when the extra query is intended.
+def test_auth_query_budgets(client: TestClient):
+    from .conftest import assert_max_queries
+    signup = {"username": "Budget", "email": "budget@example.com", "password": "password123"}
+    with assert_max_queries(2):  # existence check, insert
+        assert client.post("/auth/signup", json=signup).status_code == 201
+    with assert_max_queries(1):
+        assert client.post("/auth/signup", json={**signup, "username": "Other"}).json()["detail"] == "Email already registered"
+    with assert_max_queries(1):
+        assert client.post("/auth/signup", json={**signup, "email": "other@example.com"}).json()["detail"] == "Username already taken"
+
+    login = {"email": "snake@example.com", "password": "password"}
+    with assert_max_queries(2):  # lookup, plaintext password upgrade
+        assert client.post("/auth/login", json=login).status_code == 200
+    with assert_max_queries(1):
+        assert client.post("/auth/login", json=login).status_code == 200
+    with assert_max_queries(0):
+        assert client.get("/auth/me").status_code == 200
+
+    with pytest.raises(AssertionError, match="1 queries, budget 0"):
+        with assert_max_queries(0):
+            client.post("/auth/login", json=login)
+
+def test_leaderboard_query_budgets(client: TestClient):
+    from .conftest import assert_max_queries
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    # 1 entry insert; 1 upsert of the day and week rollup rows (trimming runs
+    # periodically, off this path); 1 personal-best upsert; 2 player stats
+    # upserts (running aggregates, recent-scores ring); 1 rank count; 1
+    # percentile count. The user comes from the session cache.
+    with assert_max_queries(7):
+        assert client.post("/leaderboard", json={"score": 3000, "mode": GameMode.WALLS}).status_code == 201
+    with assert_max_queries(8):  # one more for bestRank
+        assert client.post("/leaderboard?distinct=true", json={"score": 3100, "mode": GameMode.WALLS}).status_code == 201
+
+    client.cookies.clear()
+    with assert_max_queries(1):
+        client.get("/leaderboard")
+    with assert_max_queries(0):
+        client.get("/leaderboard")
+    with assert_max_queries(1):
+        client.get("/leaderboard", params={"distinct": "true"})
+    with assert_max_queries(1):
+        client.get("/players")
+
+def test_debug_headers_report_queries(client: TestClient):
+    from app.main import app
+    from app.query_stats import QueryStatsMiddleware
+    debug_client = TestClient(QueryStatsMiddleware(app))
+    response = debug_client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    assert response.headers["x-db-queries"] == "2"
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert response.headers["server-timing"].endswith('desc="2 queries"')
+    assert debug_client.get("/auth/me").headers["x-db-queries"] == "0"
@@ -0,0 +1,74 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, select
+
+from app import best_scores
+from app.leaderboard_index import IndexedEntry, order_key
+from app.models import GameMode, LeaderboardEntry, UserBestScore
+from .conftest import TestingSessionLocal
+
+NOW = datetime(2024, 3, 14, 15, 0, tzinfo=timezone.utc)
+
+
+def make_entries(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        IndexedEntry(f"e{i:04d}", f"user-{i % 7}", f"User{i % 7}", rng.randint(0, 30) * 10,
+                     rng.choice(list(GameMode)), NOW - timedelta(minutes=rng.randint(0, 10_000)))
+        for i in range(count)
+    ]
+
+
+def expected_bests(entries):
+    bests = {}
+    for entry in sorted(entries, key=order_key):
+        bests.setdefault((entry.user_id, entry.mode), entry.id)
+    return bests
+
+
+async def stored_bests(db):
+    result = await db.execute(select(UserBestScore.user_id, UserBestScore.mode, UserBestScore.id))
+    return {(row.user_id, row.mode): row.id for row in result}
+
+
+@pytest.mark.asyncio
+async def test_record_keeps_each_players_best_per_mode(db_session):
+    entries = make_entries(400)
+    for offset in range(0, len(entries), 29):
+        await best_scores.record(db_session, entries[offset:offset + 29])
+        await db_session.commit()
+
+    assert await stored_bests(db_session) == expected_bests(entries)
+
+
+@pytest.mark.asyncio
+async def test_backfill_matches_incremental_record(db_session):
+    entries = make_entries(400, seed=2)
+    await db_session.execute(insert(LeaderboardEntry), [entry._asdict() for entry in entries])
+    await db_session.commit()
+
+    assert await best_scores.backfill(TestingSessionLocal, batch_size=64) == len(entries)
+    assert await stored_bests(db_session) == expected_bests(entries)
+    # Rank among personal bests counts players, not entries
+    bests = [e for e in entries if e.id in expected_bests(entries).values() and e.mode == GameMode.WALLS]
+    for best in bests:
+        assert await best_scores.get_best_rank(db_session, best.user_id, GameMode.WALLS) == 1 + sum(e.score > best.score for e in bests)
+    assert await best_scores.get_best_rank(db_session, "nobody", GameMode.WALLS) is None
+
+
+def test_distinct_leaderboard_lists_one_entry_per_player(client):
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    # The seeded 2500 entry was inserted directly, so only these submits are in the table
+    for score in (100, 300, 200):
+        response = client.post("/leaderboard?distinct=true", json={"score": score, "mode": "walls"})
+        assert response.status_code == 201
+    assert response.json() == {"success": True, "rank": 3, "bestRank": 1, "percentile": 25.0}
+    assert "bestRank" not in client.post("/leaderboard", json={"score": 50, "mode": "walls"}).json()
+
+    distinct = client.get("/leaderboard?distinct=true").json()
+    assert [(e["username"], e["score"]) for e in distinct] == [("SnakeMaster", 300)]
+    assert len(client.get("/leaderboard").json()) == 5
+
+    assert client.get("/leaderboard?distinct=true&period=day").status_code == 400
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app import changes, crud
+from app.bus import ChangeBus, PostgresBackend, UnixSocketBackend, change_bus
+from app.leaderboard_index import IndexedEntry, leaderboard_index
+from app.models import GameMode
+from app.response_cache import response_cache
+from app.session_cache import session_cache
+
+
+class Recorder:
+    """Collects the events of some kinds delivered to a bus."""
+
+    def __init__(self, bus: ChangeBus, *kinds: str):
+        self.events: list[tuple[str, object]] = []
+        self._arrived = asyncio.Event()
+        for kind in kinds:
+            bus.on(kind)(lambda data, kind=kind: self._record(kind, data))
+
+    def _record(self, kind, data):
+        self.events.append((kind, data))
+        self._arrived.set()
+
+    async def wait(self, count: int = 1):
+        async with asyncio.timeout(5):
+            while len(self.events) < count:
+                self._arrived.clear()
+                await self._arrived.wait()
+
+
+@pytest.mark.asyncio
+async def test_unix_bus_relays_between_workers_and_fails_over(tmp_path):
+    path = str(tmp_path / "bus.sock")
+    first, second, third = ChangeBus(), ChangeBus(), ChangeBus()
+    at_first, at_second, at_third = Recorder(first, "ping"), Recorder(second, "ping", "resync"), Recorder(third, "ping")
+
+    await first.start(UnixSocketBackend(path))
+    await second.start(UnixSocketBackend(path))
+    assert first.backend.is_host and not second.backend.is_host
+
+    second.publish("ping", {"n": 1})
+    await at_first.wait()
+    assert at_first.events == [("ping", {"n": 1})]
+    first.publish("ping", {"n": 2})
+    await at_second.wait()
+    # Nobody applies their own events
+    assert at_second.events == [("ping", {"n": 2})]
+    assert at_first.events == [("ping", {"n": 1})]
+
+    # The host goes away; the other worker takes the relay over and resyncs
+    await first.stop()
+    await at_second.wait(2)
+    assert at_second.events[-1] == ("resync", None)
+    assert second.backend.is_host
+
+    await third.start(UnixSocketBackend(path))
+    second.publish("ping", {"n": 3})
+    await at_third.wait()
+    assert at_third.events == [("ping", {"n": 3})]
+    await second.stop()
+    await third.stop()
+
+
+@pytest.mark.asyncio
+async def test_submits_are_published_and_applied(db_session, tmp_path):
+    path = str(tmp_path / "bus.sock")
+    other_worker = ChangeBus()
+    received = Recorder(other_worker, "scores")
+    await other_worker.start(UnixSocketBackend(path))
+    await change_bus.start(UnixSocketBackend(path))
+    try:
+        await crud.submit_score(db_session, "user-1", "Player1", 1234, GameMode.WALLS)
+        await received.wait()
+    finally:
+        await change_bus.stop()
+        await other_worker.stop()
+
+    [(kind, rows)] = received.events
+    assert [row[1:5] for row in rows] == [["user-1", "Player1", 1234, "WALLS"]]
+
+    # What the other worker does with it: index, response cache
+    leaderboard_index.ready = True
+    version = response_cache.versions.get("leaderboard", 0)
+    try:
+        change_bus.deliver(json.dumps({"origin": "elsewhere", "kind": kind, "sent": time.time(), "data": rows}))
+        assert [entry.score for entry in leaderboard_index.top(GameMode.WALLS, 10)] == [1234]
+        assert response_cache.versions["leaderboard"] == version + 1
+    finally:
+        leaderboard_index.reset()
+        response_cache.clear()
+
+
+def test_session_events_invalidate_cached_users():
+    session_cache.put("snake@example.com", object())
+    change_bus.deliver(json.dumps({"origin": "elsewhere", "kind": "session", "sent": time.time(), "data": "snake@example.com"}))
+    assert session_cache.get("snake@example.com") is None
+
+    # A worker's own events are not applied twice
+    session_cache.put("snake@example.com", object())
+    change_bus.deliver(json.dumps({"origin": change_bus.origin, "kind": "session", "sent": time.time(), "data": "snake@example.com"}))
+    assert session_cache.get("snake@example.com") is not None
+    session_cache.clear()
+
+
+def queued_on_postgres(bus: ChangeBus, monkeypatch, max_queue: int = 100) -> asyncio.Queue:
+    """Give ``bus`` a Postgres backend's limits and a queue, without connecting."""
+    monkeypatch.setattr(bus, "backend", PostgresBackend("postgresql://snake@localhost/snake"))
+    monkeypatch.setattr(bus, "_queue", asyncio.Queue(maxsize=max_queue))
+    return bus._queue
+
+
+@pytest.mark.asyncio
+async def test_events_fit_in_a_notify_payload_or_become_a_resync(monkeypatch):
+    queue = queued_on_postgres(change_bus, monkeypatch)
+    now = datetime.now(timezone.utc)
+    entries = [IndexedEntry(f"entry-{i}", f"user-{i}", "x" * 200, i, GameMode.WALLS, now) for i in range(100)]
+    changes.scores_recorded(entries)
+    messages = [json.loads(message) for message in await change_bus.next_messages()]
+    assert all(len(json.dumps(message, separators=(",", ":"))) <= PostgresBackend.max_message_bytes for message in messages)
+    assert sum(len(message["data"]) for message in messages) == 100
+
+    # One event too big to send at all is replaced by a resync for the other workers
+    changes.session_invalidated("x" * 10_000)
+    assert [json.loads(message)["kind"] for message in await change_bus.next_messages()] == ["resync"]
+    assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_missed_events_are_followed_by_a_resync(monkeypatch):
+    bus = ChangeBus()
+    queued_on_postgres(bus, monkeypatch, max_queue=1)
+    bus.publish("ping", 1)
+    bus.publish("ping", 2)  # dropped: the queue is full
+    assert [json.loads(message)["kind"] for message in await bus.next_messages()] == ["ping", "resync"]
+
+    # A backend whose send failed sets the flag; the resync goes out without waiting for another event
+    bus.others_missed = True
+    assert [json.loads(message)["kind"] for message in await asyncio.wait_for(bus.next_messages(), 1)] == ["resync"]
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import text
+
+from app.database import SQLITE_BUSY_TIMEOUT_MS, make_engine
+
+
+@pytest.mark.asyncio
+async def test_sqlite_connections_get_profile_pragmas(tmp_path):
+    engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}")
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            # 1 = NORMAL
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == SQLITE_BUSY_TIMEOUT_MS
+        assert engine.echo is False
+        assert engine.pool.size() == 10
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_in_memory_sqlite_skips_pool_sizing():
+    engine = make_engine("sqlite+aiosqlite:///:memory:")
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("SELECT 1"))).scalar() == 1
+    finally:
+        await engine.dispose()
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from app import datagen
+from app.datagen import Profile
+from app.models import ActivePlayer, LeaderboardEntry, PlayerStats, User, UserBestScore
+from app.passwords import verify_password
+from .conftest import TestingSessionLocal
+
+END = datetime(2024, 3, 14, tzinfo=timezone.utc)
+
+
+def test_same_seed_gives_same_rows():
+    profile = Profile(users=50, scores_per_user=4, activity="zipf", played_at="recent", end=END, active_players=5, seed=7)
+    assert list(datagen.entries(profile)) == list(datagen.entries(profile))
+    assert list(datagen.active_players(profile)) == list(datagen.active_players(profile))
+    assert datagen.password_hash(profile) == datagen.password_hash(profile)
+    assert verify_password("password", datagen.password_hash(profile))
+
+    other = Profile(users=50, scores_per_user=4, activity="zipf", played_at="recent", end=END, active_players=5, seed=8)
+    assert list(datagen.entries(other)) != list(datagen.entries(profile))
+
+    # Batching regroups the stream without changing it
+    rows = list(datagen.entries(profile))
+    assert [row for batch in datagen.batches(datagen.entries(profile), 7) for row in batch] == rows
+
+
+def test_distributions():
+    uniform = Profile(users=200, scores_per_user=10, score_dist="uniform", max_score=100, days=7, end=END)
+    rows = list(datagen.entries(uniform))
+    assert abs(len(rows) - 2000) < 100
+    assert all(0 <= row["score"] <= 100 for row in rows)
+    assert all(END - timedelta(days=7) <= row["played_at"] <= END for row in rows)
+    assert len({row["id"] for row in rows}) == len(rows)
+
+    skewed = Profile(users=200, scores_per_user=10, activity="zipf", score_dist="zipf", played_at="recent", days=7, end=END)
+    rows = list(datagen.entries(skewed))
+    games = {}
+    for row in rows:
+        games[row["username"]] = games.get(row["username"], 0) + 1
+    assert games["Player0"] > 20 * games.get("Player199", 1)
+    assert abs(len(rows) - 2000) < 200
+    scores = sorted(row["score"] for row in rows)
+    assert scores[len(scores) // 2] < 100  # many short games
+    recent = sum(row["played_at"] > END - timedelta(days=1) for row in rows)
+    assert recent > len(rows) / 3
+
+
+@pytest.mark.asyncio
+async def test_generate_writes_tables_in_batches(db_session):
+    profile = Profile(users=30, scores_per_user=5, end=END, active_players=4)
+    logged = []
+    counts = await datagen.generate(TestingSessionLocal, profile, batch_size=16, log=logged.append)
+    assert counts["users"] == 30
+    assert counts["active_players"] == 4
+    assert any("rows/s" in line for line in logged)
+
+    async def count(model):
+        return (await db_session.execute(select(func.count()).select_from(model))).scalar()
+
+    assert await count(User) == 30
+    assert await count(LeaderboardEntry) == counts["leaderboard_entries"] == len(list(datagen.entries(profile)))
+    assert await count(ActivePlayer) == 4
+    assert await count(UserBestScore) > 0
+    assert await count(PlayerStats) > 0
+    stored = (await db_session.execute(select(LeaderboardEntry.id).order_by(LeaderboardEntry.id))).scalars().all()
+    assert stored == sorted(row["id"] for row in datagen.entries(profile))
+
+    with pytest.raises(ValueError):
+        await datagen.generate(TestingSessionLocal, profile, log=logged.append)
@@ -0,0 +1,53 @@
+import random
+import numpy as np
+import pytest
+from dataclasses import replace
+from app.engine import BatchEngine, DIRECTIONS, create_initial_state, move_snake, change_direction, get_ai_direction
+from app.models import GameMode
+
+class NoExplore:
+    """Stands in for the engine RNG so the AI never takes its random second choice."""
+    def __init__(self, rng):
+        self.rng = rng
+    def random(self, size=None):
+        return np.ones(size) if size is not None else 1.0
+
+@pytest.mark.parametrize("mode", list(GameMode))
+def test_batch_engine_matches_rules_port(mode):
+    rng = random.Random(5)
+    engine = BatchEngine(1, mode, seed=5)
+    state = replace(create_initial_state(mode), snake=engine.snake(0), food=engine.snapshot(0).food)
+
+    for _ in range(500):
+        move = rng.choice(DIRECTIONS)
+        engine.step(np.array([DIRECTIONS.index(move)]))
+        state = move_snake(change_direction(state, move))
+        snapshot = engine.snapshot(0)
+
+        assert snapshot.is_game_over == state.is_game_over
+        if state.is_game_over:
+            break
+        assert snapshot.snake == state.snake
+        assert snapshot.score == state.score
+        # Food placement uses different randomness; keep the port in sync with the engine
+        state = replace(state, food=snapshot.food)
+
+@pytest.mark.parametrize("mode", list(GameMode))
+def test_ai_directions_match_rules_port(mode):
+    engine = BatchEngine(64, mode, seed=11)
+    engine.rng = NoExplore(engine.rng)
+
+    for _ in range(200):
+        choices = engine.ai_directions()
+        for board in np.flatnonzero(engine.alive):
+            state = engine.snapshot(board)
+            assert DIRECTIONS[choices[board]] == get_ai_direction(state, rand=lambda: 1.0)
+        engine.reset(engine.step(choices))
+
+def test_food_is_never_placed_on_the_snake():
+    engine = BatchEngine(256, [GameMode.WALLS, GameMode.PASS_THROUGH] * 128, seed=3)
+    for _ in range(300):
+        engine.reset(engine.step(engine.ai_directions()))
+        live = np.flatnonzero(engine.alive)
+        assert not engine.occupied[live, engine.food[live]].any()
+        assert (engine.occupied.sum(axis=1)[live] == engine.length[live]).all()
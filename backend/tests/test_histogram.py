@@ -0,0 +1,113 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app.histogram import ScoreHistogram, score_histogram
+from app.models import GameMode, LeaderboardEntry
+from .conftest import TestingSessionLocal
+
+
+async def seed(db, count, seed=1):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    for offset in range(0, count, 10000):
+        await db.execute(insert(LeaderboardEntry), [
+            {
+                "id": f"e{i:07d}", "user_id": f"user-{i % 500}", "username": "Player",
+                # Skewed towards low scores, with a tail past the overflow bucket
+                "score": int(rng.paretovariate(1.2) * 100) - 100,
+                "mode": rng.choice(list(GameMode)), "played_at": now,
+            }
+            for i in range(offset, min(offset + 10000, count))
+        ])
+    await db.commit()
+
+
+async def exact_percentile(db, mode, score):
+    entry = LeaderboardEntry
+    lower, total = (await db.execute(
+        select(func.count().filter(entry.score < score), func.count()).where(entry.mode == mode)
+    )).one()
+    return 100 * lower / total
+
+
+@pytest.mark.asyncio
+async def test_percentiles_stay_within_error_bound_on_synthetic_data(db_session):
+    await seed(db_session, 100_000)
+    histogram = ScoreHistogram(bucket_width=10, max_score=2000, session_factory=TestingSessionLocal)
+    await histogram.load(db_session)
+
+    for mode in GameMode:
+        assert histogram.total(mode) == (await db_session.execute(
+            select(func.count()).where(LeaderboardEntry.mode == mode))).scalar()
+        worst = 0.0
+        for score in list(range(0, 300, 13)) + [500, 999, 1000, 1995, 2000, 5000]:
+            exact = await exact_percentile(db_session, mode, score)
+            error = abs(histogram.percentile(mode, score) - exact)
+            assert error <= histogram.error_bound(mode, score) + 1e-9
+            worst = max(worst, error)
+        assert worst < 2.0
+
+    # A width of 1 is exact below the overflow bucket
+    exact_histogram = ScoreHistogram(bucket_width=1, max_score=2000, session_factory=TestingSessionLocal)
+    await exact_histogram.load(db_session)
+    for score in (0, 17, 150, 1999):
+        assert exact_histogram.percentile(GameMode.WALLS, score) == pytest.approx(await exact_percentile(db_session, GameMode.WALLS, score))
+        assert exact_histogram.error_bound(GameMode.WALLS, score) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_persist_merges_counts_from_every_worker(db_session):
+    await seed(db_session, 1000)
+    workers = [ScoreHistogram(bucket_width=10, max_score=1000, session_factory=TestingSessionLocal) for _ in range(2)]
+    for worker in workers:
+        await worker.load(db_session)
+
+    workers[0].add(GameMode.WALLS, 5)
+    workers[1].add(GameMode.WALLS, 5)
+    workers[1].add(GameMode.PASS_THROUGH, 50_000)
+    for worker in workers:
+        await worker.persist()
+    await workers[0].persist()
+
+    for worker in workers:
+        assert worker.counts == workers[1].counts
+    reloaded = ScoreHistogram(bucket_width=10, max_score=1000, session_factory=TestingSessionLocal)
+    await reloaded.load(db_session)
+    assert reloaded.total(GameMode.WALLS) + reloaded.total(GameMode.PASS_THROUGH) == 1003
+    assert reloaded.counts == workers[0].counts
+
+
+@pytest.mark.asyncio
+async def test_empty_table_is_built_once(db_session):
+    from .conftest import assert_max_queries
+    histogram = ScoreHistogram(bucket_width=10, max_score=1000, session_factory=TestingSessionLocal)
+    await histogram.load(db_session)
+    assert histogram.total(GameMode.WALLS) == 0
+
+    # Later loads and persists read the stored (marker-only) rows instead of grouping the entries again
+    with assert_max_queries(1):
+        await histogram.load(db_session)
+    with assert_max_queries(1):
+        await histogram.persist()
+
+
+def test_histogram_endpoint_and_submit_percentile(client, monkeypatch):
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    client.post("/leaderboard", json={"score": 3005, "mode": "walls"})
+
+    expected = {"mode": "walls", "bucketWidth": 10, "total": 2, "buckets": [
+        {"min": 2500, "max": 2509, "count": 1}, {"min": 3000, "max": 3009, "count": 1},
+    ]}
+    assert client.get("/leaderboard/histogram", params={"mode": "walls"}).json() == expected
+
+    # Same answer from memory once the histogram is running
+    monkeypatch.setattr(score_histogram, "session_factory", TestingSessionLocal)
+    monkeypatch.setattr(score_histogram, "persist_interval", 0)
+    asyncio.run(score_histogram.start())
+    assert client.get("/leaderboard/histogram", params={"mode": "walls"}).json() == expected
+    assert client.post("/leaderboard", json={"score": 2600, "mode": "walls"}).json()["percentile"] == pytest.approx(100 / 3)
+    assert score_histogram.total(GameMode.WALLS) == 3
@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from sqlalchemy import select, func
+from app import crud
+from app.ingest import ScoreIngestor, IngestUnavailable
+from app.models import GameMode, LeaderboardEntry
+from .conftest import TestingSessionLocal
+
+async def count_entries(db_session):
+    result = await db_session.execute(select(func.count()).select_from(LeaderboardEntry))
+    return result.scalar()
+
+@pytest.mark.asyncio
+async def test_batched_submits_are_committed_and_ranked(db_session):
+    ingestor = ScoreIngestor(session_factory=TestingSessionLocal, batch_size=16, flush_interval=0.01)
+    ingestor.start()
+
+    scores = list(range(0, 400, 10))
+    ranks = await asyncio.gather(*(
+        ingestor.submit(f"user-{score}", f"Player{score}", score, GameMode.WALLS) for score in scores
+    ))
+    await ingestor.stop()
+
+    assert await count_entries(db_session) == len(scores)
+    # Every batch is ranked after it commits, so a rank never exceeds the final one
+    for score, rank in zip(scores, ranks):
+        assert 1 <= rank <= await crud.get_rank(db_session, GameMode.WALLS, score)
+
+@pytest.mark.asyncio
+async def test_stop_drains_queue_and_rejects_new_submits(db_session):
+    ingestor = ScoreIngestor(session_factory=TestingSessionLocal, batch_size=1000, flush_interval=60)
+    ingestor.start()
+
+    pending = [asyncio.create_task(ingestor.submit("user-1", "Player1", 100 + i, GameMode.WALLS)) for i in range(5)]
+    await asyncio.sleep(0)
+    await ingestor.stop()
+
+    assert sorted(await asyncio.gather(*pending)) == [1, 2, 3, 4, 5]
+    assert await count_entries(db_session) == 5
+    with pytest.raises(IngestUnavailable):
+        await ingestor.submit("user-1", "Player1", 1, GameMode.WALLS)
+
+@pytest.mark.asyncio
+async def test_submit_that_lands_after_the_final_drain_is_rejected(db_session, monkeypatch):
+    ingestor = ScoreIngestor(session_factory=TestingSessionLocal)
+    ingestor.start()
+
+    # A submit blocked on a full queue whose put only completes once shutdown has drained it
+    queue, released = ingestor._queue, asyncio.Event()
+    async def put(item):
+        if item is not None:
+            await released.wait()
+        queue.put_nowait(item)
+    monkeypatch.setattr(queue, "put", put)
+
+    late = asyncio.create_task(ingestor.submit("user-1", "Player1", 100, GameMode.WALLS))
+    await asyncio.sleep(0)
+    await ingestor.stop()
+    released.set()
+
+    with pytest.raises(IngestUnavailable):
+        await asyncio.wait_for(late, 1)
+    assert await count_entries(db_session) == 0
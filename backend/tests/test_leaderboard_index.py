@@ -0,0 +1,148 @@
+import random
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from app.leaderboard_index import IndexedEntry, LeaderboardIndex, ModeIndex, leaderboard_index, order_key
+from app.models import GameMode, LeaderboardEntry
+
+def make_entries(count, seed=7, low=-50, high=5000):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        IndexedEntry(str(i), f"user-{i % 13}", f"User{i % 13}", rng.randint(low, high), GameMode.WALLS, start + timedelta(seconds=i))
+        for i in range(count)
+    ]
+
+def expected_order(entries):
+    return sorted(entries, key=order_key)
+
+def test_mode_index_matches_sorted_list():
+    entries = make_entries(2000)
+    index = ModeIndex()
+    for entry in entries:
+        index.add(entry)
+
+    ordered = expected_order(entries)
+    assert index.top(25) == ordered[:25]
+    assert index.entries_from(500, 40) == ordered[499:539]
+    assert index.around(1000, 5) == ordered[994:1005]
+    assert index.around(2, 5) == ordered[:7]
+    for probe in (-100, -50, 0, 123, 2500, 5000, 9999):
+        assert index.rank_of(probe) == sum(1 for e in entries if e.score > probe) + 1
+
+def test_bulk_load_matches_incremental_adds():
+    entries = make_entries(500, seed=3, low=9000, high=9100)
+    loaded, added = ModeIndex(), ModeIndex()
+    loaded.bulk_load(entries)
+    for entry in entries:
+        added.add(entry)
+    assert loaded.top(500) == added.top(500) == expected_order(entries)
+    assert loaded.rank_of(9050) == added.rank_of(9050)
+
+def test_scores_outside_the_tree_do_not_widen_it():
+    entries = make_entries(300, seed=5, low=0, high=300)
+    entries += [entry._replace(id=f"far-{i}", score=score) for i, (entry, score) in enumerate(zip(entries, (10**9, 10**9, 70000, -10**9, -3)))]
+    loaded, added = ModeIndex(), ModeIndex()
+    loaded.bulk_load(entries)
+    for entry in entries:
+        added.add(entry)
+
+    ordered = expected_order(entries)
+    for index in (loaded, added):
+        assert index._size < 10**5
+        assert index.top(len(entries)) == ordered
+        assert index.entries_from(2, 4) == ordered[1:5]
+        assert index.entries_from(len(entries) - 2, 5) == ordered[-3:]
+        for probe in (-10**9 - 1, -10**9, -5, 0, 150, 300, 70000, 10**9):
+            assert index.rank_of(probe) == sum(1 for e in entries if e.score > probe) + 1
+        assert index.position_of(ordered[-1]) == len(entries)
+
+def test_page_after_cursor_and_best_of():
+    entries = make_entries(3000, seed=11, low=0, high=200)
+    # Same timestamp for a run of entries so the id tie-break matters
+    entries += [entry._replace(id=f"tie-{i}", played_at=entries[0].played_at, mode=GameMode.PASS_THROUGH) for i, entry in enumerate(entries[:50])]
+    index = LeaderboardIndex()
+    for entry in entries:
+        index.add(entry)
+
+    ordered = expected_order(entries)
+    for mode, expected in ((None, ordered), (GameMode.WALLS, [e for e in ordered if e.mode == GameMode.WALLS])):
+        pages, after = [], None
+        while page := index.page(mode, after, 97):
+            pages.extend(page)
+            after = (page[-1].score, page[-1].played_at, page[-1].id)
+        assert pages == expected
+
+    walls = index.modes[GameMode.WALLS]
+    walls_order = [e for e in ordered if e.mode == GameMode.WALLS]
+    best = walls.best_of("user-3")
+    assert best == next(e for e in walls_order if e.user_id == "user-3")
+    assert walls_order[walls.position_of(best) - 1] == best
+
+@pytest_asyncio.fixture
+async def indexed_client(client, seeded_db):
+    await leaderboard_index.load(seeded_db)
+    yield client
+    leaderboard_index.reset()
+
+def test_submit_and_read_through_index(indexed_client: TestClient):
+    indexed_client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+
+    # Seeded entry is 2500 in walls mode
+    assert indexed_client.post("/leaderboard", json={"score": 3000, "mode": GameMode.WALLS}).json()["rank"] == 1
+    assert indexed_client.post("/leaderboard", json={"score": 2500, "mode": GameMode.WALLS}).json()["rank"] == 2
+    assert indexed_client.post("/leaderboard", json={"score": 100, "mode": GameMode.PASS_THROUGH}).json()["rank"] == 1
+
+    data = indexed_client.get("/leaderboard", params={"mode": "walls"}).json()
+    assert [entry["score"] for entry in data] == [3000, 2500, 2500]
+    assert data[0]["username"] == "SnakeMaster"
+    assert "userId" in data[0] and "playedAt" in data[0]
+
+    data = indexed_client.get("/leaderboard", params={"limit": 2}).json()
+    assert [entry["score"] for entry in data] == [3000, 2500]
+
+    for score in (-1, 10**9):
+        assert indexed_client.post("/leaderboard", json={"score": score, "mode": GameMode.WALLS}).status_code == 422
+
+@pytest_asyncio.fixture(params=["sql", "index"])
+async def paged_client(request, client, seeded_db):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rng = random.Random(5)
+    seeded_db.add_all([
+        LeaderboardEntry(id=f"e{i:03d}", user_id=f"user-{i % 7}", username=f"User{i % 7}", score=rng.randint(0, 30) * 10,
+                         mode=GameMode.WALLS, played_at=start + timedelta(seconds=i // 3))
+        for i in range(150)
+    ])
+    await seeded_db.commit()
+    if request.param == "index":
+        await leaderboard_index.load(seeded_db)
+    yield client
+    leaderboard_index.reset()
+
+def test_keyset_pages_cover_leaderboard_in_order(paged_client: TestClient):
+    seen, cursor = [], None
+    while True:
+        params = {"mode": "walls", "limit": 40, **({"cursor": cursor} if cursor else {})}
+        response = paged_client.get("/leaderboard", params=params)
+        seen.extend(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert len(seen) == 151 and len({e["id"] for e in seen}) == 151
+    keys = [(-e["score"], e["playedAt"][:19], e["id"]) for e in seen]
+    assert keys == sorted(keys)
+
+    assert paged_client.get("/leaderboard", params={"cursor": "not-a-cursor"}).status_code == 400
+
+def test_around_returns_neighbours_with_exact_ranks(paged_client: TestClient):
+    everything = paged_client.get("/leaderboard", params={"mode": "walls", "limit": 100}).json()
+    everything += paged_client.get("/leaderboard", params={"mode": "walls", "limit": 100, "cursor": paged_client.get(
+        "/leaderboard", params={"mode": "walls", "limit": 100}).headers["x-next-cursor"]}).json()
+    best = next(i for i, e in enumerate(everything) if e["userId"] == "user-4")
+
+    window = paged_client.get("/leaderboard/around/user-4", params={"mode": "walls", "k": 3}).json()
+    assert [e["id"] for e in window] == [e["id"] for e in everything[max(best - 3, 0):best + 4]]
+    for entry in window:
+        assert entry["rank"] == sum(1 for e in everything if e["score"] > entry["score"]) + 1
+
+    assert paged_client.get("/leaderboard/around/nobody", params={"mode": "walls"}).status_code == 404
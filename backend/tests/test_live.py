@@ -0,0 +1,22 @@
+import pytest
+from app.live import PlayerBroadcaster, Subscription
+
+def player(player_id, score=0):
+    return {"id": player_id, "username": player_id, "currentScore": score, "mode": "walls", "startedAt": "2024-01-01T00:00:00Z"}
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_coalesced_then_dropped():
+    broadcaster = PlayerBroadcaster(max_queue=2, max_resyncs=1)
+    slow = Subscription(broadcaster, broadcaster.max_queue)
+    broadcaster._subscribers.add(slow)
+
+    for score in range(3):
+        broadcaster.publish([player("p1", score)])
+    # The backlog was replaced by one snapshot of the latest state
+    assert await slow.get() == broadcaster.snapshot_message()
+    assert slow._queue.empty()
+
+    for score in range(3, 8):
+        broadcaster.publish([player("p1", score)])
+    assert slow.closed
+    assert await slow.get() is None
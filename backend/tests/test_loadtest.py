@@ -0,0 +1,36 @@
+from benchmarks.loadtest.report import compare, percentile, summarize
+
+
+def result(rps: float, p95: float, p99: float, errors: int = 0) -> dict:
+    stats = {"rps": rps, "p50_ms": p95 / 2, "p95_ms": p95, "p99_ms": p99, "errors": errors}
+    return {"scenario": "spectate", "total": stats, "endpoints": {"GET /leaderboard": stats}}
+
+
+def test_percentiles_use_nearest_rank():
+    values = [i / 1000 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.05
+    assert percentile(values, 99) == 0.099
+    assert percentile(values, 100) == 0.1
+    assert percentile([0.2], 95) == 0.2
+    assert percentile([], 50) == 0.0
+
+    summary = summarize([0.003, 0.001, 0.002], {200: 2, 304: 1}, 0, elapsed=1.5)
+    assert summary["rps"] == 2.0
+    assert summary["p50_ms"] == 2.0
+    assert summary["statuses"] == {"200": 2, "304": 1}
+
+
+def test_compare_flags_throughput_drops_and_tail_growth():
+    before = result(rps=1000, p95=20, p99=40)
+    assert compare(before, result(rps=950, p95=21, p99=43)) == []
+
+    regressions = compare(before, result(rps=800, p95=30, p99=41), tolerance=0.1)
+    assert {(r.endpoint, r.metric) for r in regressions} == {
+        ("total", "rps"), ("total", "p95_ms"), ("GET /leaderboard", "rps"), ("GET /leaderboard", "p95_ms"),
+    }
+    assert regressions[0].change == -0.2
+
+    # Sub-millisecond growth on a fast endpoint is jitter, new errors never are
+    fast = result(rps=1000, p95=0.2, p99=0.4)
+    assert compare(fast, result(rps=1000, p95=0.5, p99=0.8)) == []
+    assert [r.metric for r in compare(fast, result(rps=1000, p95=0.2, p99=0.4, errors=3))] == ["errors", "errors"]
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import metrics
+from app.database import make_engine
+from app.metrics import Histogram, TimedQueuePool, db_statement_duration, http_request_duration, instrument_engine, registry
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.clear()
+    yield
+    registry.clear()
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, 'a"b')
+    lines = list(histogram.collect())
+    assert lines[:2] == ["# HELP latency_seconds Test latency.", "# TYPE latency_seconds histogram"]
+    assert lines[2:] == [
+        'latency_seconds_bucket{route="a\\"b",le="0.1"} 2',
+        'latency_seconds_bucket{route="a\\"b",le="1"} 3',
+        'latency_seconds_bucket{route="a\\"b",le="+Inf"} 4',
+        'latency_seconds_sum{route="a\\"b"} 3.65',
+        'latency_seconds_count{route="a\\"b"} 4',
+    ]
+
+
+def test_requests_are_recorded_by_route_template(client):
+    client.get("/leaderboard")
+    client.get("/players/does-not-exist")
+    client.get("/players/also-missing")
+
+    assert http_request_duration.count("GET", "/leaderboard", "200") == 1
+    assert http_request_duration.count("GET", "/players/{player_id}", "404") == 2
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/leaderboard",status="200"} 1' in body
+    assert "http_requests_in_flight 1" in body  # the scrape itself
+    assert "/players/does-not-exist" not in body
+
+
+def test_disabled_registry_records_nothing(client, monkeypatch):
+    monkeypatch.setattr(registry, "enabled", False)
+    client.get("/leaderboard")
+    assert http_request_duration.count("GET", "/leaderboard", "200") == 0
+
+
+def test_statements_are_timed_by_verb():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    instrument_engine(engine, "test")
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE t (x INTEGER)"))
+            await conn.execute(text("INSERT INTO t VALUES (1)"))
+            await conn.execute(text("  select x from t"))
+            with pytest.raises(Exception):
+                await conn.execute(text("SELECT nope FROM t"))
+            await conn.execute(text("SELECT x FROM t"))
+        await engine.dispose()
+
+    asyncio.run(run())
+    assert db_statement_duration.count("test", "INSERT") == 1
+    assert db_statement_duration.count("test", "SELECT") == 2
+
+
+def test_pool_gauges_and_checkout_wait(tmp_path):
+    engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=2, max_overflow=0)
+    instrument_engine(engine, "scratch")
+
+    async def run():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            body = registry.render()
+        await engine.dispose()
+        return body
+
+    try:
+        body = asyncio.run(run())
+    finally:
+        metrics._pools.pop("scratch", None)
+    assert 'db_pool_checked_out{pool="scratch"} 1' in body
+    assert 'db_pool_size{pool="scratch"} 2' in body
+    assert 'db_pool_checkout_wait_seconds_count{pool="scratch"} 1' in body
+    assert 'db_pool_waiting{pool="scratch"} 0' in body
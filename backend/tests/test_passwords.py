@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app.passwords import HasherBusy, PasswordHasher, hash_password, needs_rehash, verify_password
+
+# Cheap parameters keep the tests fast; the format is the same at any cost
+N, R, P = 2 ** 4, 8, 1
+
+
+def test_hash_round_trip():
+    stored = hash_password("hunter2", N, R, P)
+    assert stored.startswith(f"scrypt${N}${R}${P}$")
+    assert verify_password("hunter2", stored)
+    assert not verify_password("hunter3", stored)
+    assert hash_password("hunter2", N, R, P) != stored  # salted
+
+
+def test_plaintext_passwords_still_verify_and_need_rehash():
+    assert verify_password("password", "password")
+    assert not verify_password("wrong", "password")
+    assert needs_rehash("password", N, R, P)
+
+
+def test_cost_change_needs_rehash():
+    stored = hash_password("hunter2", N, R, P)
+    assert not needs_rehash(stored, N, R, P)
+    assert needs_rehash(stored, N * 2, R, P)
+    # Old hashes keep verifying after the cost is raised
+    assert verify_password("hunter2", stored)
+
+
+@pytest.mark.asyncio
+async def test_hasher_verifies_off_loop():
+    hasher = PasswordHasher(workers=2, max_pending=4, n=N, r=R, p=P)
+    try:
+        stored = await hasher.hash("hunter2")
+        assert await hasher.verify("hunter2", stored)
+        assert not await hasher.verify("hunter2", None)
+    finally:
+        hasher.stop()
+
+
+@pytest.mark.asyncio
+async def test_hasher_rejects_beyond_max_pending():
+    hasher = PasswordHasher(workers=1, max_pending=2, n=N, r=R, p=P)
+    try:
+        results = await asyncio.gather(*(hasher.hash("x") for _ in range(3)), return_exceptions=True)
+        assert sum(isinstance(r, HasherBusy) for r in results) == 1
+        assert hasher.pending == 0
+    finally:
+        hasher.stop()
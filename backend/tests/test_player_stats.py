@@ -0,0 +1,78 @@
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, update
+
+from app import player_stats
+from app.leaderboard_index import IndexedEntry
+from app.models import GameMode, LeaderboardEntry, PlayerStats
+from .conftest import TestingSessionLocal
+
+NOW = datetime(2024, 3, 14, 15, 0, tzinfo=timezone.utc)
+
+
+def make_entries(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        IndexedEntry(f"e{i:04d}", f"user-{i % 4}", f"User{i % 4}", rng.randint(0, 500),
+                     rng.choice(list(GameMode)), NOW + timedelta(seconds=i))
+        for i in range(count)
+    ]
+
+
+def assert_matches(stats, entries, recent):
+    for mode_stats in stats.modes:
+        scores = [e.score for e in entries if e.user_id == stats.user_id and e.mode == mode_stats.mode]
+        assert mode_stats.games == len(scores)
+        assert mode_stats.best == max(scores)
+        assert mode_stats.average == pytest.approx(statistics.fmean(scores))
+        assert mode_stats.stddev == pytest.approx(statistics.pstdev(scores))
+        assert mode_stats.recent == scores[::-1][:recent]
+
+
+@pytest.mark.asyncio
+async def test_record_keeps_running_aggregates_and_recent_ring(db_session):
+    entries = make_entries(300)
+    for offset in range(0, len(entries), 23):
+        await player_stats.record(db_session, entries[offset:offset + 23], recent=5)
+        await db_session.commit()
+
+    for user in range(4):
+        stats = await player_stats.get_stats(db_session, f"user-{user}")
+        assert {m.mode for m in stats.modes} == set(GameMode)
+        assert_matches(stats, entries, recent=5)
+    assert await player_stats.get_stats(db_session, "nobody") is None
+
+
+@pytest.mark.asyncio
+async def test_check_and_rebuild(db_session):
+    entries = make_entries(200, seed=2)
+    await db_session.execute(insert(LeaderboardEntry), [entry._asdict() for entry in entries])
+    await db_session.commit()
+    # Nothing recorded yet, so every (user, mode) is reported
+    assert len(await player_stats.check(db_session)) == 8
+
+    assert await player_stats.rebuild(TestingSessionLocal, batch_size=17, recent=5) == len(entries)
+    assert await player_stats.check(db_session) == []
+    assert_matches(await player_stats.get_stats(db_session, "user-1"), entries, recent=5)
+
+    await db_session.execute(update(PlayerStats).where(PlayerStats.user_id == "user-1", PlayerStats.mode == GameMode.WALLS).values(games=PlayerStats.games + 1))
+    await db_session.commit()
+    assert [problem.split(":")[0] for problem in await player_stats.check(db_session)] == ["user-1 walls"]
+
+
+def test_player_stats_endpoint(client):
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    user_id = client.get("/auth/me").json()["id"]
+    assert client.get(f"/players/{user_id}/stats").status_code == 404
+
+    for score in (100, 300, 200):
+        client.post("/leaderboard", json={"score": score, "mode": "walls"})
+    data = client.get(f"/players/{user_id}/stats").json()
+    assert data["userId"] == user_id
+    assert data["modes"] == [{
+        "mode": "walls", "games": 3, "average": 200.0, "stddev": pytest.approx(81.65, abs=0.01),
+        "best": 300, "recent": [200, 300, 100], "recentAverage": 200.0,
+    }]
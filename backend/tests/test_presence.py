@@ -0,0 +1,52 @@
+import pytest
+from app.models import GameMode
+from app.presence import PresenceRegistry
+from .conftest import TestingSessionLocal
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+def test_entries_expire_after_ttl_unless_refreshed():
+    clock = FakeClock()
+    registry = PresenceRegistry(ttl=10, tick=1, clock=clock)
+    registry.heartbeat("a", "Alice", 10, GameMode.WALLS)
+    registry.heartbeat("b", "Bob", 20, GameMode.PASS_THROUGH)
+
+    clock.now += 6
+    registry.heartbeat("a", "Alice", 30, GameMode.WALLS)
+    assert registry.sweep() == []
+
+    clock.now += 5
+    assert registry.sweep() == ["b"]
+    assert registry.get("a").current_score == 30
+
+    clock.now += 6
+    assert registry.sweep() == ["a"]
+    assert len(registry) == 0
+
+def test_sweep_after_long_stall_and_explicit_remove():
+    clock = FakeClock()
+    registry = PresenceRegistry(ttl=5, tick=1, clock=clock)
+    for i in range(100):
+        registry.heartbeat(str(i), f"P{i}", i, GameMode.WALLS)
+    assert registry.remove("7")
+    assert not registry.remove("7")
+
+    clock.now += 3600
+    assert sorted(registry.sweep(), key=int) == [str(i) for i in range(100) if i != 7]
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trips_through_database(db_session):
+    registry = PresenceRegistry(ttl=30, session_factory=TestingSessionLocal)
+    registry.heartbeat("a", "Alice", 10, GameMode.WALLS)
+    registry.heartbeat("b", "Bob", 20, GameMode.PASS_THROUGH)
+    await registry.snapshot()
+
+    restored = PresenceRegistry(ttl=30, session_factory=TestingSessionLocal)
+    await restored.load()
+    assert {(p.id, p.current_score, p.mode) for p in restored.players()} == {
+        ("a", 10, GameMode.WALLS), ("b", 20, GameMode.PASS_THROUGH)
+    }
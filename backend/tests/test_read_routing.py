@@ -0,0 +1,85 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import database
+from app.database import get_db, make_engine, read_only_url
+from app.dependencies import ReadYourWrites, read_your_writes
+from app.leaderboard_index import leaderboard_index
+from app.main import app
+from app.models import Base, User
+from app.session_cache import session_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_read_your_writes_window_expires():
+    clock = FakeClock()
+    tracker = ReadYourWrites(window=5, clock=clock)
+    tracker.mark("a")
+    clock.now = 3
+    tracker.mark("b")
+    assert tracker.pinned("a") and tracker.pinned("b")
+    clock.now = 5
+    assert not tracker.pinned("a") and tracker.pinned("b")
+    assert not tracker.pinned(None)
+
+
+def test_read_only_url_only_rewrites_sqlite_files():
+    assert read_only_url("sqlite+aiosqlite:///./snake.db").endswith("?mode=ro&uri=true")
+    assert read_only_url("postgresql+asyncpg://u:p@db/snake") == "postgresql+asyncpg://u:p@db/snake"
+
+
+@pytest.fixture
+def split_client(tmp_path, monkeypatch):
+    """Primary and a stale replica in two SQLite files, both holding the same user."""
+    primary = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    user = {"id": str(uuid.uuid4()), "username": "SnakeMaster", "email": "snake@example.com", "password_hash": "password"}
+
+    async def setup():
+        for engine in (primary, replica):
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(User.__table__.insert(), [user])
+            # Connections are bound to this loop; let TestClient open its own
+            await engine.dispose()
+    asyncio.run(setup())
+
+    PrimarySession = async_sessionmaker(bind=primary, expire_on_commit=False)
+
+    async def override_get_db():
+        async with PrimarySession() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr(database, "ReadSessionLocal", async_sessionmaker(bind=replica, expire_on_commit=False))
+    clock = FakeClock()
+    monkeypatch.setattr(read_your_writes, "clock", clock)
+    yield TestClient(app), TestClient(app), clock
+    app.dependency_overrides.clear()
+    leaderboard_index.reset()
+    session_cache.clear()
+    read_your_writes.clear()
+
+
+def test_reads_go_to_replica_except_after_own_write(split_client):
+    writer, spectator, clock = split_client
+    writer.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+
+    assert writer.post("/leaderboard", json={"score": 4200, "mode": "walls"}).status_code == 201
+    assert [e["score"] for e in writer.get("/leaderboard").json()] == [4200]
+    # The replica has not seen the write
+    assert spectator.get("/leaderboard").json() == []
+
+    clock.now += read_your_writes.window
+    assert writer.get("/leaderboard").json() == []
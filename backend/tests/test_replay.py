@@ -0,0 +1,44 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.engine.replay import mulberry32, record_ai_game, replay_game
+from app.models import GameMode
+from app.schemas import REPLAY_MAX_TICKS
+from app.verification import replay_verifier
+
+def test_mulberry32_matches_javascript():
+    # Reference values from running the TypeScript version in the app/engine/replay.py docstring
+    rand = mulberry32(12345)
+    assert [rand(), rand(), rand()] == [0.9797282677609473, 0.3067522644996643, 0.484205421525985]
+
+@pytest.mark.parametrize("mode", list(GameMode))
+def test_replay_reproduces_recorded_game(mode):
+    moves, ticks, score = record_ai_game(seed=99, mode=mode, max_ticks=5000)
+    assert score > 0
+    assert replay_game(99, mode, moves, ticks, max_ticks=5000) == score
+    # Wrong seed, truncated input or an exhausted tick budget are all rejected
+    assert replay_game(100, mode, moves, ticks, max_ticks=5000) != score
+    assert replay_game(99, mode, moves[:-1], ticks, max_ticks=5000) != score
+    assert replay_game(99, mode, moves, ticks, max_ticks=ticks - 1) is None
+
+def test_submit_score_with_replay(client: TestClient):
+    moves, ticks, score = record_ai_game(seed=7, mode=GameMode.WALLS, max_ticks=5000)
+    replay = {"seed": 7, "ticks": ticks, "moves": moves}
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    try:
+        response = client.post("/leaderboard", json={"score": score, "mode": "walls", "replay": replay})
+        assert response.status_code == 201
+        assert response.json()["success"] is True
+
+        response = client.post("/leaderboard", json={"score": score + 10, "mode": "walls", "replay": replay})
+        assert response.status_code == 422
+        assert response.json()["detail"] == "Score does not match replay"
+    finally:
+        replay_verifier.stop()
+
+def test_replay_moves_are_capped_before_reaching_the_pool(client: TestClient):
+    replay = {"seed": 7, "ticks": 1, "moves": [[1, "UP"]] * (REPLAY_MAX_TICKS + 1)}
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    response = client.post("/leaderboard", json={"score": 0, "mode": "walls", "replay": replay})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "replay", "moves"]
+    assert replay_verifier.pending == 0
@@ -0,0 +1,68 @@
+import pytest
+from starlette.requests import Request
+
+from app.response_cache import ResponseCache, etag_matches, make_etag
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+
+def test_etag_matching():
+    etag = make_etag(b"[]")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_bump_invalidates_only_its_topic():
+    cache = ResponseCache(ttl=60)
+    cache.put("leaderboard", ("walls", 10), 0, b"[1]")
+    cache.put("players", "all", 0, b"[2]")
+    cache.bump("leaderboard")
+    assert cache.get("leaderboard", ("walls", 10)) is None
+    assert cache.get("players", "all").body == b"[2]"
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=2, clock=clock)
+    cache.put("players", "all", 0, b"[]")
+    clock.now = 1.9
+    assert cache.get("players", "all") is not None
+    clock.now = 2
+    assert cache.get("players", "all") is None
+
+
+@pytest.mark.asyncio
+async def test_respond_builds_once_and_revalidates():
+    cache = ResponseCache(ttl=60)
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return b'{"n":1}', {}
+
+    first = await cache.respond(make_request(), "leaderboard", "k", build)
+    assert first.status_code == 200 and first.body == b'{"n":1}'
+    etag = first.headers["etag"]
+
+    second = await cache.respond(make_request(etag), "leaderboard", "k", build)
+    assert second.status_code == 304 and second.headers["etag"] == etag
+    assert len(builds) == 1
+    assert (cache.hits, cache.misses, cache.not_modified) == (1, 1, 1)
+
+    # A bypassed request always rebuilds and leaves the cache alone
+    await cache.respond(make_request(), "leaderboard", "k", build, bypass=True)
+    assert len(builds) == 2 and len(cache) == 1
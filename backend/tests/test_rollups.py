@@ -0,0 +1,94 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, select
+
+from app import rollups
+from app.leaderboard_index import IndexedEntry, order_key
+from app.models import GameMode, LeaderboardEntry, LeaderboardRollup, Period
+from .conftest import TestingSessionLocal
+
+NOW = datetime(2024, 3, 14, 15, 0, tzinfo=timezone.utc)  # a Thursday
+
+
+def make_entries(count, seed=1, days=3):
+    rng = random.Random(seed)
+    return [
+        IndexedEntry(f"e{i:04d}", f"user-{i % 5}", f"User{i % 5}", rng.randint(0, 50) * 10,
+                     rng.choice(list(GameMode)), NOW - timedelta(hours=rng.randint(0, days * 24)))
+        for i in range(count)
+    ]
+
+
+def expected_top(entries, period, start, mode, depth):
+    group = [e for e in entries if rollups.period_start(period, e.played_at) == start and e.mode == mode]
+    return [e.id for e in sorted(group, key=order_key)[:depth]]
+
+
+async def stored_top(db, period, start, mode):
+    result = await db.execute(
+        select(LeaderboardRollup.id)
+        .where(LeaderboardRollup.period == period, LeaderboardRollup.period_start == start, LeaderboardRollup.mode == mode)
+        .order_by(*rollups.ROLLUP_ORDER)
+    )
+    return list(result.scalars().all())
+
+
+def test_period_start():
+    assert rollups.period_start(Period.DAY, NOW) == datetime(2024, 3, 14, tzinfo=timezone.utc)
+    assert rollups.period_start(Period.WEEK, NOW) == datetime(2024, 3, 11, tzinfo=timezone.utc)
+    # Naive values are treated as UTC
+    assert rollups.period_start(Period.DAY, NOW.replace(tzinfo=None)) == datetime(2024, 3, 14, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_record_and_trim_keep_top_entries_per_period_and_mode(db_session):
+    entries = make_entries(300)
+    trimmer = rollups.RollupTrimmer(depth=10)
+    # Several batches, like a stream of submits, with a trim now and then
+    for n, offset in enumerate(range(0, len(entries), 37)):
+        await rollups.record(db_session, entries[offset:offset + 37], trimmer)
+        if n % 3 == 2:
+            await trimmer.trim(db_session, NOW)
+        await db_session.commit()
+    await trimmer.trim(db_session, NOW)
+    await db_session.commit()
+
+    for period in Period:
+        for start in {rollups.period_start(period, e.played_at) for e in entries}:
+            for mode in GameMode:
+                assert await stored_top(db_session, period, start, mode) == expected_top(entries, period, start, mode, 10)
+    # Full groups remember their cut-off, so entries below it are not written at all
+    assert trimmer.cutoffs and not trimmer.dirty
+    group = next(iter(trimmer.cutoffs))
+    await rollups.record(db_session, [IndexedEntry("low", "u", "U", -1, group[2], group[1])], trimmer)
+    assert group not in trimmer.dirty
+
+
+@pytest.mark.asyncio
+async def test_trim_rotates_old_rollups(db_session):
+    trimmer = rollups.RollupTrimmer()
+    old = IndexedEntry("old", "u", "U", 10, GameMode.WALLS, NOW - timedelta(days=rollups.LEADERBOARD_ROLLUP_DAYS + 1))
+    await rollups.record(db_session, [old], trimmer)
+    await db_session.commit()
+    assert await stored_top(db_session, Period.DAY, rollups.period_start(Period.DAY, old.played_at), GameMode.WALLS) == ["old"]
+
+    await trimmer.trim(db_session, NOW)
+    await db_session.commit()
+    assert await stored_top(db_session, Period.DAY, rollups.period_start(Period.DAY, old.played_at), GameMode.WALLS) == []
+    # Still inside the weekly retention window
+    assert "old" in await stored_top(db_session, Period.WEEK, rollups.period_start(Period.WEEK, old.played_at), GameMode.WALLS)
+
+
+@pytest.mark.asyncio
+async def test_backfill_matches_incremental_rollups(db_session):
+    entries = make_entries(250, seed=4)
+    await db_session.execute(insert(LeaderboardEntry), [entry._asdict() for entry in entries])
+    await db_session.commit()
+
+    assert await rollups.backfill(TestingSessionLocal, batch_size=40, now=NOW) == 250
+    for period in Period:
+        for start in {rollups.period_start(period, e.played_at) for e in entries}:
+            for mode in GameMode:
+                assert await stored_top(db_session, period, start, mode) == expected_top(entries, period, start, mode, rollups.LEADERBOARD_ROLLUP_DEPTH)
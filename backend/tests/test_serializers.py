@@ -0,0 +1,88 @@
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from app import crud, schemas
+from app.leaderboard_index import IndexedEntry
+from app.models import ActivePlayer, GameMode
+from app.presence import Presence
+from app.serializers import encode_entries, encode_players
+
+OPENAPI = os.path.join(os.path.dirname(__file__), "..", "..", "openapi.yaml")
+
+entries_adapter = TypeAdapter(List[schemas.LeaderboardEntry])
+players_adapter = TypeAdapter(List[schemas.ActivePlayer])
+
+# Naive (as SQLite returns them), UTC, other offsets, with and without microseconds
+MOMENTS = [
+    datetime(2024, 3, 14, 15, 0),
+    datetime(2024, 3, 14, 15, 0, 0, 120),
+    datetime(2024, 3, 14, 15, 0, tzinfo=timezone.utc),
+    datetime(2024, 3, 14, 15, 0, 1, 500000, tzinfo=timezone.utc),
+    datetime(2024, 3, 14, 15, 0, tzinfo=timezone(timedelta(hours=-5, minutes=-30))),
+]
+NAMES = ["SnakeMaster", "Zoë", 'quote"back\\slash', "tab\tnew\nline", "蛇", "emoji 🐍", " sep", "ctl\x01"]
+
+
+def required_fields(schema: str) -> list[str]:
+    """The ``required`` list of a component schema in openapi.yaml."""
+    with open(OPENAPI) as f:
+        lines = f.read().splitlines()
+    start = lines.index(f"    {schema}:")
+    fields, collecting = [], False
+    for line in lines[start + 1:]:
+        if line.startswith("    ") and not line.startswith("     "):
+            break
+        if line.strip() == "required:":
+            collecting = True
+        elif collecting and line.strip().startswith("- "):
+            fields.append(line.strip()[2:])
+    return fields
+
+
+def make_entries(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        # The index holds either GameMode class (submits carry schemas.GameMode)
+        IndexedEntry(f"e{i}", f"user-{i}", rng.choice(NAMES), rng.randint(0, 10**9), rng.choice(list(GameMode) + list(schemas.GameMode)), rng.choice(MOMENTS))
+        for i in range(count)
+    ]
+
+
+@pytest.mark.filterwarnings("error")
+def test_entries_match_pydantic_byte_for_byte():
+    entries = make_entries(500)
+    expected = entries_adapter.dump_json(entries_adapter.validate_python(entries, from_attributes=True), by_alias=True)
+    assert encode_entries(entries) == expected
+    assert encode_entries([]) == b"[]"
+    assert list(json.loads(encode_entries(entries[:1]))[0]) == required_fields("LeaderboardEntry")
+
+
+@pytest.mark.filterwarnings("error")
+def test_players_match_pydantic_byte_for_byte():
+    rng = random.Random(2)
+    players = [
+        ActivePlayer(id=f"p{i}", username=rng.choice(NAMES), current_score=rng.randint(0, 5000), mode=rng.choice(list(GameMode)), started_at=rng.choice(MOMENTS))
+        for i in range(200)
+    ]
+    expected = players_adapter.dump_json(players_adapter.validate_python(players, from_attributes=True), by_alias=True)
+    assert encode_players(players) == expected
+    # Presence records from the in-memory registry encode the same way
+    presences = [Presence(p.id, p.username, p.current_score, p.mode, p.started_at, 0.0, 0) for p in players]
+    assert encode_players(presences) == expected
+    assert list(json.loads(encode_players(players[:1]))[0]) == required_fields("ActivePlayer")
+
+
+@pytest.mark.asyncio
+async def test_core_rows_encode_like_orm_objects(db_session):
+    for entry in make_entries(50, seed=3):
+        await crud.submit_score(db_session, entry.user_id, entry.username, entry.score, entry.mode)
+    rows = await crud.get_leaderboard(db_session, limit=100)
+    assert not hasattr(rows[0], "_sa_instance_state")
+    expected = entries_adapter.dump_json(entries_adapter.validate_python(rows, from_attributes=True), by_alias=True)
+    assert encode_entries(rows) == expected
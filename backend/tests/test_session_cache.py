@@ -0,0 +1,77 @@
+import json
+import time
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import crud
+from app.bus import change_bus
+from app.session_cache import CachedUser, SessionCache, session_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_user(n: int) -> CachedUser:
+    return CachedUser(f"u{n}", f"user{n}", f"user{n}@example.com", datetime.now(timezone.utc))
+
+
+def test_get_counts_hits_and_misses():
+    cache = SessionCache(max_size=10, ttl=60)
+    assert cache.get("user1@example.com") is None
+    cache.put("user1@example.com", make_user(1))
+    assert cache.get("user1@example.com").id == "u1"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = SessionCache(max_size=10, ttl=5, clock=clock)
+    cache.put("s", make_user(1))
+    clock.now = 4.9
+    assert cache.get("s") is not None
+    clock.now = 5
+    assert cache.get("s") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SessionCache(max_size=2, ttl=60)
+    cache.put("a", make_user(1))
+    cache.put("b", make_user(2))
+    cache.get("a")
+    cache.put("c", make_user(3))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_invalidate_user_drops_every_session_of_that_user():
+    cache = SessionCache(max_size=10, ttl=60)
+    user = make_user(1)
+    cache.put("a", user)
+    cache.put("b", user)
+    cache.put("c", make_user(2))
+    cache.invalidate_user("u1")
+    assert len(cache) == 1 and cache.get("c") is not None
+
+
+@pytest.mark.asyncio
+async def test_changed_user_is_not_served_from_the_cache(client: TestClient, db_session):
+    client.post("/auth/login", json={"email": "snake@example.com", "password": "password"})
+    me = client.get("/auth/me").json()
+    assert session_cache.get("snake@example.com").username == me["username"]
+
+    await crud.update_user(db_session, me["id"], username="Renamed")
+    assert session_cache.get("snake@example.com") is None
+    assert client.get("/auth/me").json()["username"] == "Renamed"
+
+    # Another worker's change arrives over the bus
+    client.get("/auth/me")
+    change_bus.deliver(json.dumps({"origin": "elsewhere", "kind": "user", "sent": time.time(), "data": me["id"]}))
+    assert session_cache.get("snake@example.com") is None
@@ -0,0 +1,93 @@
+import gzip
+import os
+
+import pytest
+
+from app.static_files import IMMUTABLE, REVALIDATE, StaticSite, accepts_gzip, precompress, static_site
+
+INDEX = b"<!doctype html><html><body><div id=root></div>" + b" " * 2000 + b"</body></html>"
+BUNDLE = b"console.log('snake');\n" * 500
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_bytes(INDEX)
+    (tmp_path / "assets" / "index-3f9a1c.js").write_bytes(BUNDLE)
+    (tmp_path / "favicon.ico").write_bytes(b"\x00" * 4000)
+    monkeypatch.setattr(static_site, "directory", str(tmp_path))
+    static_site.load()
+    yield tmp_path
+    monkeypatch.undo()
+    static_site.load()
+
+
+def test_spa_routes_and_root_serve_index_from_memory(client, site):
+    for path in ("/", "/leaderboard-view/walls", "/watch"):
+        response = client.get(path, headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200
+        assert response.content == INDEX
+        assert response.headers["content-type"].startswith("text/html")
+        assert response.headers["cache-control"] == REVALIDATE
+    # API routes are not shadowed
+    assert client.get("/leaderboard").headers["content-type"] == "application/json"
+
+
+def test_hashed_assets_are_gzipped_and_immutable(client, site):
+    response = client.get("/assets/index-3f9a1c.js", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.content == BUNDLE  # httpx decodes it
+
+    plain = client.get("/assets/index-3f9a1c.js", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] != response.headers["etag"]
+
+    # Binary files are not compressed; a missing asset is a 404, not index.html
+    assert "content-encoding" not in client.get("/favicon.ico").headers
+    assert client.get("/assets/index-000000.js").status_code == 404
+
+
+def test_strong_etag_gives_304(client, site):
+    etag = client.get("/anything").headers["etag"]
+    assert not etag.startswith("W/")
+    response = client.get("/other-route", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_reload_picks_up_changed_build(site):
+    assert not static_site.reload()
+    (site / "index.html").write_bytes(b"<html>new build</html>")
+    (site / "assets" / "index-3f9a1c.js").unlink()
+    assert static_site.reload()
+    assert static_site.lookup("/").body == b"<html>new build</html>"
+    assert static_site.lookup("/assets/index-3f9a1c.js") is None
+
+
+def test_precompressed_files_are_used(tmp_path):
+    (tmp_path / "app.js").write_bytes(BUNDLE)
+    assert precompress(str(tmp_path)) == 1
+    assert gzip.decompress((tmp_path / "app.js.gz").read_bytes()) == BUNDLE
+
+    site = StaticSite(str(tmp_path))
+    site.load()
+    assert list(site.files) == ["app.js"]
+    assert site.files["app.js"].gzip_body == (tmp_path / "app.js.gz").read_bytes()
+
+
+def test_large_files_stay_on_disk(tmp_path):
+    (tmp_path / "big.js").write_bytes(BUNDLE)
+    site = StaticSite(str(tmp_path), inline_max_bytes=100)
+    site.load()
+    assert site.files["big.js"].body is None
+    assert site.files["big.js"].path == os.path.join(str(tmp_path), "big.js")
+
+
+def test_accepts_gzip():
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, *;q=0.1")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("identity")
+    assert not accepts_gzip(None)
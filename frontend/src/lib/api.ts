@@ -106,4 +106,61 @@ export const playersApi = {
       return null;
     }
   },
+
+  // Keeps the current player listed for spectators; the server drops players whose heartbeats stop
+  async sendHeartbeat(score: number, mode: 'pass-through' | 'walls'): Promise<void> {
+    await fetch('/players/heartbeat', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ score, mode }),
+    }).catch(() => undefined);
+  },
+
+  async leave(): Promise<void> {
+    await fetch('/players/heartbeat', { method: 'DELETE' }).catch(() => undefined);
+  },
+
+  // Live player list over /players/ws: a snapshot, then join/score/leave deltas.
+  // Reconnects (and gets a fresh snapshot) whenever the socket closes.
+  subscribeActivePlayers(onChange: (players: ActivePlayer[]) => void): () => void {
+    let players = new Map<string, ActivePlayer>();
+    let socket: WebSocket | null = null;
+    let retryTimer: number | undefined;
+    let closed = false;
+
+    const connect = () => {
+      const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+      socket = new WebSocket(`${protocol}//${window.location.host}/players/ws`);
+
+      socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'snapshot') {
+          players = new Map(message.players.map((player: ActivePlayer) => [player.id, player]));
+        } else if (message.type === 'delta') {
+          for (const player of message.join as ActivePlayer[]) {
+            players.set(player.id, player);
+          }
+          for (const { id, currentScore } of message.score as { id: string; currentScore: number }[]) {
+            const player = players.get(id);
+            if (player) players.set(id, { ...player, currentScore });
+          }
+          for (const id of message.leave as string[]) {
+            players.delete(id);
+          }
+        }
+        onChange(Array.from(players.values()));
+      };
+
+      socket.onclose = () => {
+        if (!closed) retryTimer = window.setTimeout(connect, 2000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      window.clearTimeout(retryTimer);
+      socket?.close();
+    };
+  },
 };
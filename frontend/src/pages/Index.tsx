@@ -1,10 +1,10 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { GameBoard } from '@/components/GameBoard';
 import { GameControls } from '@/components/GameControls';
 import { ModeSelector } from '@/components/ModeSelector';
 import { useSnakeGame } from '@/hooks/useSnakeGame';
 import { useAuth } from '@/contexts/AuthContext';
-import { leaderboardApi } from '@/lib/api';
+import { leaderboardApi, playersApi } from '@/lib/api';
 import { useToast } from '@/hooks/use-toast';
 import { GameMode } from '@/lib/gameLogic';
 import { Button } from '@/components/ui/button';
@@ -34,6 +34,22 @@ const Index = () => {
     onGameOver: handleGameOver,
   });
 
+  // Heartbeat while a logged-in player is mid-game so spectators can see them
+  const scoreRef = useRef(gameState.score);
+  scoreRef.current = gameState.score;
+  const isPlaying = Boolean(user) && hasStarted && !gameState.isGameOver;
+
+  useEffect(() => {
+    if (!isPlaying) return;
+
+    playersApi.sendHeartbeat(scoreRef.current, selectedMode);
+    const interval = setInterval(() => playersApi.sendHeartbeat(scoreRef.current, selectedMode), 5000);
+    return () => {
+      clearInterval(interval);
+      playersApi.leave();
+    };
+  }, [isPlaying, selectedMode]);
+
   const handleModeChange = (mode: GameMode) => {
     setSelectedMode(mode);
     restart(mode);
@@ -19,17 +19,11 @@ const Spectate = () => {
   });
 
   useEffect(() => {
-    const loadPlayers = async () => {
-      const players = await playersApi.getActivePlayers();
+    // Live player list pushed by the server
+    return playersApi.subscribeActivePlayers((players) => {
       setActivePlayers(players);
       setIsLoading(false);
-    };
-
-    loadPlayers();
-    
-    // Refresh player list periodically
-    const interval = setInterval(loadPlayers, 10000);
-    return () => clearInterval(interval);
+    });
   }, []);
 
   const handleSelectPlayer = (player: ActivePlayer) => {
@@ -28,6 +28,7 @@ export default defineConfig(({ mode }) => ({
       '/players': {
         target: 'http://localhost:8000',
         changeOrigin: true,
+        ws: true,
       },
     }
   },